@@ -25,6 +25,7 @@ from tools.users import (
 from tools.agents import (
     get_agent,
     list_agents,
+    lookup_agents,
 )
 from tools.analytics import (
     get_analytics_metric,
@@ -32,48 +33,73 @@ from tools.analytics import (
     list_analytics_records,
     list_analytics_metrics,
     get_analytics_filter,
+    search_analytics_filter_values,
     get_analytics_records_data,
     get_analytics_metrics_data,
+    get_analytics_metric_trend,
+    export_analytics_records_data,
+    plan_analytics_query,
+    execute_analytics_plan,
 )
+from tools.invocation import tool_invocation
+from tools.webhooks import start_webhook_server
 from tools.info import (
     get_api_info,
+    get_server_metrics,
+    admin_tools_enabled,
+    configure_profiling,
 )
 
 # Create the FastMCP server
 mcp = FastMCP("Dixa MCP Server")
 
 # Register conversation tools
-mcp.tool()(search_conversations)
-mcp.tool()(get_conversation)
-mcp.tool()(get_conversation_messages)
-mcp.tool()(get_conversation_notes)
-mcp.tool()(get_conversation_ratings)
+mcp.tool()(tool_invocation(search_conversations))
+mcp.tool()(tool_invocation(get_conversation))
+mcp.tool()(tool_invocation(get_conversation_messages))
+mcp.tool()(tool_invocation(get_conversation_notes))
+mcp.tool()(tool_invocation(get_conversation_ratings))
 
 # Register tag tools
-mcp.tool()(list_tags)
-mcp.tool()(tag_conversation)
-mcp.tool()(remove_conversation_tag)
-mcp.tool()(get_conversation_tags)
+mcp.tool()(tool_invocation(list_tags))
+mcp.tool()(tool_invocation(tag_conversation))
+mcp.tool()(tool_invocation(remove_conversation_tag))
+mcp.tool()(tool_invocation(get_conversation_tags))
 
 # Register user tools
-mcp.tool()(get_end_user)
-mcp.tool()(get_end_user_conversations)
+mcp.tool()(tool_invocation(get_end_user))
+mcp.tool()(tool_invocation(get_end_user_conversations))
 
 # Register agent tools
-mcp.tool()(get_agent)
-mcp.tool()(list_agents)
+mcp.tool()(tool_invocation(get_agent))
+mcp.tool()(tool_invocation(list_agents))
+mcp.tool()(tool_invocation(lookup_agents))
 
 # Register analytics tools
-mcp.tool()(get_analytics_metric)
-mcp.tool()(get_analytics_record)
-mcp.tool()(list_analytics_records)
-mcp.tool()(list_analytics_metrics)
-mcp.tool()(get_analytics_filter)
-mcp.tool()(get_analytics_records_data)
-mcp.tool()(get_analytics_metrics_data)
+mcp.tool()(tool_invocation(get_analytics_metric))
+mcp.tool()(tool_invocation(get_analytics_record))
+mcp.tool()(tool_invocation(list_analytics_records))
+mcp.tool()(tool_invocation(list_analytics_metrics))
+mcp.tool()(tool_invocation(get_analytics_filter))
+mcp.tool()(tool_invocation(search_analytics_filter_values))
+mcp.tool()(tool_invocation(get_analytics_records_data))
+mcp.tool()(tool_invocation(get_analytics_metrics_data))
+mcp.tool()(tool_invocation(get_analytics_metric_trend))
+mcp.tool()(tool_invocation(export_analytics_records_data))
+mcp.tool()(tool_invocation(plan_analytics_query))
+mcp.tool()(tool_invocation(execute_analytics_plan))
 
 # Register info tools
-mcp.tool()(get_api_info)
+mcp.tool()(tool_invocation(get_api_info))
+mcp.tool()(tool_invocation(get_server_metrics))
+
+# Register admin tools, only exposed when DIXA_ADMIN_TOOLS_ENABLED is set
+if admin_tools_enabled():
+    mcp.tool()(tool_invocation(configure_profiling))
+
+# Receive Dixa webhook events for cache invalidation if DIXA_WEBHOOK_PORT is set.
+# Started on import so it also runs when FastMCP Cloud imports `mcp` from this module
+start_webhook_server()
 
 if __name__ == "__main__":
     mcp.run()
@@ -0,0 +1,54 @@
+"""
+Shared fixtures for the tool tests.
+
+Every test gets fresh process-wide state (state backend, metrics, breakers,
+in-flight requests) and a Dixa API served by an httpx.MockTransport, so no
+test talks to the network.
+"""
+import os
+import sys
+import tempfile
+from typing import Callable, List
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DIXA_API_KEY", "test-api-key")
+
+from tools import inflight, metrics, page_sizing, resilience, state, transport  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch, tmp_path):
+    """Reset the process-wide state the tools keep between calls"""
+    monkeypatch.setenv("DIXA_API_KEY", "test-api-key")
+    monkeypatch.setenv("DIXA_STATE_BACKEND", "memory")
+    monkeypatch.delenv("DIXA_RATE_LIMIT_PER_SECOND", raising=False)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    monkeypatch.setattr(state, "_backend", None)
+    monkeypatch.setattr(inflight, "_flights", {})
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(page_sizing, "_item_sizes", {})
+    metrics.reset()
+    yield
+
+
+class MockDixa:
+    """Dixa API stand-in: records requests and answers them with a handler"""
+
+    def __init__(self, handler: Callable[[httpx.Request], httpx.Response]):
+        self.handler = handler
+        self.requests: List[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return self.handler(request)
+
+
+@pytest.fixture
+def dixa(monkeypatch):
+    """Route the shared client to a mock; set .handler to answer requests"""
+    api = MockDixa(lambda request: httpx.Response(200, json={"data": []}))
+    monkeypatch.setattr(transport, "_client", httpx.AsyncClient(transport=httpx.MockTransport(api)))
+    return api
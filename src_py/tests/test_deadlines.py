@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from tools.deadlines import DeadlineExceeded, RequestCancelled, call_scope, current_scope
+from tools.endpoints import endpoint_url
+from tools.invocation import tool_invocation
+from tools.utils import request_data
+
+URL = endpoint_url("conversation", conversation_id="7")
+
+
+def _hanging(aborted):
+    """A Dixa that never finishes answering, recording when the request is aborted"""
+    async def handler(request):
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            aborted.append(request)
+            raise
+        return httpx.Response(200, json={})
+    return handler
+
+
+def _wait_until(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "condition not met in time"
+        time.sleep(0.01)
+
+
+def test_deadline_aborts_a_request_waiting_for_its_headers(dixa):
+    aborted = []
+    dixa.handler = _hanging(aborted)
+    started = time.monotonic()
+    with call_scope(0.2), pytest.raises(DeadlineExceeded):
+        request_data("GET", URL)
+    assert time.monotonic() - started < 1.0
+    _wait_until(lambda: len(aborted) == 1)
+
+
+def test_cancelling_the_scope_aborts_the_request_right_away(dixa):
+    aborted = []
+    dixa.handler = _hanging(aborted)
+    outcome = {}
+
+    def invocation():
+        with call_scope(None) as scope:
+            outcome["scope"] = scope
+            try:
+                request_data("GET", URL)
+            except RequestCancelled as e:
+                outcome["error"] = e
+
+    thread = threading.Thread(target=invocation)
+    thread.start()
+    _wait_until(lambda: len(dixa.requests) == 1)
+    outcome["scope"].cancel()
+    thread.join(1.0)
+    assert not thread.is_alive()
+    assert isinstance(outcome["error"], RequestCancelled)
+    _wait_until(lambda: len(aborted) == 1)
+
+
+def test_no_request_is_sent_after_the_deadline(dixa):
+    with call_scope(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            request_data("GET", URL)
+    assert dixa.requests == []
+
+
+def test_child_scope_is_cancelled_with_its_parent_but_not_the_reverse():
+    with call_scope(5.0) as parent:
+        first, second = parent.child(), parent.child()
+        assert first.deadline == parent.deadline
+        first.cancel()
+        assert first.cancelled and not parent.cancelled and not second.cancelled
+        parent.cancel()
+        assert second.cancelled
+        second.close()
+        first.close()
+        assert not parent._children
+
+
+def test_client_cancellation_of_a_tool_call_aborts_its_requests(dixa, monkeypatch):
+    aborted = []
+    dixa.handler = _hanging(aborted)
+    monkeypatch.setenv("DIXA_TOOL_DEADLINE_SECONDS", "0")
+
+    def slow_tool() -> str:
+        """Tool waiting on Dixa"""
+        assert current_scope() is not None
+        return str(request_data("GET", URL))
+
+    async def call_and_cancel():
+        task = asyncio.ensure_future(tool_invocation(slow_tool)())
+        while not dixa.requests:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(call_and_cancel())
+    _wait_until(lambda: len(aborted) == 1)
@@ -0,0 +1,77 @@
+import httpx
+
+from tools import cache
+from tools.endpoints import endpoint_url
+from tools.enrichment import enrich_conversations
+from tools.utils import cached_request_data
+
+
+def _api(request: httpx.Request) -> httpx.Response:
+    path = request.url.path
+    if path == "/v1/tags":
+        return httpx.Response(200, json={"data": [{"id": "t1", "name": "Billing"}, {"id": "t2", "name": "VIP"}]})
+    if path.startswith("/v1/endusers/"):
+        return httpx.Response(200, json={"data": {"id": path.rsplit("/", 1)[1], "displayName": "Ann"}})
+    if path.endswith("/tags"):
+        return httpx.Response(200, json={"data": [{"id": "t1", "name": "Billing", "state": "Active"}]})
+    return httpx.Response(404, json={})
+
+
+def _paths(dixa):
+    return [request.url.path for request in dixa.requests]
+
+
+def test_each_entity_is_looked_up_once(dixa):
+    dixa.handler = _api
+    page = {"data": [
+        {"id": 1, "requesterId": "u1"},
+        {"id": 1, "requesterId": "u1"},
+        {"id": 2, "requesterId": "u1"},
+    ]}
+    enrich_conversations(page)
+    assert sorted(_paths(dixa)) == sorted([
+        "/v1/endusers/u1", "/v1/conversations/1/tags", "/v1/conversations/2/tags",
+    ])
+    assert page["data"][0]["_labels"] == {
+        "requester": {"id": "u1", "name": "Ann", "email": None, "phone": None},
+        "tags": [{"id": "t1", "name": "Billing"}],
+    }
+
+
+def test_tag_ids_and_embedded_tags_need_no_per_conversation_lookup(dixa):
+    dixa.handler = _api
+    page = {"data": [
+        {"id": 1, "tagIds": ["t1", "t2"]},
+        {"id": 2, "tags": ["t2"]},
+        {"id": 3, "tags": [{"id": "t9", "name": "Refund", "color": "red"}]},
+    ]}
+    enrich_conversations(page)
+    assert _paths(dixa) == ["/v1/tags"]
+    assert page["data"][0]["_labels"]["tags"] == [{"id": "t1", "name": "Billing"}, {"id": "t2", "name": "VIP"}]
+    assert page["data"][2]["_labels"]["tags"] == [{"id": "t9", "name": "Refund"}]
+
+
+def test_upstream_tag_lookups_are_capped_per_page(dixa, monkeypatch):
+    dixa.handler = _api
+    monkeypatch.setenv("DIXA_ENRICH_MAX_TAG_LOOKUPS", "2")
+    enrich_conversations({"data": [{"id": 1}]})
+    page = {"data": [{"id": i} for i in range(1, 6)]}
+    enrich_conversations(page)
+    # Conversation 1 was cached by the first page and does not count
+    assert _paths(dixa).count("/v1/conversations/1/tags") == 1
+    assert len(dixa.requests) == 3
+    assert page["_enrichment"]["tags_not_looked_up"] == ["4", "5"]
+    assert page["data"][4]["_labels"]["tags"] is None
+    assert page["data"][0]["_labels"]["tags"] == [{"id": "t1", "name": "Billing"}]
+
+
+def test_cached_get_is_stored_once(dixa, monkeypatch):
+    dixa.handler = _api
+    writes = []
+    original = cache.ResponseCache.set
+    monkeypatch.setattr(cache.ResponseCache, "set", lambda self, key, body: (writes.append(key), original(self, key, body)))
+    url = endpoint_url("tags")
+    first = cached_request_data("GET", url, max_age=60)
+    assert cached_request_data("GET", url, max_age=60) == first
+    assert len(writes) == 1
+    assert len(dixa.requests) == 1
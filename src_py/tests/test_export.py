@@ -0,0 +1,96 @@
+import asyncio
+import json
+import os
+import stat
+
+import httpx
+import pytest
+
+from tools.analytics import export_analytics_records_data
+from tools.deadlines import call_scope
+
+PERIOD = {"from": "2025-01-01", "to": "2025-02-01"}
+PAGES = {
+    None: ([{"id": 1, "csat": True}, {"id": 2, "csat": False}], "p2"),
+    "p2": ([{"id": 3, "csat": 4}], "p3"),
+    "p3": ([{"id": 4, "csat": 5, "agent": {"name": "Ann"}}], None),
+}
+
+
+def _pages(slow_page=""):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        page = request.url.params.get("pageKey")
+        if page == slow_page:
+            await asyncio.sleep(5)
+        rows, next_key = PAGES[page]
+        return httpx.Response(200, json={"data": rows, "meta": {"pageKey": next_key} if next_key else {}})
+    return handler
+
+
+def _export(**kwargs) -> dict:
+    return json.loads(export_analytics_records_data("conversations", PERIOD, "UTC", **kwargs))
+
+
+def _mode(path: str) -> int:
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_export_writes_a_private_file(dixa):
+    dixa.handler = _pages()
+    result = _export(file_format="ndjson")
+    assert result["rows"] == 4 and result["pages"] == 3
+    assert "partial" not in result
+    assert _mode(result["path"]) == 0o600
+    assert _mode(os.path.dirname(result["path"])) == 0o700
+    with open(result["path"]) as file:
+        assert [json.loads(line)["id"] for line in file] == [1, 2, 3, 4]
+    assert os.listdir(os.path.dirname(result["path"])) == [os.path.basename(result["path"])]
+
+
+def test_export_refuses_a_default_directory_owned_by_someone_else(dixa, tmp_path):
+    os.mkdir(tmp_path / f"dixa-mcp-{os.getuid()}", 0o777)
+    os.chmod(tmp_path / f"dixa-mcp-{os.getuid()}", 0o777)
+    with pytest.raises(PermissionError):
+        _export(file_format="ndjson")
+
+
+def test_partial_export_resumes_into_the_same_file(dixa):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    dixa.handler = _pages(slow_page="p3")
+    with call_scope(0.5):
+        partial = _export()
+    assert partial["partial"] is True
+    assert partial["rows"] == 3
+    assert partial["next_page_key"] == "p3"
+    assert pq.read_table(partial["path"]).num_rows == 3
+
+    dixa.handler = _pages()
+    resumed = _export(export_id=partial["export_id"], page_key=partial["next_page_key"])
+    assert "partial" not in resumed
+    assert resumed["path"] == partial["path"]
+    assert resumed["rows"] == 4 and resumed["pages"] == 1
+    table = pq.read_table(resumed["path"])
+    assert table.column("id").to_pylist() == [1, 2, 3, 4]
+    # The schema covers the rows of both calls
+    assert table.schema.field("csat").type == pyarrow.int64()
+    assert table.column("agent.name").to_pylist() == [None, None, None, "Ann"]
+    assert _mode(resumed["path"]) == 0o600
+    # Only the export file is left once it is complete
+    assert os.listdir(os.path.dirname(resumed["path"])) == [os.path.basename(resumed["path"])]
+
+
+def test_resume_needs_matching_arguments(dixa):
+    dixa.handler = _pages(slow_page="p2")
+    with call_scope(0.5):
+        partial = _export(file_format="ndjson")
+    with pytest.raises(ValueError, match="other arguments"):
+        json.loads(export_analytics_records_data(
+            "conversations", {"from": "2024-01-01", "to": "2024-02-01"}, "UTC",
+            file_format="ndjson", export_id=partial["export_id"], page_key=partial["next_page_key"],
+        ))
+    with pytest.raises(ValueError):
+        _export(file_format="ndjson", export_id="../../etc", page_key="p2")
+    with pytest.raises(ValueError):
+        _export(file_format="ndjson", page_key="p2")
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+
+import httpx
+
+from tools.cache import cache_key, response_cache, tenant_id
+from tools.concurrency import run_concurrently
+from tools.deadlines import DeadlineExceeded, call_scope
+from tools.endpoints import endpoint_url
+from tools.state import get_state_backend
+from tools.utils import DixaAPIError, request_data
+
+URL = endpoint_url("conversation", conversation_id="7")
+
+
+def _slow(status=200, delay=0.2):
+    async def handler(request):
+        await asyncio.sleep(delay)
+        return httpx.Response(status, json={"data": {"id": 7, "tags": []}})
+    return handler
+
+
+def test_identical_concurrent_gets_share_one_request(dixa):
+    dixa.handler = _slow()
+    results = run_concurrently([lambda: request_data("GET", URL)] * 5, max_workers=5)
+    assert len(dixa.requests) == 1
+    assert all(result == {"data": {"id": 7, "tags": []}} for result in results)
+    # Every caller gets its own copy
+    results[0]["data"]["tags"].append("changed")
+    assert results[1]["data"]["tags"] == []
+
+
+def test_different_requests_are_not_joined(dixa):
+    dixa.handler = _slow()
+    other = endpoint_url("conversation", conversation_id="8")
+    run_concurrently([lambda: request_data("GET", URL), lambda: request_data("GET", other)], max_workers=2)
+    assert len(dixa.requests) == 2
+
+
+def test_followers_get_the_leaders_error(dixa):
+    dixa.handler = _slow(status=404)
+    results = run_concurrently([lambda: request_data("GET", URL)] * 3, max_workers=3)
+    assert len(dixa.requests) == 1
+    assert all(isinstance(result, DixaAPIError) and result.status_code == 404 for result in results)
+
+
+def test_follower_retries_when_the_leader_ran_out_of_time(dixa):
+    dixa.handler = _slow(delay=0.3)
+    outcome = {}
+
+    def leader():
+        with call_scope(0.1):
+            try:
+                request_data("GET", URL)
+            except DeadlineExceeded as e:
+                outcome["leader"] = e
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    time.sleep(0.02)
+    assert request_data("GET", URL) == {"data": {"id": 7, "tags": []}}
+    thread.join()
+    assert isinstance(outcome["leader"], DeadlineExceeded)
+    assert len(dixa.requests) == 2
+
+
+def test_follower_in_another_process_waits_for_the_leaders_response(dixa, monkeypatch, tmp_path):
+    monkeypatch.setenv("DIXA_STATE_BACKEND", f"sqlite://{tmp_path / 'state.db'}")
+    key = cache_key(tenant_id("test-api-key"), "GET", URL, None)
+    backend = get_state_backend()
+    # Another worker is already fetching this conversation
+    assert backend.acquire_lease(f"inflight:{key}", 5.0)
+
+    def other_worker():
+        time.sleep(0.2)
+        response_cache.set(key, '{"data":{"id":7,"from":"other worker"}}')
+        backend.release_lease(f"inflight:{key}")
+
+    threading.Thread(target=other_worker).start()
+    assert request_data("GET", URL) == {"data": {"id": 7, "from": "other worker"}}
+    assert dixa.requests == []
+
+
+def test_dedupe_can_be_disabled(dixa, monkeypatch):
+    monkeypatch.setenv("DIXA_INFLIGHT_DEDUPE_ENABLED", "false")
+    dixa.handler = _slow()
+    run_concurrently([lambda: request_data("GET", URL)] * 3, max_workers=3)
+    assert len(dixa.requests) == 3
+
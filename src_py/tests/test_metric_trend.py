@@ -0,0 +1,67 @@
+import json
+import time
+from datetime import datetime
+
+import httpx
+
+from tools.analytics import get_analytics_metric_trend
+from tools.state import get_state_backend
+
+
+def _count_response(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"data": [{"measure": "Count", "value": 7}]})
+
+
+def _trend(**kwargs) -> dict:
+    return json.loads(get_analytics_metric_trend(
+        "closed_conversations", ["Count"], "UTC", granularity="day", **kwargs
+    ))
+
+
+def _restamp(stored_at: float) -> None:
+    """Pretend every cached response was stored at the given time"""
+    backend = get_state_backend()
+    for key in backend.cache_keys(""):
+        value, _ = backend.cache_get(key)
+        backend.cache_set(key, value, stored_at)
+
+
+def test_closed_period_fetched_after_its_end_is_reused(dixa):
+    dixa.handler = _count_response
+    first = _trend(periods=2, include_current=False)
+    assert len(dixa.requests) == 2
+    assert all(point["closed"] for point in first["series"])
+
+    # Both days ended before the responses were stored, so their age does not matter
+    _restamp(datetime.fromisoformat(first["series"][-1]["end"]).timestamp())
+    second = _trend(periods=2, include_current=False)
+    assert len(dixa.requests) == 2
+    assert second["series"] == first["series"]
+
+
+def test_result_cached_while_open_is_refetched_after_the_period_closed(dixa):
+    dixa.handler = _count_response
+    _trend(periods=2, include_current=False)
+    assert len(dixa.requests) == 2
+
+    # Stored three days ago, i.e. while both days were still open
+    _restamp(time.time() - 3 * 86400)
+    _trend(periods=2, include_current=False)
+    assert len(dixa.requests) == 4
+
+    # The refetched results were stored after the days ended and are now final
+    _trend(periods=2, include_current=False)
+    assert len(dixa.requests) == 4
+
+
+def test_open_period_is_reused_only_while_recent(dixa, monkeypatch):
+    dixa.handler = _count_response
+    first = _trend(periods=1)
+    assert first["series"][0]["closed"] is False
+    _trend(periods=1)
+    assert len(dixa.requests) == 1
+
+    monkeypatch.setenv("DIXA_TREND_OPEN_PERIOD_MAX_AGE_SECONDS", "0")
+    _restamp(time.time() - 1)
+    _trend(periods=1)
+    assert len(dixa.requests) == 2
@@ -0,0 +1,68 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from tools.analytics.periods import (
+    Period,
+    consecutive_periods,
+    period_start,
+    resolve_preset,
+    shift_period_start,
+    split_period,
+)
+
+CPH = ZoneInfo("Europe/Copenhagen")
+
+
+def test_period_start_for_each_granularity():
+    moment = datetime(2025, 5, 14, 15, 30, tzinfo=CPH)  # a Wednesday
+    assert period_start(moment, "day") == datetime(2025, 5, 14, tzinfo=CPH)
+    assert period_start(moment, "week") == datetime(2025, 5, 12, tzinfo=CPH)
+    assert period_start(moment, "month") == datetime(2025, 5, 1, tzinfo=CPH)
+    assert period_start(moment, "quarter") == datetime(2025, 4, 1, tzinfo=CPH)
+    with pytest.raises(ValueError):
+        period_start(moment, "fortnight")
+
+
+def test_shift_crosses_year_boundaries():
+    assert shift_period_start(datetime(2025, 1, 1, tzinfo=CPH), "month", -1) == datetime(2024, 12, 1, tzinfo=CPH)
+    assert shift_period_start(datetime(2024, 10, 1, tzinfo=CPH), "quarter", 1) == datetime(2025, 1, 1, tzinfo=CPH)
+
+
+def test_day_periods_keep_local_midnight_across_dst():
+    # Clocks went forward on 2025-03-30 in Copenhagen, so that day is 23 hours long
+    periods = consecutive_periods("day", 3, "Europe/Copenhagen", now=datetime(2025, 3, 31, 12, tzinfo=CPH))
+    assert [period.start.day for period in periods] == [29, 30, 31]
+    assert all(period.start.hour == 0 and period.end.hour == 0 for period in periods)
+    assert (periods[1].end.timestamp() - periods[1].start.timestamp()) == 23 * 3600
+
+
+def test_consecutive_periods_are_contiguous_and_end_with_the_current_one():
+    now = datetime(2025, 5, 14, 15, 30, tzinfo=CPH)
+    periods = consecutive_periods("week", 4, "Europe/Copenhagen", now=now)
+    assert len(periods) == 4
+    assert all(earlier.end == later.start for earlier, later in zip(periods, periods[1:]))
+    assert periods[-1].start <= now < periods[-1].end
+    assert not periods[-1].is_closed(now)
+    assert all(period.is_closed(now) for period in periods[:-1])
+
+
+def test_excluding_the_current_period_ends_at_its_start():
+    now = datetime(2025, 5, 14, 15, 30, tzinfo=CPH)
+    periods = consecutive_periods("month", 2, "Europe/Copenhagen", include_current=False, now=now)
+    assert [period.label("month") for period in periods] == ["2025-03", "2025-04"]
+    assert periods[-1].end == datetime(2025, 5, 1, tzinfo=CPH)
+    assert periods[-1].is_closed(now)
+
+
+def test_resolve_preset_and_split():
+    now = datetime(2025, 5, 14, tzinfo=CPH)
+    quarter = resolve_preset("PreviousQuarter", "Europe/Copenhagen", now=now)
+    assert quarter == Period(datetime(2025, 1, 1, tzinfo=CPH), datetime(2025, 4, 1, tzinfo=CPH))
+    months = split_period(quarter, "month")
+    assert [part.label("month") for part in months] == ["2025-01", "2025-02", "2025-03"]
+    weeks = split_period(quarter, "week")
+    # The quarter starts on a Wednesday and ends on a Monday, so the first week is partial
+    assert weeks[0] == Period(datetime(2025, 1, 1, tzinfo=CPH), datetime(2025, 1, 6, tzinfo=CPH))
+    assert weeks[-1].end == quarter.end
@@ -0,0 +1,60 @@
+import json
+from datetime import datetime
+
+import httpx
+
+from tools.analytics.planner import build_plan, execute_plan
+from tools.state import get_state_backend
+
+
+def _records_api(request: httpx.Request) -> httpx.Response:
+    if request.method == "GET":
+        return httpx.Response(200, json={"data": {"id": "conversations"}})
+    return httpx.Response(200, json={"data": [{"id": json.loads(request.content)["periodFilter"]["value"]["start"]}]})
+
+
+def _data_requests(dixa) -> int:
+    return sum(1 for request in dixa.requests if request.method == "POST")
+
+
+def _plan() -> dict:
+    return build_plan("records", "conversations", "UTC", period_preset="PreviousMonth", shard_by="week")
+
+
+def _restamp(stored_at: float) -> None:
+    backend = get_state_backend()
+    for key in backend.cache_keys(""):
+        value, _ = backend.cache_get(key)
+        backend.cache_set(key, value, stored_at)
+
+
+def test_ended_shards_fetched_after_their_end_are_reused(dixa):
+    dixa.handler = _records_api
+    plan = _plan()
+    assert plan["estimate"]["cached_shards"] == 0
+    result = execute_plan(plan)
+    shards = len(plan["shards"])
+    assert result["actual"]["upstream_calls"] == shards
+    assert _data_requests(dixa) == shards
+
+    again = _plan()
+    assert again["estimate"]["cached_shards"] == shards
+    assert again["estimate"]["upstream_calls"] == 0
+    assert execute_plan(again)["actual"]["upstream_calls"] == 0
+    assert _data_requests(dixa) == shards
+
+
+def test_pages_cached_before_a_shard_ended_are_refetched(dixa):
+    dixa.handler = _records_api
+    plan = _plan()
+    execute_plan(plan)
+    shards = len(plan["shards"])
+
+    # Stored while the month was still running, and longer ago than the open-period max age
+    _restamp(datetime.fromisoformat(plan["period"]["start"]).timestamp())
+    stale = _plan()
+    assert stale["estimate"]["cached_shards"] == 0
+    assert execute_plan(stale)["actual"]["upstream_calls"] == shards
+    assert _data_requests(dixa) == 2 * shards
+
+    assert _plan()["estimate"]["cached_shards"] == shards
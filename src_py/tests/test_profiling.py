@@ -0,0 +1,75 @@
+import os
+import pstats
+import threading
+import time
+
+import pytest
+
+from tools import profiling
+from tools.cache import tenant_id
+from tools.concurrency import run_concurrently
+from tools.info import configure_profiling
+from tools.utils import set_session
+
+
+@pytest.fixture(autouse=True)
+def profile_everything(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "_config", None)
+    monkeypatch.setenv("DIXA_PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setenv("DIXA_PROFILE_TOOLS", "fan_out_tool")
+
+
+def fan_out_worker_marker():
+    time.sleep(0.05)
+    return threading.current_thread().name
+
+
+def fan_out_tool():
+    return run_concurrently([fan_out_worker_marker, fan_out_worker_marker], max_workers=2)
+
+
+def test_deterministic_profile_includes_fan_out_threads(monkeypatch):
+    monkeypatch.setenv("DIXA_PROFILE_MODE", "deterministic")
+    names = profiling.run_profiled("fan_out_tool", fan_out_tool)
+    assert all(name != threading.current_thread().name for name in names)
+    [profile] = profiling.recent_profiles()
+    functions = {name for (_, _, name) in pstats.Stats(profile["path"]).stats}
+    assert "fan_out_worker_marker" in functions
+
+
+def test_sampling_profile_includes_fan_out_threads(monkeypatch):
+    monkeypatch.setenv("DIXA_PROFILE_MODE", "sampling")
+    monkeypatch.setenv("DIXA_PROFILE_SAMPLE_INTERVAL_MS", "1")
+    profiling.run_profiled("fan_out_tool", fan_out_tool)
+    [profile] = profiling.recent_profiles()
+    with open(profile["path"]) as folded:
+        assert "fan_out_worker_marker" in folded.read()
+
+
+def test_workers_outside_a_profiled_call_are_not_profiled():
+    run_concurrently([fan_out_worker_marker], max_workers=1)
+    assert not os.path.exists(profiling.profile_dir()) or profiling.recent_profiles() == []
+
+
+def test_configure_profiling_is_limited_to_admin_tenants(monkeypatch):
+    monkeypatch.setenv("DIXA_ADMIN_TOOLS_ENABLED", "true")
+    # The server's own API key is an admin by default
+    configure_profiling(sample_rate=0.5)
+    assert profiling.get_config()["sample_rate"] == 0.5
+
+    # A client connecting with another organization's key is not
+    set_session({"apiKey": "other-tenant-key"})
+    try:
+        with pytest.raises(PermissionError):
+            configure_profiling(sample_rate=1.0)
+        monkeypatch.setenv("DIXA_ADMIN_TENANTS", tenant_id("other-tenant-key"))
+        configure_profiling(sample_rate=1.0)
+    finally:
+        set_session(None)
+    assert profiling.get_config()["sample_rate"] == 1.0
+
+
+def test_configure_profiling_requires_admin_tools(monkeypatch):
+    monkeypatch.delenv("DIXA_ADMIN_TOOLS_ENABLED", raising=False)
+    with pytest.raises(PermissionError):
+        configure_profiling()
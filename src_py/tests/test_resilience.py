@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import pytest
+
+import httpx
+
+from tools import metrics
+from tools.deadlines import DeadlineExceeded, call_scope
+from tools.endpoints import endpoint_url
+from tools.utils import request_data
+
+
+def _wait_until(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "condition not met in time"
+        time.sleep(0.01)
+
+
+def _hedge_fast(monkeypatch):
+    monkeypatch.setenv("DIXA_HEDGE_ENABLED", "true")
+    monkeypatch.setenv("DIXA_HEDGE_DELAY_MS", "50")
+    monkeypatch.setenv("DIXA_HEDGE_MIN_DELAY_MS", "50")
+
+
+def test_hedge_answers_and_cancels_the_slow_request(dixa, monkeypatch):
+    _hedge_fast(monkeypatch)
+    cancelled = []
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelled.append(request)
+                raise
+        return httpx.Response(200, json={"data": {"id": "c1"}})
+
+    dixa.handler = handler
+    result = request_data("GET", endpoint_url("conversation", conversation_id="c1"))
+
+    assert result == {"data": {"id": "c1"}}
+    assert len(calls) == 2
+    counters = metrics.snapshot()["conversation"]["counters"]
+    assert counters["hedge_wins"] == 1
+    assert counters["hedges_cancelled"] == 1
+    # The primary request is aborted instead of being left to run for 30 seconds
+    _wait_until(lambda: len(cancelled) == 1)
+    assert cancelled == calls[:1]
+
+
+def test_hedge_is_not_sent_for_fast_requests(dixa, monkeypatch):
+    _hedge_fast(monkeypatch)
+    request_data("GET", endpoint_url("conversation", conversation_id="c1"))
+    assert len(dixa.requests) == 1
+
+
+def test_cancelling_the_invocation_still_cancels_both_requests(dixa, monkeypatch):
+    _hedge_fast(monkeypatch)
+    cancelled = []
+
+    async def handler(request):
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.append(request)
+            raise
+        return httpx.Response(200, json={})
+
+    dixa.handler = handler
+    with call_scope(0.3), pytest.raises(DeadlineExceeded):
+        request_data("GET", endpoint_url("conversation", conversation_id="c1"))
+    _wait_until(lambda: len(cancelled) == 2)
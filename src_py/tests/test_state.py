@@ -0,0 +1,61 @@
+import os
+import stat
+
+from tools import state
+from tools.state import MemoryBackend, SQLiteBackend
+
+
+def test_memory_cache_is_bounded_by_bytes_not_entries():
+    backend = MemoryBackend(max_bytes=10_000)
+    for i in range(5000):
+        backend.cache_set(f"k{i}", b"x" * 2, float(i))
+    # Well beyond the old default of 1000 entries, as they fit in the byte budget
+    assert backend.cache_size() == 5000
+    for i in range(100):
+        backend.cache_set(f"big{i}", b"y" * 1000, 10_000.0 + i)
+    assert backend.cache_bytes() <= 10_000
+    assert backend.cache_get("big99") is not None
+    assert backend.cache_get("k0") is None
+
+
+def test_memory_cache_evicts_least_recently_used():
+    backend = MemoryBackend(max_bytes=30)
+    backend.cache_set("a", b"x" * 10, 1.0)
+    backend.cache_set("b", b"x" * 10, 2.0)
+    backend.cache_set("c", b"x" * 10, 3.0)
+    backend.cache_get("a")
+    backend.cache_set("d", b"x" * 10, 4.0)
+    assert backend.cache_keys("") == ["c", "a", "d"]
+
+
+def test_sqlite_cache_prunes_oldest_entries_beyond_the_byte_budget(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "state.db"), max_bytes=100_000)
+    for i in range(300):
+        backend.cache_set(f"k{i:03d}", os.urandom(1000), float(i))
+    stored = backend.cache_bytes()
+    # Pruning runs periodically, so the budget may be exceeded by one prune interval at most
+    assert stored <= 100_000 + 100_000 * SQLiteBackend._PRUNE_BYTES_SHARE + 1000
+    assert backend.cache_get("k299") is not None
+    assert backend.cache_get("k000") is None
+    assert stored == sum(len(backend.cache_get(key)[0]) for key in backend.cache_keys(""))
+
+
+def test_sqlite_cache_keeps_many_small_entries(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "state.db"), max_bytes=1_000_000)
+    for i in range(1500):
+        backend.cache_set(f"k{i}", b"x" * 10, float(i))
+    assert backend.cache_size() == 1500
+
+
+def test_sqlite_database_is_private(tmp_path):
+    path = str(tmp_path / "state.db")
+    SQLiteBackend(path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_default_limits(monkeypatch):
+    monkeypatch.delenv("DIXA_CACHE_MAX_ENTRIES", raising=False)
+    monkeypatch.delenv("DIXA_CACHE_MAX_BYTES", raising=False)
+    backend = state.get_state_backend()
+    assert backend.max_entries == 0
+    assert backend.max_bytes == 256 * 1024 * 1024
@@ -0,0 +1,65 @@
+import http.client
+import json
+import socket
+
+import pytest
+
+from tools import webhooks
+from tools.cache import cache_key, response_cache, tenant_id
+from tools.endpoints import endpoint_url
+
+SECRET = "webhook-secret"
+
+
+@pytest.fixture
+def receiver(monkeypatch):
+    monkeypatch.setenv("DIXA_WEBHOOK_SECRET", SECRET)
+    monkeypatch.setenv("DIXA_WEBHOOK_PORT", str(_free_port()))
+    monkeypatch.setenv("DIXA_WEBHOOK_MAX_BODY_BYTES", "1000")
+    monkeypatch.setattr(webhooks, "_server", None)
+    server = webhooks.start_webhook_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _post(server, body: bytes, headers: dict) -> http.client.HTTPResponse:
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=2)
+    connection.putrequest("POST", "/webhooks/dixa", skip_accept_encoding=True)
+    for name, value in {"Authorization": f"Bearer {SECRET}", **headers}.items():
+        connection.putheader(name, value)
+    connection.endheaders(body)
+    return connection.getresponse()
+
+
+@pytest.mark.parametrize("length", ["-1", "abc"])
+def test_invalid_content_length_is_rejected_without_reading(receiver, length):
+    response = _post(receiver, b"{}", {"Content-Length": length})
+    assert response.status == 400
+
+
+def test_oversized_body_is_rejected(receiver):
+    response = _post(receiver, b"{}", {"Content-Length": "1000000"})
+    assert response.status == 413
+
+
+def test_valid_event_is_applied_to_the_cache(receiver):
+    url = endpoint_url("conversation", conversation_id="42")
+    key = cache_key(tenant_id("test-api-key"), "GET", url, None)
+    response_cache.set(key, json.dumps({"data": {"id": 42, "state": "Open"}}))
+    body = json.dumps({"event_fqn": "CONVERSATION_CLOSED", "data": {"conversation": {"csid": 42}}}).encode()
+    response = _post(receiver, body, {"Content-Length": str(len(body))})
+    assert response.status == 200
+    assert json.loads(response.read())["results"][0]["patched"] == 1
+    assert json.loads(response_cache.get(key).body)["data"]["state"] == "Closed"
+
+
+def test_unknown_secret_is_unauthorized(receiver):
+    response = _post(receiver, b"{}", {"Content-Length": "2", "Authorization": "Bearer nope"})
+    assert response.status == 401
@@ -1,8 +1,10 @@
 from .get_agent import get_agent
 from .list_agents import list_agents
+from .lookup_agents import lookup_agents
 
 __all__ = [
     "get_agent",
     "list_agents",
+    "lookup_agents",
 ]
 
@@ -0,0 +1,285 @@
+"""
+Locally maintained, indexed directory of Dixa agents.
+
+The directory pages through all agents once per tenant and keeps them indexed
+by ID, email and phone number (dict lookups) and by name (a sorted list of
+name tokens for prefix search, with a fuzzy fallback). A background thread
+re-pages the agent list every DIXA_AGENT_DIRECTORY_REFRESH_SECONDS, applying
+each page to the live index as it arrives and dropping agents that are gone.
+A directory not used for DIXA_AGENT_DIRECTORY_IDLE_SECONDS stops refreshing
+and is evicted, so upstream load follows the tenants currently using the
+server rather than every tenant ever seen; it is loaded again on next use.
+"""
+import bisect
+import difflib
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from tools.cache import tenant_id
+from tools.endpoints import endpoint_url
+from tools.pagination import iter_pages, page_items
+from tools.settings import env_float, env_int
+from tools.utils import get_api_key, get_current_session
+
+
+def normalize_email(email: str) -> str:
+    """Normalize an email address for lookup"""
+    return email.strip().lower()
+
+
+def normalize_phone(phone: str) -> str:
+    """Normalize a phone number for lookup by keeping only its digits"""
+    return re.sub(r"\D", "", phone)
+
+
+def _name_tokens(name: str) -> List[str]:
+    """Split a name into lowercase tokens, including the full name itself"""
+    full = " ".join(name.lower().split())
+    tokens = [full] if full else []
+    tokens.extend(token for token in full.split(" ") if token and token != full)
+    return tokens
+
+
+def compact_agent(agent: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce an agent to the fields needed to identify it"""
+    return {
+        "id": agent.get("id"),
+        "name": agent.get("displayName") or agent.get("name"),
+        "email": agent.get("email"),
+        "phone": agent.get("phoneNumber"),
+    }
+
+
+class AgentDirectory:
+    """Indexed agent directory for a single tenant"""
+
+    def __init__(self, session: Optional[Dict[str, Any]] = None):
+        self._session = session
+        self._lock = threading.RLock()
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_email: Dict[str, str] = {}
+        self._by_phone: Dict[str, str] = {}
+        # Sorted (name token, agent id) pairs for prefix search
+        self._names: List[Tuple[str, str]] = []
+        self._refreshing = threading.Lock()
+        self._loaded = threading.Event()
+        self._refreshed_at: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        self._used_at = time.monotonic()
+
+    def _touch(self) -> None:
+        self._used_at = time.monotonic()
+
+    def idle_seconds(self) -> float:
+        """Seconds since the directory was last used"""
+        return time.monotonic() - self._used_at
+
+    def _index_keys(self, agent: Dict[str, Any]):
+        emails = [agent.get("email")] + list(agent.get("additionalEmails") or [])
+        phones = [agent.get("phoneNumber")] + list(agent.get("additionalPhoneNumbers") or [])
+        names = [agent.get("displayName") or agent.get("name") or ""]
+        if agent.get("firstName") or agent.get("lastName"):
+            names.append(f"{agent.get('firstName') or ''} {agent.get('lastName') or ''}")
+        email_keys = {normalize_email(e) for e in emails if isinstance(e, str) and e.strip()}
+        phone_keys = {normalize_phone(p) for p in phones if isinstance(p, str) and normalize_phone(p)}
+        name_keys = {token for name in names for token in _name_tokens(name)}
+        return email_keys, phone_keys, name_keys
+
+    def _remove(self, agent_id: str) -> None:
+        agent = self._by_id.pop(agent_id, None)
+        if agent is None:
+            return
+        email_keys, phone_keys, name_keys = self._index_keys(agent)
+        for key in email_keys:
+            if self._by_email.get(key) == agent_id:
+                del self._by_email[key]
+        for key in phone_keys:
+            if self._by_phone.get(key) == agent_id:
+                del self._by_phone[key]
+        for key in name_keys:
+            index = bisect.bisect_left(self._names, (key, agent_id))
+            if index < len(self._names) and self._names[index] == (key, agent_id):
+                del self._names[index]
+
+    def _upsert(self, agent: Dict[str, Any]) -> None:
+        agent_id = agent.get("id")
+        if not agent_id:
+            return
+        agent_id = str(agent_id)
+        self._remove(agent_id)
+        self._by_id[agent_id] = agent
+        email_keys, phone_keys, name_keys = self._index_keys(agent)
+        for key in email_keys:
+            self._by_email[key] = agent_id
+        for key in phone_keys:
+            self._by_phone[key] = agent_id
+        for key in name_keys:
+            bisect.insort(self._names, (key, agent_id))
+
+    def refresh(self, log=None) -> None:
+        """
+        Page through all agents and apply them to the index.
+
+        Each page is applied as soon as it arrives so lookups keep working
+        during a refresh; agents not seen in any page are removed at the end.
+        Concurrent calls wait for the refresh already in progress.
+        """
+        if not self._refreshing.acquire(blocking=False):
+            # Another thread is refreshing; wait for it instead of paging twice
+            with self._refreshing:
+                return
+        try:
+            seen: Set[str] = set()
+            for response in iter_pages(
+                "GET",
+                endpoint_url("agents"),
+                page_limit=env_int("DIXA_AGENT_DIRECTORY_PAGE_LIMIT", 100),
+                log=log,
+                session=self._session,
+            ):
+                agents = [agent for agent in page_items(response) if isinstance(agent, dict)]
+                with self._lock:
+                    for agent in agents:
+                        self._upsert(agent)
+                        if agent.get("id"):
+                            seen.add(str(agent["id"]))
+            with self._lock:
+                for agent_id in set(self._by_id) - seen:
+                    self._remove(agent_id)
+                self._refreshed_at = time.time()
+                self._last_error = None
+            self._loaded.set()
+        except Exception as e:
+            self._last_error = str(e)
+            raise
+        finally:
+            self._refreshing.release()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            time.sleep(env_float("DIXA_AGENT_DIRECTORY_REFRESH_SECONDS", 300.0))
+            if self.idle_seconds() >= _idle_timeout():
+                with self._lock:
+                    self._thread = None
+                _evict(self)
+                return
+            try:
+                self.refresh()
+            except Exception:
+                # Keep serving the previous index; the error is reported in status()
+                pass
+
+    def ensure_loaded(self, log=None) -> None:
+        """Load the directory on first use and start the background refresh"""
+        self._touch()
+        if not self._loaded.is_set():
+            self.refresh(log=log)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._refresh_loop, name="dixa-agent-directory", daemon=True
+                )
+                self._thread.start()
+
+    def get(self, agent_id: str) -> Optional[Dict[str, Any]]:
+        """Look up an agent by ID"""
+        self._touch()
+        with self._lock:
+            return self._by_id.get(str(agent_id))
+
+    def find_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """Look up an agent by (primary or additional) email address"""
+        self._touch()
+        with self._lock:
+            agent_id = self._by_email.get(normalize_email(email))
+            return self._by_id.get(agent_id) if agent_id else None
+
+    def find_by_phone(self, phone: str) -> Optional[Dict[str, Any]]:
+        """Look up an agent by (primary or additional) phone number"""
+        self._touch()
+        with self._lock:
+            agent_id = self._by_phone.get(normalize_phone(phone))
+            return self._by_id.get(agent_id) if agent_id else None
+
+    def find_by_name(self, name: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Look up agents whose full name, first name or last name starts with name.
+        Falls back to fuzzy matching when nothing matches the prefix.
+        """
+        self._touch()
+        query = " ".join(name.lower().split())
+        if not query:
+            return []
+        with self._lock:
+            ids: List[str] = []
+            index = bisect.bisect_left(self._names, (query, ""))
+            while index < len(self._names) and len(ids) < limit:
+                token, agent_id = self._names[index]
+                if not token.startswith(query):
+                    break
+                if agent_id not in ids:
+                    ids.append(agent_id)
+                index += 1
+            if not ids:
+                tokens = sorted({token for token, _ in self._names})
+                for match in difflib.get_close_matches(query, tokens, n=limit, cutoff=0.6):
+                    index = bisect.bisect_left(self._names, (match, ""))
+                    while index < len(self._names) and self._names[index][0] == match:
+                        if self._names[index][1] not in ids:
+                            ids.append(self._names[index][1])
+                        index += 1
+            return [self._by_id[agent_id] for agent_id in ids[:limit]]
+
+    def status(self) -> Dict[str, Any]:
+        """Get the size and freshness of the directory"""
+        with self._lock:
+            return {
+                "agents": len(self._by_id),
+                "refreshed_at": self._refreshed_at,
+                "age_seconds": round(time.time() - self._refreshed_at) if self._refreshed_at else None,
+                "last_error": self._last_error,
+            }
+
+
+_directories: Dict[str, AgentDirectory] = {}
+_directories_lock = threading.Lock()
+
+
+def _idle_timeout() -> float:
+    return env_float("DIXA_AGENT_DIRECTORY_IDLE_SECONDS", 1800.0)
+
+
+def _evict(directory: AgentDirectory) -> None:
+    with _directories_lock:
+        for tenant, candidate in list(_directories.items()):
+            if candidate is directory:
+                del _directories[tenant]
+
+
+def get_agent_directory(session: Optional[Dict[str, Any]] = None) -> AgentDirectory:
+    """
+    Get the agent directory of the current tenant, creating it on first use.
+
+    Args:
+        session: Optional session context that may contain auth information
+                 If not provided, will try to get from context variable
+
+    Returns:
+        The tenant's AgentDirectory
+    """
+    if session is None:
+        session = get_current_session()
+    tenant = tenant_id(get_api_key(session))
+    with _directories_lock:
+        # Drop idle directories whose background refresh never started (e.g. failed first load)
+        for other, candidate in list(_directories.items()):
+            if candidate._thread is None and candidate.idle_seconds() >= _idle_timeout():
+                del _directories[other]
+        directory = _directories.get(tenant)
+        if directory is None:
+            directory = AgentDirectory(session=session)
+            _directories[tenant] = directory
+        return directory
@@ -1,4 +1,5 @@
 """Get information about a specific agent from Dixa"""
+from tools.endpoints import endpoint_url
 from tools.utils import make_request
 
 
@@ -13,7 +14,7 @@ def get_agent(agent_id: str, log=None) -> str:
     Returns:
         JSON string of the agent data
     """
-    url = f"https://dev.dixa.io/v1/agents/{agent_id}"
+    url = endpoint_url("agent", agent_id=agent_id)
     data = make_request("GET", url, log=log)
     return data
 
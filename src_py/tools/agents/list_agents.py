@@ -1,14 +1,26 @@
 """List all agents from Dixa with optional filtering and pagination support"""
 from typing import Optional
+from tools.endpoints import endpoint_url
+from tools.page_sizing import choose_page_limit
 from tools.utils import make_request
 
 
-def list_agents(page_limit: int = 50, log=None) -> str:
+def list_agents(
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    page_key: Optional[str] = None,
+    page_limit: Optional[int] = None,
+    log=None,
+) -> str:
     """
     List all agents from Dixa to find the agent ID with optional filtering by email and phone, and pagination support.
+    To find a specific agent, prefer lookupAgents which does not return the whole list.
     
     Args:
-        page_limit: Number of results per page (default: 50)
+        email: Only return the agent with this email address
+        phone: Only return the agent with this phone number
+        page_key: Pagination key for next page of results
+        page_limit: Number of results per page (default: chosen automatically from the typical size of results)
         log: Optional logger for debugging
     
     Returns:
@@ -16,10 +28,14 @@ def list_agents(page_limit: int = 50, log=None) -> str:
     """
     params = {}
     
-    if page_limit is not None:
-        params["pageLimit"] = str(page_limit)
+    if email:
+        params["email"] = email
+    if phone:
+        params["phone"] = phone
+    if page_key:
+        params["pageKey"] = page_key
+    params["pageLimit"] = str(choose_page_limit("agents", page_limit))
     
-    url = "https://dev.dixa.io/v1/agents"
+    url = endpoint_url("agents")
     data = make_request("GET", url, params=params, log=log)
     return data
-
@@ -0,0 +1,59 @@
+"""Look up agents in the locally indexed agent directory"""
+import json
+from typing import Optional
+from tools.agents.agent_directory import compact_agent, get_agent_directory
+
+
+def lookup_agents(
+    agent_id: Optional[str] = None,
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    name: Optional[str] = None,
+    limit: int = 10,
+    log=None,
+) -> str:
+    """
+    Look up agents by ID, email, phone number or name without listing all agents.
+    Prefer this over listAgents to find an agent ID. Lookups are served from a local
+    agent directory that is kept up to date in the background.
+    
+    Args:
+        agent_id: The ID of the agent to look up
+        email: Email address of the agent (exact match, case-insensitive)
+        phone: Phone number of the agent (exact match, formatting is ignored)
+        name: Name or start of the first name, last name or full name of the agent
+            (falls back to fuzzy matching when nothing starts with it)
+        limit: Maximum number of agents to return for a name lookup (default: 10)
+        log: Optional logger for debugging
+    
+    Returns:
+        JSON string of the matching agents (id, name, email, phone)
+    """
+    if not any([agent_id, email, phone, name]):
+        raise ValueError("Provide at least one of agent_id, email, phone or name")
+    
+    directory = get_agent_directory()
+    directory.ensure_loaded(log=log)
+    
+    matches = []
+    if agent_id:
+        matches.append(directory.get(agent_id))
+    if email:
+        matches.append(directory.find_by_email(email))
+    if phone:
+        matches.append(directory.find_by_phone(phone))
+    if name:
+        matches.extend(directory.find_by_name(name, limit=limit))
+    
+    agents = []
+    seen = set()
+    for agent in matches:
+        if agent is not None and agent.get("id") not in seen:
+            seen.add(agent.get("id"))
+            agents.append(compact_agent(agent))
+    
+    result = {
+        "data": agents,
+        "directory": directory.status(),
+    }
+    return json.dumps(result, indent=2)
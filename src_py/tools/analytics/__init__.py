@@ -3,8 +3,13 @@ from .get_analytics_record import get_analytics_record
 from .list_analytics_records import list_analytics_records
 from .list_analytics_metrics import list_analytics_metrics
 from .get_analytics_filter import get_analytics_filter
+from .search_analytics_filter_values import search_analytics_filter_values
 from .get_analytics_records_data import get_analytics_records_data
 from .get_analytics_metrics_data import get_analytics_metrics_data
+from .get_analytics_metric_trend import get_analytics_metric_trend
+from .export_analytics_records_data import export_analytics_records_data
+from .plan_analytics_query import plan_analytics_query
+from .execute_analytics_plan import execute_analytics_plan
 
 __all__ = [
     "get_analytics_metric",
@@ -12,7 +17,12 @@ __all__ = [
     "list_analytics_records",
     "list_analytics_metrics",
     "get_analytics_filter",
+    "search_analytics_filter_values",
     "get_analytics_records_data",
     "get_analytics_metrics_data",
+    "get_analytics_metric_trend",
+    "export_analytics_records_data",
+    "plan_analytics_query",
+    "execute_analytics_plan",
 ]
 
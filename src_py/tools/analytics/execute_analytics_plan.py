@@ -0,0 +1,20 @@
+"""Run an analytics query planned with planAnalyticsQuery"""
+import json
+from tools.analytics.planner import execute_plan, load_plan
+
+
+def execute_analytics_plan(plan_id: str, log=None) -> str:
+    """
+    Run an analytics query planned with planAnalyticsQuery. The exact requests of the plan
+    are sent, cached shards are served from the cache, and the data of each shard is
+    returned with the actual number of pages and upstream calls next to the estimate.
+
+    Args:
+        plan_id: The plan_id returned by planAnalyticsQuery
+        log: Optional logger for debugging
+
+    Returns:
+        JSON string of the data of each shard and the actual cost of the query
+    """
+    result = execute_plan(load_plan(plan_id), log=log)
+    return json.dumps(result, indent=2)
@@ -0,0 +1,169 @@
+"""Export all analytics data of a record from Dixa to a local columnar file"""
+import json
+import os
+import re
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+from tools.analytics.record_export import (
+    FORMATS,
+    convert_spool,
+    export_dir,
+    pyarrow_available,
+    spool_rows,
+)
+from tools.deadlines import DeadlineExceeded
+from tools.endpoints import endpoint_url
+from tools.page_sizing import choose_page_limit
+from tools.pagination import next_page_key, page_items
+from tools.settings import env_int
+from tools.state import create_private_file
+from tools.utils import request_data
+
+# Export ids are file names in the export directory
+_EXPORT_ID = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]*$")
+
+# Suffix of the file keeping the request of a partial export for resuming it
+_REQUEST_SUFFIX = ".request.json"
+
+
+def _load_request(base: str, export_id: str) -> Dict[str, Any]:
+    if not os.path.exists(base + FORMATS["ndjson"]) or not os.path.exists(base + _REQUEST_SUFFIX):
+        raise ValueError(f"Export '{export_id}' does not exist or is already complete")
+    with open(base + _REQUEST_SUFFIX, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _save_request(path: str, url: str, body: Dict[str, Any], page_limit: int) -> None:
+    create_private_file(path)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"url": url, "body": body, "page_limit": page_limit}, file)
+
+
+def export_analytics_records_data(
+    record_id: str,
+    period_filter: Dict[str, str],
+    timezone: str,
+    filters: Optional[Dict[str, List[str]]] = None,
+    file_format: str = "parquet",
+    page_key: Optional[str] = None,
+    export_id: Optional[str] = None,
+    log=None,
+) -> str:
+    """
+    Export all analytics data of a record to a local file for offline reporting.
+    Use this instead of paging through getAnalyticsRecordsData when every row is
+    needed: all pages are streamed straight into the file and only a summary is
+    returned.
+    An export that runs out of time returns what it has so far with 'partial',
+    'export_id' and 'next_page_key'; call again with the same arguments plus
+    export_id and page_key to add the remaining rows to the same file.
+
+    Args:
+        record_id: The ID of the record to export data for
+        period_filter: Time period to export data for (dict with 'from' and 'to' ISO format dates)
+        timezone: Timezone to use for the data (e.g., 'Europe/Copenhagen')
+        filters: Optional filters to apply to the data (dict mapping attribute names to lists of values)
+        file_format: 'parquet', 'arrow' or 'ndjson' (default: 'parquet'; falls back to 'ndjson'
+            if pyarrow is not installed)
+        page_key: The next_page_key of a partial export, to resume it (requires export_id)
+        export_id: The export_id of a partial export, to resume it (requires page_key)
+        log: Optional logger for debugging
+
+    Returns:
+        JSON string with the file path, row count and column schema of the export
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Unsupported file_format '{file_format}'. Use one of: {', '.join(FORMATS)}")
+    if bool(page_key) != bool(export_id):
+        raise ValueError("Resume a partial export by passing both its export_id and its next_page_key as page_key")
+    result: Dict[str, Any] = {"record_id": record_id, "requested_format": file_format}
+    if file_format != "ndjson" and not pyarrow_available():
+        result["note"] = "pyarrow is not installed (pip install pyarrow); exported as NDJSON instead"
+        file_format = "ndjson"
+
+    url = endpoint_url("analytics_records_data", record_id=record_id)
+    json_data: Dict[str, Any] = {"periodFilter": period_filter, "timezone": timezone}
+    if filters:
+        json_data["filters"] = filters
+
+    if export_id:
+        if not _EXPORT_ID.match(export_id):
+            raise ValueError(f"Invalid export_id '{export_id}'")
+        base = os.path.join(export_dir(), export_id)
+        request = _load_request(base, export_id)
+        if request["url"] != url or request["body"] != json_data:
+            raise ValueError(
+                f"Export '{export_id}' was started with other arguments; resume it with the same ones"
+            )
+        page_limit = request["page_limit"]
+    else:
+        safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", record_id)
+        export_id = f"{safe_id}-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        base = os.path.join(export_dir(), export_id)
+        # Keep the page size for resuming, as page keys belong to it
+        page_limit = env_int("DIXA_EXPORT_PAGE_LIMIT", 0) or None
+        page_limit = choose_page_limit("analytics_records_data", page_limit, method="POST")
+    params: Dict[str, Any] = {"pageLimit": str(page_limit)}
+    progress: Dict[str, Any] = {"pages": 0, "next_page_key": page_key}
+
+    def rows() -> Iterator[Any]:
+        # Pages are requested one at a time, so only the current page is held in memory
+        while True:
+            if progress["next_page_key"]:
+                params["pageKey"] = progress["next_page_key"]
+            try:
+                response = request_data("POST", url, params=params, json_data=json_data, log=log)
+            except DeadlineExceeded:
+                # Keep what was written; the export can be resumed from next_page_key
+                progress["partial"] = True
+                return
+            progress["pages"] += 1
+            progress["next_page_key"] = next_page_key(response)
+            yield from page_items(response)
+            if not progress["next_page_key"]:
+                return
+
+    spool_path = base + FORMATS["ndjson"]
+    request_path = base + _REQUEST_SUFFIX
+    path = base + FORMATS[file_format]
+    resumed = bool(page_key)
+    spooled_bytes = os.path.getsize(spool_path) if resumed else 0
+    try:
+        spooled = spool_rows(rows(), spool_path, append=resumed)
+        if file_format != "ndjson":
+            convert_spool(spool_path, path, file_format, spooled["schema"])
+    except BaseException:
+        if resumed:
+            # Drop only this call's rows, so the same resume can be retried
+            os.truncate(spool_path, spooled_bytes)
+        else:
+            for leftover in (spool_path, path):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+        raise
+
+    if progress.get("partial"):
+        # Keep the spool and the request, so the export can be resumed
+        _save_request(request_path, url, json_data, page_limit)
+    else:
+        if file_format != "ndjson":
+            os.remove(spool_path)
+        if os.path.exists(request_path):
+            os.remove(request_path)
+
+    result.update({
+        "export_id": export_id,
+        "path": path,
+        "format": file_format,
+        "rows": spooled["rows"],
+        "pages": progress["pages"],
+        "size_bytes": os.path.getsize(path),
+        "schema": spooled["schema"].summary(),
+    })
+    if progress.get("partial"):
+        # The deadline passed before the last page; pass export_id and next_page_key to continue
+        result["partial"] = True
+        result["next_page_key"] = progress["next_page_key"]
+    return json.dumps(result, indent=2)
+
@@ -0,0 +1,212 @@
+"""
+Local search index of analytics filter values.
+
+For each tenant and filter attribute (e.g. 'queue_id'), all pages of
+/v1/analytics/filter/{attribute} are drained once and stored compactly:
+labels and values are interned and kept in arrays sorted by lowercase label,
+so a prefix search is a binary search, and all lowercase labels are joined
+into one string so a substring search is a series of str.find() calls.
+
+Indexes are rebuilt in a background thread once they are older than
+DIXA_FILTER_INDEX_TTL_SECONDS; the previous index keeps serving meanwhile.
+"""
+import bisect
+import sys
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.cache import tenant_id
+from tools.endpoints import endpoint_url
+from tools.pagination import iter_pages, page_items
+from tools.settings import env_float, env_int
+from tools.utils import get_api_key, get_current_session
+
+# Separator between labels in the joined search string; cannot occur in a label
+_SEPARATOR = "\x00"
+
+
+def _value_and_label(item: Any) -> Optional[Tuple[str, str]]:
+    """Extract (value, label) from a filter value item"""
+    if isinstance(item, dict):
+        value = item.get("value", item.get("id"))
+        label = item.get("label", item.get("name", value))
+    else:
+        value = label = item
+    if value is None:
+        return None
+    label = str(label if label is not None else value).replace(_SEPARATOR, " ")
+    return str(value), label
+
+
+class FilterValueIndex:
+    """Immutable, sorted index of the values of one filter attribute"""
+
+    def __init__(self, items: List[Tuple[str, str]]):
+        items = sorted(set(items), key=lambda item: (item[1].lower(), item[0]))
+        self.values: Tuple[str, ...] = tuple(sys.intern(value) for value, _ in items)
+        self.labels: Tuple[str, ...] = tuple(sys.intern(label) for _, label in items)
+        self.keys: Tuple[str, ...] = tuple(sys.intern(label.lower()) for label in self.labels)
+        # Positions ordered by value, for exact value lookups
+        self._by_value = array("I", sorted(range(len(self.values)), key=self.values.__getitem__))
+        self._joined = _SEPARATOR.join(self.keys)
+        # Offset of each key in the joined string
+        self._offsets = array("I")
+        offset = 0
+        for key in self.keys:
+            self._offsets.append(offset)
+            offset += len(key) + 1
+        self.built_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _entry(self, index: int) -> Dict[str, str]:
+        return {"value": self.values[index], "label": self.labels[index]}
+
+    def exact(self, value: str) -> List[int]:
+        """Get the position of the entry whose value is exactly value"""
+        start = bisect.bisect_left(self._by_value, value, key=self.values.__getitem__)
+        if start < len(self._by_value) and self.values[self._by_value[start]] == value:
+            return [self._by_value[start]]
+        return []
+
+    def prefix(self, query: str, limit: int) -> List[int]:
+        """Get the positions of labels starting with query"""
+        query = query.lower()
+        start = bisect.bisect_left(self.keys, query)
+        matches = []
+        for index in range(start, len(self.keys)):
+            if len(matches) >= limit or not self.keys[index].startswith(query):
+                break
+            matches.append(index)
+        return matches
+
+    def substring(self, query: str, limit: int) -> List[int]:
+        """Get the positions of labels containing query"""
+        query = query.lower()
+        if not query or _SEPARATOR in query:
+            return []
+        matches: List[int] = []
+        position = self._joined.find(query)
+        while position != -1 and len(matches) < limit:
+            index = bisect.bisect_right(self._offsets, position) - 1
+            matches.append(index)
+            # Continue after the end of this label
+            next_start = self._offsets[index + 1] if index + 1 < len(self._offsets) else len(self._joined)
+            position = self._joined.find(query, next_start)
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, str]]:
+        """
+        Search labels, returning prefix matches first, then substring matches.
+        An exact value match is always returned first.
+        """
+        ordered: List[int] = []
+        for index in self.exact(query) + self.prefix(query, limit) + self.substring(query, limit):
+            if index not in ordered:
+                ordered.append(index)
+            if len(ordered) >= limit:
+                break
+        return [self._entry(index) for index in ordered]
+
+
+class _IndexSlot:
+    """Current index of one tenant/attribute and its rebuild state"""
+
+    def __init__(self):
+        self.index: Optional[FilterValueIndex] = None
+        self.lock = threading.Lock()
+        self.rebuilding = False
+        self.last_error: Optional[str] = None
+
+
+_slots: Dict[Tuple[str, str], _IndexSlot] = {}
+_slots_lock = threading.Lock()
+
+
+def build_filter_index(
+    filter_attribute: str,
+    log=None,
+    session: Optional[Dict[str, Any]] = None,
+) -> FilterValueIndex:
+    """
+    Drain all pages of filter values for an attribute into a new index.
+
+    Args:
+        filter_attribute: The filter attribute (e.g. 'queue_id')
+        log: Optional logger for debugging
+        session: Optional session context that may contain auth information
+
+    Returns:
+        The built FilterValueIndex
+    """
+    items: List[Tuple[str, str]] = []
+    for response in iter_pages(
+        "GET",
+        endpoint_url("analytics_filter", filter_attribute=filter_attribute),
+        page_limit=env_int("DIXA_FILTER_INDEX_PAGE_LIMIT", 500),
+        log=log,
+        session=session,
+    ):
+        for item in page_items(response):
+            entry = _value_and_label(item)
+            if entry is not None:
+                items.append(entry)
+    return FilterValueIndex(items)
+
+
+def _rebuild(slot: _IndexSlot, filter_attribute: str, session: Optional[Dict[str, Any]]) -> None:
+    try:
+        slot.index = build_filter_index(filter_attribute, session=session)
+        slot.last_error = None
+    except Exception as e:
+        slot.last_error = str(e)
+    finally:
+        slot.rebuilding = False
+
+
+def get_filter_index(
+    filter_attribute: str,
+    log=None,
+    session: Optional[Dict[str, Any]] = None,
+) -> FilterValueIndex:
+    """
+    Get the index of an attribute's filter values for the current tenant.
+
+    The first call builds the index synchronously. Later calls return the
+    current index immediately and start a background rebuild once it is
+    older than DIXA_FILTER_INDEX_TTL_SECONDS (default 3600).
+
+    Args:
+        filter_attribute: The filter attribute (e.g. 'queue_id')
+        log: Optional logger for debugging
+        session: Optional session context that may contain auth information
+
+    Returns:
+        The FilterValueIndex
+    """
+    if session is None:
+        session = get_current_session()
+    key = (tenant_id(get_api_key(session)), filter_attribute)
+    with _slots_lock:
+        slot = _slots.setdefault(key, _IndexSlot())
+
+    if slot.index is None:
+        with slot.lock:
+            if slot.index is None:
+                slot.index = build_filter_index(filter_attribute, log=log, session=session)
+        return slot.index
+
+    ttl = env_float("DIXA_FILTER_INDEX_TTL_SECONDS", 3600.0)
+    with slot.lock:
+        if time.time() - slot.index.built_at > ttl and not slot.rebuilding:
+            slot.rebuilding = True
+            threading.Thread(
+                target=_rebuild,
+                args=(slot, filter_attribute, session),
+                name=f"dixa-filter-index-{filter_attribute}",
+                daemon=True,
+            ).start()
+    return slot.index
@@ -1,12 +1,14 @@
 """Get possible values to be used with a given analytics filter attribute from Dixa"""
 from typing import Optional
+from tools.endpoints import endpoint_url
+from tools.page_sizing import choose_page_limit
 from tools.utils import make_request
 
 
 def get_analytics_filter(
     filter_attribute: str,
     page_key: Optional[str] = None,
-    page_limit: int = 50,
+    page_limit: Optional[int] = None,
     log=None,
 ) -> str:
     """
@@ -18,7 +20,7 @@ def get_analytics_filter(
     Args:
         filter_attribute: The filter attribute to get values for (e.g., 'agent_id', 'queue_id', 'channel')
         page_key: Pagination key for next page of results
-        page_limit: Number of results per page (default: 50)
+        page_limit: Number of results per page (default: chosen automatically from the typical size of results)
         log: Optional logger for debugging
     
     Returns:
@@ -28,10 +30,9 @@ def get_analytics_filter(
     
     if page_key:
         params["pageKey"] = page_key
-    if page_limit is not None:
-        params["pageLimit"] = str(page_limit)
+    params["pageLimit"] = str(choose_page_limit("analytics_filter", page_limit))
     
-    url = f"https://dev.dixa.io/v1/analytics/filter/{filter_attribute}"
+    url = endpoint_url("analytics_filter", filter_attribute=filter_attribute)
     data = make_request("GET", url, params=params, log=log)
     return data
 
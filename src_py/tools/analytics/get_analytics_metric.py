@@ -1,4 +1,5 @@
 """Get detailed information about a specific analytics metric from Dixa"""
+from tools.endpoints import endpoint_url
 from tools.utils import make_request
 
 
@@ -14,7 +15,7 @@ def get_analytics_metric(metric_id: str, log=None) -> str:
     Returns:
         JSON string of the metric information
     """
-    url = f"https://dev.dixa.io/v1/analytics/metrics/{metric_id}"
+    url = endpoint_url("analytics_metric", metric_id=metric_id)
     data = make_request("GET", url, log=log)
     return data
 
@@ -0,0 +1,139 @@
+"""Get a time series of analytics metric data over consecutive periods from Dixa"""
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+from tools.analytics.periods import GRANULARITIES, consecutive_periods
+from tools.concurrency import run_concurrently
+from tools.deadlines import partial_results
+from tools.endpoints import endpoint_url
+from tools.settings import env_float, env_int
+from tools.utils import cached_request_data
+
+
+def _aggregate_values(response: Any) -> Dict[str, Any]:
+    """Collect {measure: value} pairs from a metrics data response"""
+    values: Dict[str, Any] = {}
+
+    def walk(node: Any) -> None:
+        if isinstance(node, dict):
+            if "value" in node and ("measure" in node or "_type" in node):
+                values[str(node.get("measure", node.get("_type")))] = node["value"]
+                return
+            for child in node.values():
+                walk(child)
+        elif isinstance(node, list):
+            for child in node:
+                walk(child)
+
+    walk(response.get("data") if isinstance(response, dict) else response)
+    return values
+
+
+def _delta(current: Any, previous: Any) -> Optional[Dict[str, Optional[float]]]:
+    if not isinstance(current, (int, float)) or not isinstance(previous, (int, float)):
+        return None
+    change = current - previous
+    return {
+        "change": round(change, 6),
+        "change_pct": round(change / previous * 100, 2) if previous else None,
+    }
+
+
+def get_analytics_metric_trend(
+    metric_id: str,
+    aggregations: List[str],
+    timezone: str,
+    granularity: str = "week",
+    periods: int = 12,
+    filters: Optional[List[Dict[str, List[str]]]] = None,
+    include_current: bool = True,
+    log=None,
+) -> str:
+    """
+    Get a trend of analytics metric data over consecutive periods in a single call,
+    e.g. closed conversations per week for the last 12 weeks. Use this instead of
+    calling getAnalyticsMetricsData once per period.
+    Periods are queried concurrently, results of closed periods are cached, and
+    period-over-period changes are computed for every aggregation.
+
+    Args:
+        metric_id: The ID of the metric to fetch data for (e.g., 'closed_conversations')
+        aggregations: Array of aggregations to apply (e.g., ['Count'])
+        timezone: The timezone periods are aligned to (e.g., 'Europe/Copenhagen') (required)
+        granularity: Period length: 'day', 'week', 'month' or 'quarter' (default: 'week')
+        periods: Number of consecutive periods (default: 12)
+        filters: Array of filters to apply (each filter is a dict with 'attribute' and 'values')
+        include_current: Whether the last period is the current, still open one (default: True)
+        log: Optional logger for debugging
+
+    Returns:
+        JSON string of the aligned series with period-over-period deltas
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unsupported granularity '{granularity}'. Use one of: {', '.join(GRANULARITIES)}")
+    max_periods = env_int("DIXA_TREND_MAX_PERIODS", 104)
+    if periods > max_periods:
+        raise ValueError(f"At most {max_periods} periods can be requested at once")
+
+    now = datetime.now(ZoneInfo(timezone))
+    series_periods = consecutive_periods(granularity, periods, timezone, include_current, now=now)
+    url = endpoint_url("analytics_metrics")
+    open_period_max_age = env_float("DIXA_TREND_OPEN_PERIOD_MAX_AGE_SECONDS", 60.0)
+
+    def query(period):
+        json_data = {
+            "id": metric_id,
+            "periodFilter": period.to_filter(),
+            "aggregations": aggregations,
+            "timezone": timezone,
+        }
+        if filters:
+            json_data["filters"] = filters
+        # A result fetched after the period ended can no longer change; one fetched
+        # while the period was still open is only reused while it is recent
+        return cached_request_data(
+            "POST",
+            url,
+            json_data=json_data,
+            max_age=open_period_max_age,
+            log=log,
+            final_after=period.end.timestamp(),
+        )
+
+    responses = run_concurrently(
+        [lambda period=period: query(period) for period in series_periods],
+        max_workers=env_int("DIXA_TREND_MAX_CONCURRENCY", 6),
+    )
+
+    series = []
+    previous: Dict[str, Any] = {}
+    for period, response in zip(series_periods, responses):
+        point: Dict[str, Any] = {
+            "period": period.label(granularity),
+            "start": period.start.isoformat(),
+            "end": period.end.isoformat(),
+            "closed": period.is_closed(now),
+        }
+        if isinstance(response, Exception):
+            point["error"] = str(response)
+            previous = {}
+        else:
+            values = _aggregate_values(response)
+            point["values"] = values
+            deltas = {name: _delta(value, previous.get(name)) for name, value in values.items()}
+            point["deltas"] = {name: delta for name, delta in deltas.items() if delta is not None}
+            previous = values
+        series.append(point)
+
+    result = {
+        "metric_id": metric_id,
+        "granularity": granularity,
+        "timezone": timezone,
+        "aggregations": aggregations,
+        "series": series,
+    }
+    if partial_results(responses):
+        # Some periods did not finish before the deadline; the others are still returned
+        result["partial"] = True
+    return json.dumps(result, indent=2)
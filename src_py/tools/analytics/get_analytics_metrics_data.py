@@ -1,5 +1,7 @@
 """Get analytics data for a specific metric from Dixa"""
 from typing import Optional, List, Dict
+from tools.endpoints import endpoint_url
+from tools.page_sizing import choose_page_limit
 from tools.utils import make_request
 
 
@@ -23,7 +25,7 @@ def get_analytics_metrics_data(
     timezone: str,
     filters: Optional[List[Dict[str, List[str]]]] = None,
     page_key: Optional[str] = None,
-    page_limit: int = 50,
+    page_limit: Optional[int] = None,
     log=None,
 ) -> str:
     """
@@ -40,7 +42,7 @@ def get_analytics_metrics_data(
         timezone: The timezone to use for the data (e.g., 'Europe/Copenhagen') (required)
         filters: Array of filters to apply (each filter is a dict with 'attribute' and 'values')
         page_key: Pagination key for next page of results
-        page_limit: Number of results per page (default: 50)
+        page_limit: Number of results per page (default: chosen automatically from the typical size of results)
         log: Optional logger for debugging
     
     Returns:
@@ -50,10 +52,9 @@ def get_analytics_metrics_data(
     
     if page_key:
         params["pageKey"] = page_key
-    if page_limit is not None:
-        params["pageLimit"] = str(page_limit)
+    params["pageLimit"] = str(choose_page_limit("analytics_metrics", page_limit, method="POST"))
     
-    url = "https://dev.dixa.io/v1/analytics/metrics"
+    url = endpoint_url("analytics_metrics")
     
     json_data = {
         "id": metric_id,
@@ -1,4 +1,5 @@
 """Get detailed information about a specific analytics record from Dixa"""
+from tools.endpoints import endpoint_url
 from tools.utils import make_request
 
 
@@ -14,7 +15,7 @@ def get_analytics_record(record_id: str, log=None) -> str:
     Returns:
         JSON string of the record information
     """
-    url = f"https://dev.dixa.io/v1/analytics/records/{record_id}"
+    url = endpoint_url("analytics_record", record_id=record_id)
     data = make_request("GET", url, log=log)
     return data
 
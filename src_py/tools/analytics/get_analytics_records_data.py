@@ -1,5 +1,7 @@
 """Get analytics data for a specific record from Dixa"""
 from typing import Optional, Dict, List
+from tools.endpoints import endpoint_url
+from tools.page_sizing import choose_page_limit
 from tools.utils import make_request
 
 
@@ -21,7 +23,7 @@ def get_analytics_records_data(
         timezone: Timezone to use for the data (e.g., 'Europe/Copenhagen')
         filters: Optional filters to apply to the data (dict mapping attribute names to lists of values)
         page_key: Optional pagination key for fetching next page of results
-        page_limit: Optional limit for number of results per page
+        page_limit: Optional limit for number of results per page (default: chosen automatically from the typical size of results)
         log: Optional logger for debugging
     
     Returns:
@@ -31,10 +33,9 @@ def get_analytics_records_data(
     
     if page_key:
         params["pageKey"] = page_key
-    if page_limit is not None:
-        params["pageLimit"] = str(page_limit)
+    params["pageLimit"] = str(choose_page_limit("analytics_records_data", page_limit, method="POST"))
     
-    url = f"https://dev.dixa.io/v1/analytics/records/{record_id}/data"
+    url = endpoint_url("analytics_records_data", record_id=record_id)
     
     json_data = {
         "periodFilter": period_filter,
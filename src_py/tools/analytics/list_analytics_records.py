@@ -1,11 +1,13 @@
 """List all available analytics record IDs from Dixa"""
 from typing import Optional
+from tools.endpoints import endpoint_url
+from tools.page_sizing import choose_page_limit
 from tools.utils import make_request
 
 
 def list_analytics_records(
     page_key: Optional[str] = None,
-    page_limit: int = 50,
+    page_limit: Optional[int] = None,
     log=None,
 ) -> str:
     """
@@ -14,7 +16,7 @@ def list_analytics_records(
     
     Args:
         page_key: Pagination key for next page of results
-        page_limit: Number of results per page (default: 50)
+        page_limit: Number of results per page (default: chosen automatically from the typical size of results)
         log: Optional logger for debugging
     
     Returns:
@@ -24,10 +26,9 @@ def list_analytics_records(
     
     if page_key:
         params["pageKey"] = page_key
-    if page_limit is not None:
-        params["pageLimit"] = str(page_limit)
+    params["pageLimit"] = str(choose_page_limit("analytics_records", page_limit))
     
-    url = "https://dev.dixa.io/v1/analytics/records"
+    url = endpoint_url("analytics_records")
     data = make_request("GET", url, params=params, log=log)
     return data
 
@@ -0,0 +1,173 @@
+"""
+Calendar helpers for analytics periods.
+
+Periods are computed in the timezone of the query and sent to Dixa as
+'Interval' period filters with ISO 8601 start/end timestamps (start
+inclusive, end exclusive).
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+GRANULARITIES = ["day", "week", "month", "quarter"]
+
+# Dixa period presets: (granularity, offset from the current period)
+PRESETS = {
+    "Today": ("day", 0),
+    "Yesterday": ("day", -1),
+    "ThisWeek": ("week", 0),
+    "PreviousWeek": ("week", -1),
+    "ThisMonth": ("month", 0),
+    "PreviousMonth": ("month", -1),
+    "ThisQuarter": ("quarter", 0),
+    "PreviousQuarter": ("quarter", -1),
+    "ThisYear": ("year", 0),
+}
+
+
+@dataclass(frozen=True)
+class Period:
+    """A calendar period in a given timezone"""
+    start: datetime
+    end: datetime
+
+    def is_closed(self, now: datetime) -> bool:
+        """Whether the period has fully passed, so its data can no longer change"""
+        return self.end <= now
+
+    def label(self, granularity: str) -> str:
+        """Short human-readable label, e.g. '2025-03-14', '2025-W11', '2025-03' or '2025-Q1'"""
+        if granularity == "week":
+            year, week, _ = self.start.isocalendar()
+            return f"{year}-W{week:02d}"
+        if granularity == "month":
+            return self.start.strftime("%Y-%m")
+        if granularity == "quarter":
+            return f"{self.start.year}-Q{(self.start.month - 1) // 3 + 1}"
+        return self.start.strftime("%Y-%m-%d")
+
+    def to_filter(self) -> Dict[str, object]:
+        """Build the Dixa period filter for this period"""
+        return {
+            "_type": "Interval",
+            "value": {
+                "start": self.start.isoformat(),
+                "end": self.end.isoformat(),
+            },
+        }
+
+
+def _localize(value: datetime, tz: ZoneInfo) -> datetime:
+    # Re-attach the zone so the UTC offset is correct across DST changes
+    return datetime(value.year, value.month, value.day, tzinfo=tz)
+
+
+def period_start(moment: datetime, granularity: str) -> datetime:
+    """Get the start of the period of the given granularity containing moment"""
+    tz = moment.tzinfo
+    day = datetime(moment.year, moment.month, moment.day, tzinfo=tz)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return _localize(day - timedelta(days=day.weekday()), tz)
+    if granularity == "month":
+        return datetime(moment.year, moment.month, 1, tzinfo=tz)
+    if granularity == "quarter":
+        return datetime(moment.year, (moment.month - 1) // 3 * 3 + 1, 1, tzinfo=tz)
+    raise ValueError(f"Unsupported granularity '{granularity}'. Use one of: {', '.join(GRANULARITIES)}")
+
+
+def shift_period_start(start: datetime, granularity: str, count: int) -> datetime:
+    """Move a period start by count periods (negative to go back)"""
+    tz = start.tzinfo
+    if granularity == "day":
+        return _localize(start + timedelta(days=count), tz)
+    if granularity == "week":
+        return _localize(start + timedelta(weeks=count), tz)
+    months = {"month": 1, "quarter": 3}.get(granularity)
+    if months is None:
+        raise ValueError(f"Unsupported granularity '{granularity}'. Use one of: {', '.join(GRANULARITIES)}")
+    index = start.year * 12 + start.month - 1 + count * months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=tz)
+
+
+def consecutive_periods(
+    granularity: str,
+    count: int,
+    timezone: str,
+    include_current: bool = True,
+    now: Optional[datetime] = None,
+) -> List[Period]:
+    """
+    Get the last count consecutive periods, oldest first.
+
+    Args:
+        granularity: One of 'day', 'week', 'month', 'quarter'
+        count: Number of periods
+        timezone: IANA timezone the periods are aligned to (e.g. 'Europe/Copenhagen')
+        include_current: Whether the last period is the current, still open one
+        now: Reference time (defaults to the current time)
+
+    Returns:
+        List of periods, oldest first
+    """
+    if count < 1:
+        raise ValueError("The number of periods must be at least 1")
+    tz = ZoneInfo(timezone)
+    now = now.astimezone(tz) if now else datetime.now(tz)
+    last_start = period_start(now, granularity)
+    if not include_current:
+        last_start = shift_period_start(last_start, granularity, -1)
+    periods = []
+    for offset in range(count - 1, -1, -1):
+        start = shift_period_start(last_start, granularity, -offset)
+        periods.append(Period(start=start, end=shift_period_start(start, granularity, 1)))
+    return periods
+
+
+def resolve_preset(preset: str, timezone: str, now: Optional[datetime] = None) -> Period:
+    """
+    Get the period a Dixa period preset (e.g. 'PreviousMonth') stands for.
+
+    Args:
+        preset: Preset name, one of PRESETS
+        timezone: IANA timezone the period is aligned to
+        now: Reference time (defaults to the current time)
+
+    Returns:
+        The period
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"Unsupported period preset '{preset}'. Use one of: {', '.join(PRESETS)}")
+    tz = ZoneInfo(timezone)
+    now = now.astimezone(tz) if now else datetime.now(tz)
+    granularity, offset = PRESETS[preset]
+    if granularity == "year":
+        start = datetime(now.year + offset, 1, 1, tzinfo=tz)
+        return Period(start=start, end=datetime(start.year + 1, 1, 1, tzinfo=tz))
+    start = shift_period_start(period_start(now, granularity), granularity, offset)
+    return Period(start=start, end=shift_period_start(start, granularity, 1))
+
+
+def parse_moment(value: str, timezone: str) -> datetime:
+    """Parse an ISO 8601 date or timestamp, placing it in timezone when it has no offset"""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=ZoneInfo(timezone))
+    return moment.astimezone(ZoneInfo(timezone))
+
+
+def split_period(period: Period, granularity: str) -> List[Period]:
+    """
+    Split a period at the boundaries of a granularity, e.g. a quarter into its weeks.
+
+    The first and last parts are clipped to the period, so they can be partial.
+    """
+    parts = []
+    start = period.start
+    while start < period.end:
+        end = min(period.end, shift_period_start(period_start(start, granularity), granularity, 1))
+        parts.append(Period(start=start, end=end))
+        start = end
+    return parts
@@ -0,0 +1,60 @@
+"""Plan an analytics data query and estimate its cost without running it"""
+import json
+from typing import Any, Dict, List, Optional
+from tools.analytics.planner import build_plan
+
+
+def plan_analytics_query(
+    kind: str,
+    target_id: str,
+    timezone: str,
+    period_preset: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    aggregations: Optional[List[str]] = None,
+    filters: Optional[List[Dict[str, Any]]] = None,
+    shard_by: Optional[str] = None,
+    log=None,
+) -> str:
+    """
+    Plan a metrics or records data query and estimate what running it will cost, without
+    running it (dry run). Use this before large getAnalyticsMetricsData or
+    getAnalyticsRecordsData jobs, then run the plan with executeAnalyticsPlan.
+    The plan resolves the period, checks filters and aggregations against the metric or
+    record definition, reports which shards are already cached and estimates the number
+    of pages, upstream calls and the time needed.
+
+    Args:
+        kind: 'metrics' or 'records'
+        target_id: The ID of the metric (e.g., 'closed_conversations') or record to query
+        timezone: The timezone to use for the data (e.g., 'Europe/Copenhagen') (required)
+        period_preset: A period preset such as 'PreviousMonth', 'ThisWeek' or 'Yesterday'
+            (alternative to start/end)
+        start: Start of the period as an ISO 8601 date or timestamp (inclusive)
+        end: End of the period as an ISO 8601 date or timestamp (exclusive)
+        aggregations: Aggregations to apply to a metric (e.g., ['Count'])
+        filters: Array of filters to apply (each filter is a dict with 'attribute' and 'values')
+        shard_by: Split the period into 'day', 'week', 'month' or 'quarter' shards, each queried
+            and cached separately (default: one query for the whole period)
+        log: Optional logger for debugging
+
+    Returns:
+        JSON string of the plan with its plan_id, validation results, shards and cost estimate
+    """
+    plan = build_plan(
+        kind,
+        target_id,
+        timezone,
+        period_preset=period_preset,
+        start=start,
+        end=end,
+        aggregations=aggregations,
+        filters=filters,
+        shard_by=shard_by,
+        log=log,
+    )
+    # The request bodies stay with the stored plan; show one as an example
+    result = {key: value for key, value in plan.items() if key not in ("url", "params", "shards")}
+    result["shards"] = [{key: value for key, value in shard.items() if key != "body"} for shard in plan["shards"]]
+    result["request_example"] = plan["shards"][0]["body"]
+    return json.dumps(result, indent=2)
@@ -0,0 +1,433 @@
+"""
+Planning and execution of analytics data queries.
+
+A plan pins down everything an analytics query will send to Dixa: the
+period (presets are resolved to concrete intervals), optionally split into
+shards of a day, week, month or quarter, the filters and aggregations
+(checked against the metric or record definition), and the page size. It
+also estimates the cost of running it:
+- which shards (all their pages) are already in the response cache and
+  need no upstream call
+- how many pages the other shards will take, from the rows per day seen on
+  earlier runs of the same metric or record
+- the expected duration, from recent upstream latencies
+
+Plans and the rows-per-day history are stored as expiring blobs in the state
+backend (see tools/state.py), outside the LRU-bounded response cache, so
+ordinary traffic cannot evict them: plans for DIXA_PLAN_TTL_SECONDS under
+their ID, so any worker sharing the backend can execute them, and history
+for DIXA_PLAN_HISTORY_TTL_SECONDS. Executing a
+plan sends exactly the planned requests, through the response cache, and
+records the rows per day observed for later estimates.
+"""
+import json
+import math
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from tools import metrics
+from tools.analytics.periods import (
+    GRANULARITIES,
+    PRESETS,
+    Period,
+    parse_moment,
+    resolve_preset,
+    split_period,
+)
+from tools.cache import cache_key, response_cache, tenant_id
+from tools.concurrency import run_concurrently
+from tools.deadlines import partial_results
+from tools.endpoints import endpoint_url
+from tools.page_sizing import choose_page_limit
+from tools.pagination import next_page_key
+from tools.settings import env_float, env_int
+from tools.state import get_state_backend
+from tools.utils import cached_request_data, get_api_key, get_current_session
+
+# kind -> (endpoint of the data query, endpoint of the definition, path parameter)
+KINDS = {
+    "metrics": ("analytics_metrics", "analytics_metric", "metric_id"),
+    "records": ("analytics_records_data", "analytics_record", "record_id"),
+}
+
+# Smoothing of the rows-per-day history
+_SMOOTHING = 0.3
+
+
+def _tenant() -> str:
+    return tenant_id(get_api_key(get_current_session()))
+
+
+def _plan_key(tenant: str, plan_id: str) -> str:
+    return f"analytics-plan|{tenant}|{plan_id}"
+
+
+def _history_key(tenant: str, kind: str, target_id: str) -> str:
+    return f"analytics-plan-history|{tenant}|{kind}|{target_id}"
+
+
+def _names(items: Any, fields: List[str]) -> List[str]:
+    """Collect the names of catalog entries given as strings or objects"""
+    names = []
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, str):
+            names.append(item)
+        elif isinstance(item, dict):
+            for field in fields:
+                if isinstance(item.get(field), str):
+                    names.append(item[field])
+                    break
+    return names
+
+
+def _definition(kind: str, target_id: str, log=None) -> Dict[str, Any]:
+    _, definition_endpoint, path_param = KINDS[kind]
+    url = endpoint_url(definition_endpoint, **{path_param: target_id})
+    max_age = env_float("DIXA_ANALYTICS_CATALOG_MAX_AGE_SECONDS", 3600.0)
+    response = cached_request_data("GET", url, max_age=max_age, log=log)
+    data = response.get("data") if isinstance(response, dict) else None
+    return data if isinstance(data, dict) else {}
+
+
+def validate(
+    kind: str,
+    target_id: str,
+    filters: List[Dict[str, Any]],
+    aggregations: List[str],
+    log=None,
+) -> Dict[str, List[str]]:
+    """
+    Check filter attributes and aggregations against the metric or record definition.
+
+    Returns:
+        Dict with 'errors' (the query would be rejected) and 'warnings'
+    """
+    errors: List[str] = []
+    warnings: List[str] = []
+    try:
+        definition = _definition(kind, target_id, log=log)
+    except Exception as e:
+        return {"errors": [f"Could not load the definition of {kind[:-1]} '{target_id}': {e}"], "warnings": []}
+
+    attributes = _names(definition.get("filters"), ["filterAttribute", "attribute", "id", "name"])
+    for item in filters:
+        attribute = item.get("attribute")
+        if not attribute:
+            errors.append(f"Filter without 'attribute': {item}")
+        elif attributes and attribute not in attributes:
+            errors.append(f"'{attribute}' is not a filter of {target_id}. Available: {', '.join(attributes)}")
+    if filters and not attributes:
+        warnings.append(f"The definition of {target_id} lists no filters, so they could not be checked")
+
+    if kind == "metrics":
+        if not aggregations:
+            errors.append("Metrics queries need at least one aggregation (e.g. ['Count'])")
+        supported = _names(definition.get("aggregations"), ["measure", "_type", "id", "name"])
+        for aggregation in aggregations:
+            if supported and aggregation not in supported:
+                errors.append(f"'{aggregation}' is not an aggregation of {target_id}. Available: {', '.join(supported)}")
+    elif aggregations:
+        warnings.append("Aggregations are ignored for records")
+    return {"errors": errors, "warnings": warnings}
+
+
+def resolve_period(
+    timezone: str,
+    period_preset: Optional[str],
+    start: Optional[str],
+    end: Optional[str],
+    now: datetime,
+) -> Period:
+    """Get the period of a query from a preset or from start/end"""
+    if period_preset:
+        if start or end:
+            raise ValueError("Give either period_preset or start/end, not both")
+        return resolve_preset(period_preset, timezone, now=now)
+    if not start or not end:
+        raise ValueError(f"Give period_preset (one of: {', '.join(PRESETS)}) or both start and end")
+    period = Period(start=parse_moment(start, timezone), end=parse_moment(end, timezone))
+    if period.end <= period.start:
+        raise ValueError("end must be after start")
+    return period
+
+
+def _request_body(
+    kind: str,
+    target_id: str,
+    period: Period,
+    timezone: str,
+    filters: List[Dict[str, Any]],
+    aggregations: List[str],
+) -> Dict[str, Any]:
+    body: Dict[str, Any] = {"periodFilter": period.to_filter(), "timezone": timezone}
+    if kind == "metrics":
+        body["id"] = target_id
+        body["aggregations"] = aggregations
+        if filters:
+            body["filters"] = filters
+    elif filters:
+        # The records endpoint takes filters as a mapping of attribute to values
+        body["filters"] = {item["attribute"]: item.get("values", []) for item in filters}
+    return body
+
+
+def _history(tenant: str, kind: str, target_id: str) -> Optional[Dict[str, Any]]:
+    stored = get_state_backend().blob_get(_history_key(tenant, kind, target_id))
+    return json.loads(stored) if stored is not None else None
+
+
+def _record_history(tenant: str, kind: str, target_id: str, rows: int, days: float, page_limit: int) -> None:
+    if days <= 0:
+        return
+    rate = rows / days
+    history = _history(tenant, kind, target_id) or {"rows_per_day": rate, "runs": 0}
+    if history["runs"]:
+        history["rows_per_day"] = (1 - _SMOOTHING) * history["rows_per_day"] + _SMOOTHING * rate
+    history["runs"] += 1
+    history["page_limit"] = page_limit
+    get_state_backend().blob_set(
+        _history_key(tenant, kind, target_id),
+        json.dumps(history).encode("utf-8"),
+        ttl=env_float("DIXA_PLAN_HISTORY_TTL_SECONDS", 30 * 86400.0),
+    )
+
+
+def _cached_pages(
+    tenant: str,
+    url: str,
+    params: Dict[str, str],
+    body: Dict[str, Any],
+    max_age: float,
+    final_after: float,
+) -> Tuple[int, bool]:
+    """
+    Follow the pages of a shard through the response cache.
+
+    Pages cached at or after final_after (the end of the shard) are final; the
+    others count only while they are at most max_age seconds old.
+
+    Returns:
+        (number of consecutive pages cached, whether they include the last page)
+    """
+    params = dict(params)
+    pages = 0
+    while pages < env_int("DIXA_PLAN_MAX_PAGES_PER_SHARD", 100):
+        entry = response_cache.get(
+            cache_key(tenant, "POST", url, params, body), max_age=max_age, final_after=final_after,
+        )
+        if entry is None:
+            return pages, False
+        pages += 1
+        page_key = next_page_key(json.loads(entry.body))
+        if not page_key:
+            return pages, True
+        params["pageKey"] = page_key
+    return pages, True
+
+
+def _days(period: Period) -> float:
+    return (period.end - period.start).total_seconds() / 86400.0
+
+
+def build_plan(
+    kind: str,
+    target_id: str,
+    timezone: str,
+    period_preset: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    aggregations: Optional[List[str]] = None,
+    filters: Optional[List[Dict[str, Any]]] = None,
+    shard_by: Optional[str] = None,
+    log=None,
+) -> Dict[str, Any]:
+    """
+    Plan an analytics query, estimate its cost and store the plan.
+
+    Returns:
+        The plan, including its 'plan_id' and cost estimate
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unsupported kind '{kind}'. Use one of: {', '.join(KINDS)}")
+    if shard_by is not None and shard_by not in GRANULARITIES:
+        raise ValueError(f"Unsupported shard_by '{shard_by}'. Use one of: {', '.join(GRANULARITIES)}")
+    filters = filters or []
+    aggregations = aggregations or []
+    tenant = _tenant()
+    now = datetime.now(ZoneInfo(timezone))
+    period = resolve_period(timezone, period_preset, start, end, now)
+    max_shards = env_int("DIXA_PLAN_MAX_SHARDS", 400)
+    shards = split_period(period, shard_by) if shard_by else [period]
+    if len(shards) > max_shards:
+        raise ValueError(f"The plan would have {len(shards)} shards; at most {max_shards} are allowed")
+
+    checks = validate(kind, target_id, filters, aggregations, log=log)
+    data_endpoint, _, path_param = KINDS[kind]
+    url = endpoint_url(data_endpoint, **({path_param: target_id} if kind == "records" else {}))
+    history = _history(tenant, kind, target_id)
+    # Keep the page size of earlier runs, or their cached pages would not match
+    page_limit = history.get("page_limit") if history else None
+    page_limit = page_limit or choose_page_limit(data_endpoint, method="POST")
+    params = {"pageLimit": str(page_limit)}
+    open_max_age = env_float("DIXA_PLAN_OPEN_PERIOD_MAX_AGE_SECONDS", 60.0)
+
+    planned_shards = []
+    for shard in shards:
+        body = _request_body(kind, target_id, shard, timezone, filters, aggregations)
+        closed = shard.is_closed(now)
+        cached_pages, complete = _cached_pages(tenant, url, params, body, open_max_age, shard.end.timestamp())
+        rows = round(history["rows_per_day"] * _days(shard)) if history else None
+        pages = max(1, math.ceil(rows / page_limit)) if rows is not None else 1
+        if complete:
+            pages = cached_pages
+        else:
+            pages = max(pages, cached_pages + 1)
+        planned_shards.append({
+            "label": shard.label(shard_by) if shard_by else f"{shard.start.date()}..{shard.end.date()}",
+            "start": shard.start.isoformat(),
+            "end": shard.end.isoformat(),
+            "closed": closed,
+            "cached": complete,
+            "cached_pages": cached_pages,
+            "estimated_rows": rows,
+            "estimated_pages": pages,
+            "body": body,
+        })
+
+    upstream_calls = sum(shard["estimated_pages"] - shard["cached_pages"] for shard in planned_shards)
+    concurrency = env_int("DIXA_PLAN_MAX_CONCURRENCY", 6)
+    fallback_latency = env_float("DIXA_PLAN_DEFAULT_LATENCY_SECONDS", 1.0)
+    p50 = metrics.latency_percentile(data_endpoint, 50) or fallback_latency
+    p95 = metrics.latency_percentile(data_endpoint, 95) or fallback_latency
+    pending = [shard for shard in planned_shards if shard["estimated_pages"] > shard["cached_pages"]]
+    # Shards run in waves of `concurrency`; pages of one shard run one after another
+    waves = math.ceil(len(pending) / concurrency) if pending else 0
+    longest = max((shard["estimated_pages"] - shard["cached_pages"] for shard in pending), default=0)
+
+    plan = {
+        "plan_id": uuid.uuid4().hex[:12],
+        "kind": kind,
+        "target_id": target_id,
+        "timezone": timezone,
+        "period": {
+            "start": period.start.isoformat(),
+            "end": period.end.isoformat(),
+            "preset": period_preset,
+        },
+        "shard_by": shard_by,
+        "filters": filters,
+        "aggregations": aggregations,
+        "url": url,
+        "params": params,
+        "valid": not checks["errors"],
+        "errors": checks["errors"],
+        "warnings": checks["warnings"],
+        "shards": planned_shards,
+        "estimate": {
+            "shards": len(planned_shards),
+            "cached_shards": sum(1 for shard in planned_shards if shard["cached"]),
+            "upstream_calls": upstream_calls,
+            "pages": sum(shard["estimated_pages"] for shard in planned_shards),
+            "rows": sum(shard["estimated_rows"] for shard in planned_shards) if history else None,
+            "latency_seconds": {
+                "p50": round(waves * longest * p50, 2),
+                "p95": round(waves * longest * p95, 2),
+            },
+            "basis": f"{history['runs']} earlier runs" if history else "no earlier runs; assuming one page per shard",
+        },
+        "planned_at": now.isoformat(),
+    }
+    if kind == "records" and (plan["estimate"]["rows"] or 0) > env_int("DIXA_PLAN_INLINE_ROWS_LIMIT", 5000):
+        plan["warnings"].append("Many rows expected; consider exportAnalyticsRecordsData to write them to a file")
+    get_state_backend().blob_set(
+        _plan_key(tenant, plan["plan_id"]),
+        json.dumps(plan).encode("utf-8"),
+        ttl=env_float("DIXA_PLAN_TTL_SECONDS", 3600.0),
+    )
+    return plan
+
+
+def load_plan(plan_id: str) -> Dict[str, Any]:
+    """Get a stored plan of the current tenant"""
+    stored = get_state_backend().blob_get(_plan_key(_tenant(), plan_id))
+    if stored is None:
+        raise ValueError(f"Plan '{plan_id}' does not exist or has expired; plan the query again")
+    return json.loads(stored)
+
+
+def execute_plan(plan: Dict[str, Any], log=None) -> Dict[str, Any]:
+    """
+    Run the requests of a plan.
+
+    Returns:
+        The data of each shard and the actual cost next to the estimate
+    """
+    if not plan["valid"]:
+        raise ValueError(f"Plan '{plan['plan_id']}' is invalid: {'; '.join(plan['errors'])}")
+    tenant = _tenant()
+    open_max_age = env_float("DIXA_PLAN_OPEN_PERIOD_MAX_AGE_SECONDS", 60.0)
+    max_pages = env_int("DIXA_PLAN_MAX_PAGES_PER_SHARD", 100)
+
+    def run_shard(shard: Dict[str, Any]) -> Dict[str, Any]:
+        params = dict(plan["params"])
+        # Pages fetched after the shard ended can no longer change; earlier ones only
+        # count while recent, even if the shard has ended since
+        final_after = datetime.fromisoformat(shard["end"]).timestamp()
+        items: List[Any] = []
+        pages = upstream_calls = 0
+        while True:
+            key = cache_key(tenant, "POST", plan["url"], params, shard["body"])
+            if not response_cache.contains(key, open_max_age, final_after):
+                upstream_calls += 1
+            response = cached_request_data(
+                "POST", plan["url"], params=params, json_data=shard["body"],
+                max_age=open_max_age, log=log, final_after=final_after,
+            )
+            pages += 1
+            data = response.get("data") if isinstance(response, dict) else response
+            if not isinstance(data, list):
+                # e.g. the aggregates of a metric, which come as one object
+                return {"data": data, "pages": pages, "upstream_calls": upstream_calls, "truncated": False}
+            items.extend(data)
+            page_key = next_page_key(response)
+            if not page_key or pages >= max_pages:
+                return {"data": items, "pages": pages, "upstream_calls": upstream_calls, "truncated": bool(page_key)}
+            params["pageKey"] = page_key
+
+    results = run_concurrently(
+        [lambda shard=shard: run_shard(shard) for shard in plan["shards"]],
+        max_workers=env_int("DIXA_PLAN_MAX_CONCURRENCY", 6),
+    )
+
+    shards = []
+    rows = days = 0.0
+    for shard, result in zip(plan["shards"], results):
+        entry: Dict[str, Any] = {"label": shard["label"], "start": shard["start"], "end": shard["end"]}
+        if isinstance(result, Exception):
+            entry["error"] = str(result)
+        else:
+            entry.update(result)
+            if isinstance(result["data"], list) and not result["truncated"]:
+                rows += len(result["data"])
+                days += (datetime.fromisoformat(shard["end"]) - datetime.fromisoformat(shard["start"])).total_seconds() / 86400.0
+        shards.append(entry)
+    _record_history(tenant, plan["kind"], plan["target_id"], int(rows), days, int(plan["params"]["pageLimit"]))
+
+    result: Dict[str, Any] = {
+        "plan_id": plan["plan_id"],
+        "kind": plan["kind"],
+        "target_id": plan["target_id"],
+        "shards": shards,
+        "actual": {
+            "pages": sum(shard.get("pages", 0) for shard in shards),
+            "rows": sum(len(shard["data"]) for shard in shards if isinstance(shard.get("data"), list)),
+            "upstream_calls": sum(shard.get("upstream_calls", 0) for shard in shards),
+        },
+        "estimate": plan["estimate"],
+    }
+    if partial_results(results):
+        # Some shards did not finish before the deadline; the others are still returned
+        result["partial"] = True
+    return result
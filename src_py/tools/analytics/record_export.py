@@ -0,0 +1,209 @@
+"""
+Streaming export of analytics record rows to local files.
+
+Rows are written page by page to an NDJSON spool file while their schema is
+derived: nested objects are flattened into dotted column names, lists are
+kept as JSON text, and each column gets the narrowest type that fits every
+value seen (bool, int, float, else string). For Parquet and Arrow exports the
+spool is then converted in batches of DIXA_EXPORT_BATCH_ROWS rows with the
+final schema, so memory stays bounded by one page and one batch whatever the
+number of rows. Parquet and Arrow require the optional 'pyarrow' package;
+without it the NDJSON file is kept.
+
+Export files are readable by their owner only. An export cut short keeps its
+spool, so a later call can append the remaining pages to it and rewrite the
+same export file.
+"""
+import json
+import os
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from tools.settings import env_int
+from tools.state import create_private_file, private_directory
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow", "ndjson": ".ndjson"}
+
+# Type widening order; a column holding two different types gets the wider one,
+# except that anything mixed with a non-number becomes a string
+_NUMERIC = ("bool", "int", "float")
+
+
+def pyarrow_available() -> bool:
+    """Check whether the optional 'pyarrow' package needed for Parquet/Arrow is installed"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_dir() -> str:
+    """
+    Directory export files are written to: DIXA_EXPORT_DIR, or by default an
+    'exports' directory in the current user's private directory under <tmp>.
+    """
+    path = os.getenv("DIXA_EXPORT_DIR")
+    if not path:
+        path = os.path.join(private_directory(tempfile.gettempdir(), "DIXA_EXPORT_DIR"), "exports")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def flatten_row(row: Any, prefix: str = "") -> Dict[str, Any]:
+    """
+    Flatten a row into a dict of scalar columns.
+
+    Args:
+        row: One item of a records data response
+        prefix: Column name prefix used for nested objects
+
+    Returns:
+        Dict mapping dotted column names to scalars (lists become JSON text)
+    """
+    if not isinstance(row, dict):
+        return {prefix or "value": row if not isinstance(row, list) else json.dumps(row)}
+    columns: Dict[str, Any] = {}
+    for key, value in row.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            columns.update(flatten_row(value, name))
+        elif isinstance(value, list):
+            columns[name] = json.dumps(value, separators=(",", ":"))
+        else:
+            columns[name] = value
+    return columns
+
+
+def _value_type(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    return "string"
+
+
+def _widen(current: Optional[str], new: Optional[str]) -> Optional[str]:
+    if current is None or current == new:
+        return new or current
+    if new is None:
+        return current
+    if current in _NUMERIC and new in _NUMERIC:
+        return _NUMERIC[max(_NUMERIC.index(current), _NUMERIC.index(new))]
+    return "string"
+
+
+class SchemaBuilder:
+    """Derives column names and types from the rows seen so far"""
+
+    def __init__(self):
+        # Insertion ordered, so columns keep the order they first appeared in
+        self.types: Dict[str, Optional[str]] = {}
+
+    def observe(self, columns: Dict[str, Any]) -> None:
+        """Widen the schema to fit one flattened row"""
+        for name, value in columns.items():
+            self.types[name] = _widen(self.types.get(name), _value_type(value))
+
+    def summary(self) -> List[Dict[str, str]]:
+        """Get the schema as a list of {name, type}; columns only ever null are strings"""
+        return [{"name": name, "type": kind or "string"} for name, kind in self.types.items()]
+
+
+def spool_rows(rows: Iterable[Any], path: str, append: bool = False) -> Dict[str, Any]:
+    """
+    Write rows to an NDJSON file while deriving their schema.
+
+    Args:
+        rows: Iterable of records data items, consumed lazily
+        path: Path of the NDJSON file to write
+        append: Add the rows to an existing spool instead of replacing it; the
+            rows already in it count towards the row count and schema
+
+    Returns:
+        Dict with the number of rows and the SchemaBuilder
+    """
+    schema = SchemaBuilder()
+    count = 0
+    if append:
+        for batch in _read_batches(path, max(1, env_int("DIXA_EXPORT_BATCH_ROWS", 10000))):
+            for columns in batch:
+                schema.observe(columns)
+                count += 1
+    create_private_file(path)
+    with open(path, "a" if append else "w", encoding="utf-8") as spool:
+        for row in rows:
+            columns = flatten_row(row)
+            schema.observe(columns)
+            spool.write(json.dumps(columns, separators=(",", ":"), default=str))
+            spool.write("\n")
+            count += 1
+    return {"rows": count, "schema": schema}
+
+
+def _read_batches(path: str, batch_rows: int) -> Iterator[List[Dict[str, Any]]]:
+    batch: List[Dict[str, Any]] = []
+    with open(path, "r", encoding="utf-8") as spool:
+        for line in spool:
+            batch.append(json.loads(line))
+            if len(batch) >= batch_rows:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _coerce(value: Any, kind: str) -> Any:
+    if value is None:
+        return None
+    if kind == "string":
+        return value if isinstance(value, str) else json.dumps(value)
+    if kind == "float":
+        return float(value)
+    if kind == "int":
+        # A column widened from bool to int may still hold booleans
+        return int(value)
+    return value
+
+
+def convert_spool(spool_path: str, path: str, file_format: str, schema: SchemaBuilder) -> None:
+    """
+    Convert an NDJSON spool into a Parquet or Arrow IPC file in bounded batches.
+
+    Args:
+        spool_path: Path of the NDJSON file written by spool_rows
+        path: Path of the file to write
+        file_format: 'parquet' or 'arrow'
+        schema: Schema derived while spooling
+    """
+    import pyarrow as pa
+
+    arrow_types = {"bool": pa.bool_(), "int": pa.int64(), "float": pa.float64(), "string": pa.string()}
+    columns = schema.summary()
+    arrow_schema = pa.schema([(column["name"], arrow_types[column["type"]]) for column in columns])
+    batch_rows = max(1, env_int("DIXA_EXPORT_BATCH_ROWS", 10000))
+
+    create_private_file(path)
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(path, arrow_schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(path, arrow_schema)
+    try:
+        for batch in _read_batches(spool_path, batch_rows):
+            arrays = [
+                pa.array([_coerce(row.get(column["name"]), column["type"]) for row in batch],
+                         type=arrow_types[column["type"]])
+                for column in columns
+            ]
+            record_batch = pa.RecordBatch.from_arrays(arrays, schema=arrow_schema)
+            if file_format == "parquet":
+                writer.write_batch(record_batch)
+            else:
+                writer.write(record_batch)
+    finally:
+        writer.close()
@@ -0,0 +1,32 @@
+"""Search the values of an analytics filter attribute by label"""
+import json
+from tools.analytics.filter_index import get_filter_index
+
+
+def search_analytics_filter_values(
+    filter_attribute: str,
+    query: str,
+    limit: int = 20,
+    log=None,
+) -> str:
+    """
+    Search the possible values of an analytics filter attribute by label, e.g. find the
+    value of "the billing queue" for 'queue_id'. Prefer this over paging through
+    getAnalyticsFilter. Searches a local index of all values that is refreshed periodically.
+    
+    Args:
+        filter_attribute: The filter attribute to search values for (e.g., 'agent_id', 'queue_id', 'channel')
+        query: Text to search for; labels starting with it are returned first, then labels containing it
+            (case-insensitive). An exact filter value is also matched.
+        limit: Maximum number of values to return (default: 20)
+        log: Optional logger for debugging
+    
+    Returns:
+        JSON string of the matching filter values (value and label)
+    """
+    index = get_filter_index(filter_attribute, log=log)
+    result = {
+        "data": index.search(query, limit=limit),
+        "total_values": len(index),
+    }
+    return json.dumps(result, indent=2)
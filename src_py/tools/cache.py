@@ -0,0 +1,148 @@
+"""
+Cache of Dixa API responses.
+
+Entries hold the raw response body of successful requests together with the
+time they were stored, and live in the state backend selected by
+DIXA_STATE_BACKEND (see tools/state.py) so all workers share them. Keys
+start with the request URL so every entry for a resource can be dropped with
+a single prefix deletion, followed by the tenant so a tenant's entries can
+be told apart. Bodies are stored compressed with the tenant's dictionary
+(see tools/compression.py).
+"""
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
+
+from tools.compression import BodyCodec
+from tools.state import get_state_backend
+
+
+@dataclass
+class CacheEntry:
+    """A cached response body and the time it was stored"""
+    body: str
+    stored_at: float
+
+    @property
+    def age(self) -> float:
+        """Seconds since the entry was stored"""
+        return time.time() - self.stored_at
+
+
+def tenant_id(api_key: str) -> str:
+    """Derive a non-reversible tenant identifier from an API key"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(
+    tenant: str,
+    method: str,
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    json_data: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Build the cache key for a request.
+
+    Args:
+        tenant: Tenant identifier from tenant_id()
+        method: HTTP method
+        url: Full request URL
+        params: Query parameters
+        json_data: JSON body
+
+    Returns:
+        Key of the form "<url>|<tenant>|<method>|<query>|<body hash>"
+    """
+    query = urlencode(sorted((params or {}).items()))
+    body = ""
+    if json_data is not None:
+        encoded = json.dumps(json_data, sort_keys=True, separators=(",", ":"))
+        body = hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+    return f"{url}|{tenant}|{method.upper()}|{query}|{body}"
+
+
+def key_tenant(key: str) -> str:
+    """Get the tenant of a cache key built by cache_key()"""
+    parts = key.split("|", 2)
+    return parts[1] if len(parts) > 2 else ""
+
+
+def url_prefix(url: str) -> str:
+    """Get the key prefix shared by all cached entries for a URL"""
+    return f"{url}|"
+
+
+def _fresh(stored_at: float, max_age: Optional[float], final_after: Optional[float]) -> bool:
+    if final_after is not None and stored_at >= final_after:
+        return True
+    return max_age is None or time.time() - stored_at <= max_age
+
+
+class ResponseCache:
+    """Cache of compressed response bodies stored in the configured state backend"""
+
+    def __init__(self):
+        self.codec = BodyCodec()
+
+    def get(
+        self,
+        key: str,
+        max_age: Optional[float] = None,
+        final_after: Optional[float] = None,
+    ) -> Optional[CacheEntry]:
+        """
+        Get an entry if present and, when max_age is given, not older than max_age seconds.
+
+        Entries stored at or after final_after (a Unix timestamp, e.g. the end of
+        the period a response covers) can no longer change and are returned
+        whatever their age.
+        """
+        stored = get_state_backend().cache_get(key)
+        if stored is None or not _fresh(stored[1], max_age, final_after):
+            return None
+        body = self.codec.decode(stored[0], key_tenant(key))
+        if body is None:
+            return None
+        return CacheEntry(body=body, stored_at=stored[1])
+
+    def contains(
+        self,
+        key: str,
+        max_age: Optional[float] = None,
+        final_after: Optional[float] = None,
+    ) -> bool:
+        """Check whether get() would find an entry, without decompressing it"""
+        stored = get_state_backend().cache_get(key)
+        return stored is not None and _fresh(stored[1], max_age, final_after)
+
+    def set(self, key: str, body: str) -> None:
+        """Store a response body"""
+        get_state_backend().cache_set(key, self.codec.encode(body, key_tenant(key)), time.time())
+
+    def keys(self, prefix: str) -> List[str]:
+        """Get the keys of all entries starting with prefix"""
+        return get_state_backend().cache_keys(prefix)
+
+    def delete_prefix(self, prefix: str) -> int:
+        """Delete all entries whose key starts with prefix, returning how many were deleted"""
+        return get_state_backend().cache_delete_prefix(prefix)
+
+    def __len__(self) -> int:
+        return get_state_backend().cache_size()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the number of entries, their stored size and the compression achieved"""
+        backend = get_state_backend()
+        return {
+            "backend": type(backend).__name__,
+            "entries": backend.cache_size(),
+            "stored_bytes": backend.cache_bytes(),
+            "compression": self.codec.stats(),
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,278 @@
+"""
+Compression of cached response bodies.
+
+Cached Dixa responses are small JSON documents that repeat the same field
+names and values, so they compress poorly one by one but very well with a
+dictionary trained on earlier responses. Bodies are stored as compressed
+blobs with a 5 byte header (codec, then the 32-bit ID of the dictionary used
+or 0) and decompressed on read.
+
+The codec is selected with DIXA_CACHE_COMPRESSION:
+- "auto" (default): zstd if the optional 'zstandard' package is installed,
+  else zlib
+- "zstd", "zlib" or "none"
+
+Once DIXA_CACHE_DICT_SAMPLES bodies of a tenant have been stored, a
+dictionary of up to DIXA_CACHE_DICT_SIZE bytes is trained from them and used
+for that tenant's later writes. Dictionaries are built from response bodies,
+so they contain customer data: each tenant gets its own, and each expires
+after DIXA_CACHE_DICT_TTL_SECONDS (default one day) in the state backend and
+in memory. A replacement is trained once a dictionary is half way through
+its lifetime, and entries whose dictionary has expired are cache misses, so
+no response text outlives that limit. Dictionaries are published through the
+state backend, so workers sharing it can read each other's entries. Entries
+stored before compression was enabled are still read as plain bodies.
+"""
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.settings import env_float, env_int
+from tools.state import get_state_backend
+
+NONE, ZLIB, ZSTD = 1, 2, 3
+_CODEC_NAMES = {NONE: "none", ZLIB: "zlib", ZSTD: "zstd"}
+_HEADER = struct.Struct(">BI")
+# Dictionaries are stored prefixed with their expiry time
+_EXPIRY = struct.Struct(">d")
+
+# zlib can only refer back 32 KiB, so a larger dictionary would not help it
+_ZLIB_MAX_DICT_SIZE = 32768
+
+
+def _zstd_available() -> bool:
+    """Check whether the optional 'zstandard' package is installed"""
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def selected_codec() -> int:
+    """Get the codec used for new entries (DIXA_CACHE_COMPRESSION)"""
+    requested = os.getenv("DIXA_CACHE_COMPRESSION", "auto").strip().lower()
+    if requested == "none":
+        return NONE
+    if requested == "zlib":
+        return ZLIB
+    if requested not in ("auto", "zstd"):
+        raise ValueError(
+            f"Unsupported DIXA_CACHE_COMPRESSION '{requested}'. Use 'auto', 'zstd', 'zlib' or 'none'."
+        )
+    if _zstd_available():
+        return ZSTD
+    if requested == "zstd":
+        raise ImportError(
+            "DIXA_CACHE_COMPRESSION is 'zstd' but the 'zstandard' package is not installed. "
+            "Install it with: pip install zstandard"
+        )
+    return ZLIB
+
+
+def _dictionary_name(tenant: str, dict_id: int) -> str:
+    return f"cache-dictionary:{tenant}:{dict_id}"
+
+
+def dictionary_ttl() -> float:
+    """Lifetime in seconds of a compression dictionary (DIXA_CACHE_DICT_TTL_SECONDS)"""
+    return max(60.0, env_float("DIXA_CACHE_DICT_TTL_SECONDS", 86400.0))
+
+
+class BodyCodec:
+    """Encodes response bodies to compressed blobs and back, training an expiring dictionary per tenant"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (tenant, codec) -> (time sampling started, samples for the next dictionary)
+        self._samples: Dict[Tuple[str, int], Tuple[float, List[bytes]]] = {}
+        # (tenant, dict ID) -> (dictionary, expiry time)
+        self._dictionaries: Dict[Tuple[str, int], Tuple[bytes, float]] = {}
+        # (tenant, codec) -> (ID of the dictionary used for new writes, its expiry time)
+        self._current: Dict[Tuple[str, int], Tuple[int, float]] = {}
+        self._local = threading.local()
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.writes = 0
+
+    def _prune(self, now: float) -> None:
+        # Called with the lock held: forget expired dictionaries and stale samples
+        for key in [key for key, (_, expires_at) in self._dictionaries.items() if expires_at <= now]:
+            del self._dictionaries[key]
+        for key in [key for key, (_, expires_at) in self._current.items() if expires_at <= now]:
+            del self._current[key]
+        for key in [key for key, (started, _) in self._samples.items() if now - started > dictionary_ttl()]:
+            del self._samples[key]
+
+    def _dictionary(self, tenant: str, dict_id: int) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            entry = self._dictionaries.get((tenant, dict_id))
+            if entry is not None and entry[1] > now:
+                return entry[0]
+        stored = get_state_backend().blob_get(_dictionary_name(tenant, dict_id))
+        if stored is None or len(stored) < _EXPIRY.size:
+            return None
+        (expires_at,) = _EXPIRY.unpack_from(stored)
+        if expires_at <= now:
+            return None
+        data = stored[_EXPIRY.size:]
+        with self._lock:
+            self._dictionaries[(tenant, dict_id)] = (data, expires_at)
+        return data
+
+    def _train(self, tenant: str, codec: int, samples: List[bytes]) -> None:
+        size = env_int("DIXA_CACHE_DICT_SIZE", 32768)
+        if codec == ZSTD:
+            import zstandard
+            # Dictionaries much larger than a tenth of the samples overfit them
+            size = max(1024, min(size, sum(len(sample) for sample in samples) // 10))
+            try:
+                data = zstandard.train_dictionary(size, samples).as_bytes()
+            except zstandard.ZstdError:
+                # Too few or too similar samples to train; use their raw content instead
+                data = b"".join(samples)[-size:]
+        else:
+            # zlib matches best against the end of the dictionary
+            data = b"".join(samples)[-min(size, _ZLIB_MAX_DICT_SIZE):]
+        dict_id = zlib.crc32(data) or 1
+        ttl = dictionary_ttl()
+        expires_at = time.time() + ttl
+        get_state_backend().blob_set(_dictionary_name(tenant, dict_id), _EXPIRY.pack(expires_at) + data, ttl=ttl)
+        with self._lock:
+            self._prune(time.time())
+            self._dictionaries[(tenant, dict_id)] = (data, expires_at)
+            self._current[(tenant, codec)] = (dict_id, expires_at)
+
+    def _current_dictionary(self, tenant: str, codec: int, now: float) -> int:
+        current = self._current.get((tenant, codec))
+        return current[0] if current is not None and current[1] > now else 0
+
+    def _observe(self, tenant: str, codec: int, body: bytes, now: float) -> None:
+        wanted = env_int("DIXA_CACHE_DICT_SAMPLES", 100)
+        current = self._current.get((tenant, codec))
+        # Start sampling for a replacement half way through a dictionary's lifetime
+        if wanted <= 0 or (current is not None and now < current[1] - dictionary_ttl() / 2):
+            return
+        with self._lock:
+            _, samples = self._samples.setdefault((tenant, codec), (now, []))
+            if len(samples) >= wanted:
+                # Another thread is training on them
+                return
+            samples.append(body[:65536])
+            if len(samples) < wanted:
+                return
+        self._train(tenant, codec, samples)
+        with self._lock:
+            self._samples.pop((tenant, codec), None)
+
+    def _zstd(self, kind: str, tenant: str, dict_id: int) -> Any:
+        # zstandard (de)compressors are not thread-safe, so each thread keeps its own
+        import zstandard
+        cache = self._local.__dict__.setdefault(kind, {})
+        coder = cache.get((tenant, dict_id))
+        if coder is None:
+            # Drop coders holding dictionaries that have since expired
+            for key in [key for key in cache if key[1] and key not in self._dictionaries]:
+                del cache[key]
+            dictionary = zstandard.ZstdCompressionDict(self._dictionary(tenant, dict_id)) if dict_id else None
+            if kind == "compressor":
+                coder = zstandard.ZstdCompressor(
+                    level=env_int("DIXA_CACHE_COMPRESSION_LEVEL", 3),
+                    dict_data=dictionary,
+                    # The dictionary ID is already in the blob header
+                    write_dict_id=False,
+                )
+            else:
+                coder = zstandard.ZstdDecompressor(dict_data=dictionary)
+            cache[(tenant, dict_id)] = coder
+        return coder
+
+    def encode(self, body: str, tenant: str = "") -> bytes:
+        """
+        Compress a response body.
+
+        Args:
+            body: Response body
+            tenant: Tenant the body belongs to, whose dictionary is used
+
+        Returns:
+            The blob to store
+        """
+        raw = body.encode("utf-8")
+        codec = selected_codec()
+        if codec == NONE or len(raw) < env_int("DIXA_CACHE_COMPRESS_MIN_BYTES", 64):
+            blob = _HEADER.pack(NONE, 0) + raw
+        else:
+            now = time.time()
+            self._observe(tenant, codec, raw, now)
+            dict_id = self._current_dictionary(tenant, codec, now)
+            dictionary = self._dictionary(tenant, dict_id) if dict_id else None
+            if dictionary is None:
+                dict_id = 0
+            if codec == ZSTD:
+                payload = self._zstd("compressor", tenant, dict_id).compress(raw)
+            else:
+                level = env_int("DIXA_CACHE_COMPRESSION_LEVEL", 6)
+                compressor = zlib.compressobj(level, zdict=dictionary) if dictionary else zlib.compressobj(level)
+                payload = compressor.compress(raw) + compressor.flush()
+            blob = _HEADER.pack(codec, dict_id) + payload
+        with self._lock:
+            self.writes += 1
+            self.raw_bytes += len(raw)
+            self.stored_bytes += len(blob)
+        return blob
+
+    def decode(self, blob: bytes, tenant: str = "") -> Optional[str]:
+        """
+        Decompress a stored blob.
+
+        Args:
+            blob: Stored blob
+            tenant: Tenant the blob belongs to
+
+        Returns:
+            The response body, or None if the blob cannot be decoded (e.g. its
+            dictionary has expired)
+        """
+        if not blob or blob[0] not in _CODEC_NAMES:
+            # Stored before compression was introduced
+            return blob.decode("utf-8")
+        codec, dict_id = _HEADER.unpack_from(blob)
+        payload = blob[_HEADER.size:]
+        if codec == NONE:
+            return payload.decode("utf-8")
+        dictionary = self._dictionary(tenant, dict_id) if dict_id else None
+        if dict_id and dictionary is None:
+            return None
+        try:
+            if codec == ZSTD:
+                if not _zstd_available():
+                    return None
+                raw = self._zstd("decompressor", tenant, dict_id).decompress(payload)
+            else:
+                decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+                raw = decompressor.decompress(payload) + decompressor.flush()
+        except Exception:
+            return None
+        return raw.decode("utf-8")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the codec in use and the compression achieved on writes so far"""
+        with self._lock:
+            self._prune(time.time())
+            return {
+                "codec": _CODEC_NAMES[selected_codec()],
+                "dictionaries": {
+                    "count": len(self._dictionaries),
+                    "size_bytes": sum(len(data) for data, _ in self._dictionaries.values()),
+                    "ttl_seconds": dictionary_ttl(),
+                },
+                "writes": self.writes,
+                "raw_bytes": self.raw_bytes,
+                "stored_bytes": self.stored_bytes,
+                "compression_ratio": round(self.raw_bytes / self.stored_bytes, 2) if self.stored_bytes else None,
+            }
@@ -0,0 +1,41 @@
+"""
+Helpers for fanning out Dixa API calls concurrently.
+
+Calls run in worker threads with a copy of the caller's context, so context
+variables such as the current session are visible to them, and are profiled
+along with the calling tool invocation when it is profiled.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Sequence, TypeVar, Union
+
+from tools.profiling import profile_worker
+
+T = TypeVar("T")
+
+
+def run_concurrently(
+    calls: Sequence[Callable[[], T]],
+    max_workers: int,
+) -> List[Union[T, Exception]]:
+    """
+    Run zero-argument calls concurrently.
+
+    Args:
+        calls: Functions to run
+        max_workers: Maximum number of calls running at the same time
+
+    Returns:
+        The result of each call in the order of calls, or the exception it raised
+    """
+    if not calls:
+        return []
+    results: List[Union[T, Exception]] = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(calls)))) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, profile_worker, call) for call in calls]
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+    return results
@@ -1,4 +1,5 @@
 """Get a single conversation by ID from Dixa"""
+from tools.endpoints import endpoint_url
 from tools.utils import make_request
 
 
@@ -13,7 +14,7 @@ def get_conversation(conversation_id: str, log=None) -> str:
     Returns:
         JSON string of the conversation data
     """
-    url = f"https://dev.dixa.io/v1/conversations/{conversation_id}"
+    url = endpoint_url("conversation", conversation_id=conversation_id)
     data = make_request("GET", url, log=log)
     return data
 
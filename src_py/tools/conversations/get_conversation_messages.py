@@ -1,4 +1,5 @@
 """Get all messages for a specific conversation from Dixa"""
+from tools.endpoints import endpoint_url
 from tools.utils import make_request
 
 
@@ -13,7 +14,7 @@ def get_conversation_messages(conversation_id: str, log=None) -> str:
     Returns:
         JSON string of the messages data
     """
-    url = f"https://dev.dixa.io/v1/conversations/{conversation_id}/messages"
+    url = endpoint_url("conversation_messages", conversation_id=conversation_id)
     data = make_request("GET", url, log=log)
     return data
 
@@ -1,13 +1,18 @@
 """Search conversations in Dixa"""
+import json
 from typing import Optional
-from tools.utils import make_request
+from tools.endpoints import endpoint_url
+from tools.enrichment import enrich_conversations
+from tools.page_sizing import choose_page_limit, observe_output
+from tools.utils import make_request, request_data
 
 
 def search_conversations(
     query: str,
     exact_match: bool = True,
     page_key: Optional[str] = None,
-    page_limit: int = 50,
+    page_limit: Optional[int] = None,
+    enrich: bool = False,
     log=None,
 ) -> str:
     """
@@ -17,7 +22,10 @@ def search_conversations(
         query: The search query string
         exact_match: Whether to perform exact matching (default: True)
         page_key: Pagination key for next page of results
-        page_limit: Number of results per page (default: 50)
+        page_limit: Number of results per page (default: chosen automatically from the typical size of results)
+        enrich: Whether to add the names of the requester, assignee and tags to each
+            conversation (as '_labels'), saving separate getEndUser, getAgent and
+            getConversationTags calls (default: False)
         log: Optional logger for debugging
     
     Returns:
@@ -30,10 +38,14 @@ def search_conversations(
     
     if page_key:
         params["pageKey"] = page_key
-    if page_limit is not None:
-        params["pageLimit"] = str(page_limit)
+    params["pageLimit"] = str(choose_page_limit("search_conversations", page_limit))
     
-    url = "https://dev.dixa.io/v1/search/conversations"
+    url = endpoint_url("search_conversations")
+    if enrich:
+        response = enrich_conversations(request_data("GET", url, params=params, log=log), log=log)
+        output = json.dumps(response, indent=2)
+        observe_output("search_conversations", "GET", response, output)
+        return output
     data = make_request("GET", url, params=params, log=log)
     return data
 
@@ -0,0 +1,247 @@
+"""
+Deadlines and cancellation for tool invocations.
+
+Each tool invocation runs inside a CallScope holding its deadline and whether
+it was cancelled (e.g. the MCP client cancelled the call or timed out). The
+scope is kept in a context variable, so every upstream call made for the
+invocation, including fan-out threads and pagination, sees it:
+- request timeouts are capped to the time left before the deadline
+- no new request is started once the deadline passed or the call was cancelled
+- on cancellation, waiting callers return immediately and the requests
+  still in progress are aborted, whether they are waiting for the response
+  headers or receiving the body (requests run as tasks on the transport's
+  event loop, see tools/transport.py, and are cancelled)
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a tool invocation runs past its deadline"""
+
+
+class RequestCancelled(Exception):
+    """Raised when a tool invocation was cancelled by the client"""
+
+
+class CallScope:
+    """Deadline and cancellation state of one tool invocation"""
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.cancelled = False
+        self.expired = False
+        self._lock = threading.Lock()
+        self._waiters: Set[threading.Event] = set()
+        self._requests: Set[Future] = set()
+        self._children: Set["CallScope"] = set()
+        self._parent: Optional["CallScope"] = None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None if there is no deadline"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self) -> None:
+        """Raise if the invocation was cancelled or its deadline has passed"""
+        if self.cancelled:
+            raise RequestCancelled("The tool call was cancelled")
+        if self.expired or (self.deadline is not None and time.monotonic() >= self.deadline):
+            self._interrupt(expired=True)
+            raise DeadlineExceeded("The tool call ran out of time before Dixa answered")
+
+    def cancel(self) -> None:
+        """Cancel the invocation, aborting its outstanding requests"""
+        self._interrupt(expired=False)
+
+    def _interrupt(self, expired: bool) -> None:
+        with self._lock:
+            if expired:
+                self.expired = True
+            else:
+                self.cancelled = True
+            waiters = list(self._waiters)
+            requests = list(self._requests)
+            children = list(self._children)
+        for child in children:
+            child._interrupt(expired)
+        for request in requests:
+            request.cancel()
+        for waiter in waiters:
+            waiter.set()
+
+    def track(self, request: Future) -> None:
+        """Register a request in progress so cancellation can abort it"""
+        with self._lock:
+            self._requests.add(request)
+        if self.cancelled or self.expired:
+            request.cancel()
+
+    def untrack(self, request: Future) -> None:
+        """Unregister a request once it has finished"""
+        with self._lock:
+            self._requests.discard(request)
+
+    def child(self) -> "CallScope":
+        """
+        Create a scope sharing this scope's deadline that is also stopped along with it.
+
+        A child can be cancelled on its own, e.g. to abort the losing one of two
+        redundant requests, without affecting this scope. Call close() on the
+        child once it is no longer needed.
+        """
+        child = CallScope()
+        child.deadline = self.deadline
+        child._parent = self
+        with self._lock:
+            self._children.add(child)
+        if self.cancelled or self.expired:
+            child._interrupt(self.expired and not self.cancelled)
+        return child
+
+    def close(self) -> None:
+        """Detach a child scope from its parent"""
+        parent = self._parent
+        if parent is not None:
+            with parent._lock:
+                parent._children.discard(self)
+
+    def _add_waiter(self, event: threading.Event) -> None:
+        with self._lock:
+            self._waiters.add(event)
+
+    def _remove_waiter(self, event: threading.Event) -> None:
+        with self._lock:
+            self._waiters.discard(event)
+
+
+_current_scope: contextvars.ContextVar[Optional[CallScope]] = contextvars.ContextVar(
+    "_current_scope", default=None
+)
+
+
+def current_scope() -> Optional[CallScope]:
+    """Get the scope of the current tool invocation, if any"""
+    return _current_scope.get()
+
+
+@contextmanager
+def call_scope(timeout: Optional[float]) -> Iterator[CallScope]:
+    """Run the enclosed code in a new scope with the given deadline in seconds"""
+    scope = CallScope(timeout)
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+def child_context() -> Tuple[contextvars.Context, CallScope]:
+    """
+    Copy the current context, giving it a child of the current scope.
+
+    Returns:
+        The context to run the work in, and the scope to cancel just that work
+        with (a new scope without a deadline if there is no current scope)
+    """
+    context = contextvars.copy_context()
+    parent = current_scope()
+    scope = parent.child() if parent is not None else CallScope()
+    context.run(_current_scope.set, scope)
+    return context, scope
+
+
+def check_deadline() -> None:
+    """Raise if the current invocation was cancelled or ran out of time"""
+    scope = current_scope()
+    if scope is not None:
+        scope.check()
+
+
+def cap_timeout(timeout: float) -> float:
+    """
+    Cap a request timeout to the time left in the current invocation.
+
+    Raises:
+        DeadlineExceeded or RequestCancelled if no time is left
+    """
+    scope = current_scope()
+    if scope is None:
+        return timeout
+    scope.check()
+    remaining = scope.remaining()
+    return timeout if remaining is None else min(timeout, remaining)
+
+
+def wait_cancellable(request: "Future[T]") -> T:
+    """
+    Wait for a request running in the background, aborting it if the invocation stops.
+
+    Without a scope this simply waits for the result. With one, the caller
+    waits until the request finishes, the deadline passes or the invocation
+    is cancelled; in the latter two cases the request is cancelled and the
+    caller gets DeadlineExceeded or RequestCancelled right away.
+    """
+    scope = current_scope()
+    if scope is None:
+        return request.result()
+    wake = threading.Event()
+    request.add_done_callback(lambda _: wake.set())
+    scope.track(request)
+    scope._add_waiter(wake)
+    try:
+        wake.wait(scope.remaining())
+        if request.done() and not request.cancelled() and not (scope.cancelled or scope.expired):
+            return request.result()
+        if not scope.cancelled:
+            scope._interrupt(expired=True)
+        scope.check()
+        return request.result()
+    finally:
+        scope._remove_waiter(wake)
+        scope.untrack(request)
+
+
+def wait_event(event: threading.Event, timeout: Optional[float] = None) -> bool:
+    """
+    Wait for an event, giving up when the current invocation is cancelled or out of time.
+
+    Returns:
+        Whether the event was set
+    """
+    scope = current_scope()
+    if scope is None:
+        return event.wait(timeout)
+    end = time.monotonic() + timeout if timeout is not None else None
+    while True:
+        scope.check()
+        slice_ = 0.1
+        if end is not None:
+            slice_ = min(slice_, max(0.0, end - time.monotonic()))
+        if event.wait(slice_):
+            return True
+        if end is not None and time.monotonic() >= end:
+            return False
+
+
+def sleep(seconds: float) -> None:
+    """Sleep, giving up early when the current invocation is cancelled or would run out of time"""
+    scope = current_scope()
+    if scope is not None:
+        remaining = scope.remaining()
+        if remaining is not None and seconds > remaining:
+            scope._interrupt(expired=True)
+            scope.check()
+    wait_event(threading.Event(), seconds)
+
+
+def partial_results(results: List[Any]) -> bool:
+    """Whether any fan-out result was cut short by the deadline or a cancellation"""
+    return any(isinstance(result, (DeadlineExceeded, RequestCancelled)) for result in results)
@@ -0,0 +1,105 @@
+"""
+Central registry of Dixa API endpoints.
+
+Every tool builds its URL through this module instead of formatting its own
+``https://dev.dixa.io/v1/...`` string, so the base URL and the transport used
+to reach it are chosen in a single place.
+"""
+import os
+import re
+from typing import Dict, Optional
+from urllib.parse import quote
+
+# Base URL of the Dixa API (overridable for testing against another environment)
+DIXA_API_BASE_URL = os.getenv("DIXA_API_BASE_URL", "https://dev.dixa.io").rstrip("/")
+
+# Endpoint name -> path template. Placeholders are filled by endpoint_url().
+ENDPOINTS: Dict[str, str] = {
+    # Conversations
+    "search_conversations": "/v1/search/conversations",
+    "conversation": "/v1/conversations/{conversation_id}",
+    "conversation_messages": "/v1/conversations/{conversation_id}/messages",
+    "conversation_notes": "/v1/conversations/{conversation_id}/notes",
+    "conversation_ratings": "/v1/conversations/{conversation_id}/ratings",
+    # Tags
+    "tags": "/v1/tags",
+    "conversation_tags": "/v1/conversations/{conversation_id}/tags",
+    "conversation_tag": "/v1/conversations/{conversation_id}/tags/{tag_id}",
+    # End users
+    "end_user": "/v1/endusers/{user_id}",
+    "end_user_conversations": "/v1/endusers/{user_id}/conversations",
+    # Agents
+    "agents": "/v1/agents",
+    "agent": "/v1/agents/{agent_id}",
+    # Analytics
+    "analytics_metrics": "/v1/analytics/metrics",
+    "analytics_metric": "/v1/analytics/metrics/{metric_id}",
+    "analytics_records": "/v1/analytics/records",
+    "analytics_record": "/v1/analytics/records/{record_id}",
+    "analytics_records_data": "/v1/analytics/records/{record_id}/data",
+    "analytics_filter": "/v1/analytics/filter/{filter_attribute}",
+    # Organization
+    "organization": "/v1/organization",
+    "organizations": "/v1/organizations",
+}
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+def _template_pattern(template: str) -> "re.Pattern[str]":
+    """Compile a path template into a regex matching concrete paths"""
+    parts = _PLACEHOLDER.split(template)
+    # split() alternates literal text and placeholder names
+    regex = "".join(re.escape(part) if i % 2 == 0 else "[^/]+" for i, part in enumerate(parts))
+    return re.compile("^" + regex + "$")
+
+
+# Longest templates first so e.g. ".../tags/{tag_id}" wins over ".../{conversation_id}"
+_PATTERNS = sorted(
+    ((name, _template_pattern(template)) for name, template in ENDPOINTS.items()),
+    key=lambda item: len(ENDPOINTS[item[0]]),
+    reverse=True,
+)
+
+
+def endpoint_url(name: str, **path_params: str) -> str:
+    """
+    Build the full URL for a registered endpoint.
+
+    Args:
+        name: Name of the endpoint in ENDPOINTS
+        **path_params: Values for the placeholders in the path template
+
+    Returns:
+        The full URL including the configured base URL
+    """
+    try:
+        template = ENDPOINTS[name]
+    except KeyError:
+        raise ValueError(f"Unknown Dixa endpoint: {name}")
+
+    def substitute(match: "re.Match[str]") -> str:
+        key = match.group(1)
+        if key not in path_params:
+            raise ValueError(f"Missing path parameter '{key}' for endpoint {name}")
+        return quote(str(path_params[key]), safe="")
+
+    return DIXA_API_BASE_URL + _PLACEHOLDER.sub(substitute, template)
+
+
+def match_endpoint(url: str) -> Optional[str]:
+    """
+    Resolve a full URL back to its endpoint name.
+
+    Args:
+        url: A URL previously built with endpoint_url()
+
+    Returns:
+        The endpoint name, or None if the URL is not a registered endpoint
+    """
+    path = url[len(DIXA_API_BASE_URL):] if url.startswith(DIXA_API_BASE_URL) else url
+    path = path.split("?", 1)[0]
+    for name, pattern in _PATTERNS:
+        if pattern.match(path):
+            return name
+    return None
@@ -0,0 +1,221 @@
+"""
+Enrichment of conversation lists with the labels of the entities they reference.
+
+Conversations only carry IDs for their requester, assignee and tags. Instead
+of leaving the caller to look each of them up, enrich_conversations() collects
+the IDs referenced across a whole page, looks every distinct entity up once
+and adds a compact "_labels" object to each conversation:
+- requesters are read from the end user endpoint (cached responses)
+- assignees come from the agent directory, falling back to the agent endpoint
+- tags the conversation carries as objects are used as they are; tag IDs are
+  resolved through one read of the tag list; otherwise the conversation's
+  tags are read (cached and kept fresh by webhook events when enabled). Dixa
+  has no endpoint returning the tags of several conversations, so at most
+  DIXA_ENRICH_MAX_TAG_LOOKUPS of these reads go upstream per page; cached
+  ones do not count, and the tags of the remaining conversations are left
+  unresolved
+Lookups run concurrently, up to DIXA_ENRICH_MAX_CONCURRENCY at a time, and
+are served from the response cache for DIXA_ENRICH_CACHE_MAX_AGE_SECONDS.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tools.agents.agent_directory import compact_agent, get_agent_directory
+from tools.cache import cache_key, response_cache, tenant_id
+from tools.concurrency import run_concurrently
+from tools.deadlines import partial_results
+from tools.endpoints import endpoint_url
+from tools.pagination import page_items
+from tools.settings import env_float, env_int
+from tools.utils import cached_request_data, get_api_key
+
+
+def compact_end_user(user: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce an end user to the fields needed to identify them"""
+    return {
+        "id": user.get("id"),
+        "name": user.get("displayName") or user.get("name"),
+        "email": user.get("email"),
+        "phone": user.get("phoneNumber"),
+    }
+
+
+def compact_tag(tag: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a tag to its ID and name"""
+    return {"id": tag.get("id"), "name": tag.get("name")}
+
+
+def _conversation(item: Any) -> Optional[Dict[str, Any]]:
+    # Search results may wrap the conversation next to match information
+    if not isinstance(item, dict):
+        return None
+    nested = item.get("conversation")
+    return nested if isinstance(nested, dict) else item
+
+
+def _assignee_id(conversation: Dict[str, Any]) -> Optional[str]:
+    assignment = conversation.get("assignment")
+    if isinstance(assignment, dict) and assignment.get("agentId"):
+        return str(assignment["agentId"])
+    for field in ("assigneeId", "agentId"):
+        if conversation.get(field):
+            return str(conversation[field])
+    return None
+
+
+def _tag_ids(conversation: Dict[str, Any]) -> Optional[List[str]]:
+    for field in ("tagIds", "tags"):
+        value = conversation.get(field)
+        if isinstance(value, list) and all(isinstance(tag, str) for tag in value):
+            return value
+    return None
+
+
+def _embedded_tags(conversation: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    # Some responses carry the tag objects themselves, which need no lookup
+    value = conversation.get("tags")
+    if isinstance(value, list) and value and all(isinstance(tag, dict) for tag in value):
+        return [compact_tag(tag) for tag in value]
+    return None
+
+
+def _needs_tag_lookup(conversation: Dict[str, Any]) -> bool:
+    return (
+        conversation.get("id") is not None
+        and _tag_ids(conversation) is None
+        and _embedded_tags(conversation) is None
+    )
+
+
+def _data(response: Any) -> Any:
+    return response.get("data") if isinstance(response, dict) else response
+
+
+def _unique(values: List[Optional[str]]) -> List[str]:
+    return list(dict.fromkeys(value for value in values if value))
+
+
+def enrich_conversations(response: Any, log=None) -> Any:
+    """
+    Add "_labels" with the requester, assignee and tags to each conversation of a page.
+
+    Args:
+        response: Parsed paginated response of conversations, modified in place
+        log: Optional logger for debugging
+
+    Returns:
+        The response, with "_enrichment" reporting failed lookups
+    """
+    conversations = [c for c in (_conversation(item) for item in page_items(response)) if c is not None]
+    if not conversations:
+        return response
+    max_age = env_float("DIXA_ENRICH_CACHE_MAX_AGE_SECONDS", 300.0)
+    max_workers = env_int("DIXA_ENRICH_MAX_CONCURRENCY", 8)
+
+    def get(endpoint: str, **path_params: str) -> Any:
+        url = endpoint_url(endpoint, **path_params)
+        return _data(cached_request_data("GET", url, max_age=max_age, log=log))
+
+    requester_ids = _unique([str(c["requesterId"]) if c.get("requesterId") else None for c in conversations])
+    assignee_ids = _unique([_assignee_id(c) for c in conversations])
+    needs_tag_list = any(_tag_ids(c) is not None for c in conversations)
+    tag_conversation_ids: List[str] = []
+    skipped_tags: List[str] = []
+    max_tag_lookups = env_int("DIXA_ENRICH_MAX_TAG_LOOKUPS", 25)
+    tenant = tenant_id(get_api_key())
+    upstream_tag_lookups = 0
+    for conversation_id in _unique([str(c["id"]) for c in conversations if _needs_tag_lookup(c)]):
+        url = endpoint_url("conversation_tags", conversation_id=conversation_id)
+        if not response_cache.contains(cache_key(tenant, "GET", url, None), max_age):
+            if upstream_tag_lookups >= max_tag_lookups:
+                skipped_tags.append(conversation_id)
+                continue
+            upstream_tag_lookups += 1
+        tag_conversation_ids.append(conversation_id)
+
+    # Every distinct entity is looked up once, all lookups at the same time
+    lookups: List[Tuple[str, str, Callable[[], Any]]] = []
+    if assignee_ids:
+        directory = get_agent_directory()
+        lookups.append(("directory", "", lambda: directory.ensure_loaded(log=log)))
+    if needs_tag_list:
+        lookups.append(("tag_list", "", lambda: get("tags")))
+    lookups.extend(
+        ("requester", user_id, lambda user_id=user_id: compact_end_user(get("end_user", user_id=user_id)))
+        for user_id in requester_ids
+    )
+    lookups.extend(
+        ("tags", conversation_id,
+         lambda conversation_id=conversation_id: [
+             compact_tag(tag) for tag in get("conversation_tags", conversation_id=conversation_id) or []
+         ])
+        for conversation_id in tag_conversation_ids
+    )
+    results = run_concurrently([call for _, _, call in lookups], max_workers=max_workers)
+    resolved: Dict[Tuple[str, str], Any] = {
+        (kind, entity_id): result for (kind, entity_id, _), result in zip(lookups, results)
+    }
+
+    agents: Dict[str, Any] = {}
+    missing_agents: List[str] = []
+    for agent_id in assignee_ids:
+        agent = None if isinstance(resolved.get(("directory", "")), Exception) else directory.get(agent_id)
+        if agent is not None:
+            agents[agent_id] = compact_agent(agent)
+        else:
+            missing_agents.append(agent_id)
+    # Agents not in the directory (e.g. created since its last refresh) are fetched one by one
+    fallback = run_concurrently(
+        [lambda agent_id=agent_id: compact_agent(get("agent", agent_id=agent_id)) for agent_id in missing_agents],
+        max_workers=max_workers,
+    )
+    agents.update(zip(missing_agents, fallback))
+    results.extend(fallback)
+
+    tag_names: Dict[str, Any] = {}
+    tag_list = resolved.get(("tag_list", ""))
+    if isinstance(tag_list, list):
+        tag_names = {str(tag.get("id")): compact_tag(tag) for tag in tag_list if isinstance(tag, dict)}
+
+    failed: Dict[str, str] = {}
+
+    def label(kind: str, entity_id: str, value: Any, unresolved: Any) -> Any:
+        if isinstance(value, Exception):
+            failed[f"{kind}:{entity_id}"] = str(value)
+            return unresolved
+        return value
+
+    for conversation in conversations:
+        labels: Dict[str, Any] = {}
+        if conversation.get("requesterId"):
+            user_id = str(conversation["requesterId"])
+            labels["requester"] = label("requester", user_id, resolved[("requester", user_id)], {"id": user_id})
+        agent_id = _assignee_id(conversation)
+        if agent_id:
+            labels["assignee"] = label("agent", agent_id, agents[agent_id], {"id": agent_id})
+        tag_ids = _tag_ids(conversation)
+        embedded_tags = _embedded_tags(conversation)
+        if tag_ids is not None:
+            labels["tags"] = [tag_names.get(tag_id, {"id": tag_id}) for tag_id in tag_ids]
+            if isinstance(tag_list, Exception):
+                failed["tag_list"] = str(tag_list)
+        elif embedded_tags is not None:
+            labels["tags"] = embedded_tags
+        elif conversation.get("id") is not None:
+            conversation_id = str(conversation["id"])
+            if ("tags", conversation_id) in resolved:
+                labels["tags"] = label("tags", conversation_id, resolved[("tags", conversation_id)], None)
+            else:
+                labels["tags"] = None
+        conversation["_labels"] = labels
+
+    if failed or skipped_tags or partial_results(results):
+        enrichment: Dict[str, Any] = {"failed_lookups": failed}
+        if skipped_tags:
+            # Over the per-page budget; getConversationTags reads them one by one
+            enrichment["tags_not_looked_up"] = skipped_tags
+        if partial_results(results):
+            # Some lookups did not finish before the deadline
+            enrichment["partial"] = True
+        if isinstance(response, dict):
+            response["_enrichment"] = enrichment
+    return response
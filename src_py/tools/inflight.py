@@ -0,0 +1,119 @@
+"""
+De-duplication of identical in-flight GET requests.
+
+When several callers request the same resource at the same time, only one of
+them (the leader) calls Dixa; the others wait for its result. Within a
+process, followers share the leader's result directly. Across processes, the
+leader holds a lease in the shared state backend (see tools/state.py) and
+followers in other processes wait for the response it stores in the cache.
+"""
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from tools import metrics
+from tools.cache import response_cache
+from tools.deadlines import DeadlineExceeded, RequestCancelled, sleep, wait_event
+from tools.settings import env_bool, env_float
+from tools.state import get_state_backend
+
+# (parsed data, raw response body or None)
+Result = Tuple[Any, Optional[str]]
+
+
+class _Flight:
+    """A request in progress in this process"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Result] = None
+        self.error: Optional[BaseException] = None
+
+
+_flights: Dict[str, _Flight] = {}
+_flights_lock = threading.Lock()
+
+
+def _copy(result: Result) -> Result:
+    # Each caller gets its own copy so one caller's changes cannot leak into another's
+    data, body = result
+    return (json.loads(body) if body is not None else data), body
+
+
+def _wait_for_shared_leader(key: str, lease_key: str, previous_stored_at: Optional[float]) -> Optional[Result]:
+    """Wait for another process's leader to store a newer cache entry for key"""
+    backend = get_state_backend()
+    poll = env_float("DIXA_INFLIGHT_POLL_SECONDS", 0.05)
+    deadline = time.monotonic() + env_float("DIXA_INFLIGHT_LEASE_SECONDS", 35.0)
+    while time.monotonic() < deadline:
+        entry = response_cache.get(key)
+        if entry is not None and (previous_stored_at is None or entry.stored_at > previous_stored_at):
+            return json.loads(entry.body), entry.body
+        if not backend.has_lease(lease_key):
+            # The leader finished without storing a result (e.g. it failed)
+            return None
+        sleep(poll)
+    return None
+
+
+def _lead(key: str, fetch: Callable[[], Result], endpoint: str) -> Result:
+    backend = get_state_backend()
+    if not backend.shared:
+        return fetch()
+    lease_key = f"inflight:{key}"
+    previous = response_cache.get(key)
+    lease_seconds = env_float("DIXA_INFLIGHT_LEASE_SECONDS", 35.0)
+    if not backend.acquire_lease(lease_key, lease_seconds):
+        metrics.increment("dedupe_joined_remote", endpoint)
+        result = _wait_for_shared_leader(key, lease_key, previous.stored_at if previous else None)
+        if result is not None:
+            return result
+        return fetch()
+    try:
+        return fetch()
+    finally:
+        backend.release_lease(lease_key)
+
+
+def deduplicate(key: str, fetch: Callable[[], Result], endpoint: str = "other") -> Result:
+    """
+    Run fetch for key unless an identical request is already in flight.
+
+    Args:
+        key: Cache key of the request
+        fetch: Function performing the request and storing its response in the cache
+        endpoint: Endpoint name, used for metrics
+
+    Returns:
+        (parsed data, raw response body) of the request
+    """
+    if not env_bool("DIXA_INFLIGHT_DEDUPE_ENABLED", True):
+        return fetch()
+
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        metrics.increment("dedupe_joined", endpoint)
+        wait_event(flight.done)
+        if isinstance(flight.error, (DeadlineExceeded, RequestCancelled)):
+            # The leader's own invocation ran out of time; that says nothing about this one
+            return fetch()
+        if flight.error is not None:
+            raise flight.error
+        return _copy(flight.result)
+
+    try:
+        flight.result = _lead(key, fetch, endpoint)
+        return flight.result
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
@@ -1,5 +1,7 @@
 """Info tools for Dixa MCP Server"""
 from .get_api_info import get_api_info
+from .get_server_metrics import get_server_metrics
+from .configure_profiling import admin_tools_enabled, caller_is_admin, configure_profiling
 
-__all__ = ["get_api_info"]
+__all__ = ["get_api_info", "get_server_metrics", "admin_tools_enabled", "caller_is_admin", "configure_profiling"]
 
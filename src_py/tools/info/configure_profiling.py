@@ -0,0 +1,70 @@
+"""Turn profiling of tool invocations on or off at runtime (admin only)"""
+import json
+import os
+from typing import List, Optional
+from tools import profiling
+from tools.cache import tenant_id
+from tools.settings import env_bool, env_list
+from tools.utils import get_api_key
+
+
+def admin_tools_enabled() -> bool:
+    """Whether admin-only tools are available (DIXA_ADMIN_TOOLS_ENABLED, default: false)"""
+    return env_bool("DIXA_ADMIN_TOOLS_ENABLED", False)
+
+
+def caller_is_admin() -> bool:
+    """
+    Whether the current caller may use admin-only tools.
+
+    Admin tools change settings of the whole server process, which every
+    client shares. Besides DIXA_ADMIN_TOOLS_ENABLED, the caller's API key must
+    therefore belong to a tenant listed in DIXA_ADMIN_TENANTS (default: the
+    tenant of the server's own DIXA_API_KEY), so clients connecting with
+    their own API keys cannot use them.
+    """
+    if not admin_tools_enabled():
+        return False
+    admins = env_list("DIXA_ADMIN_TENANTS", [])
+    if not admins and os.getenv("DIXA_API_KEY"):
+        admins = [tenant_id(os.environ["DIXA_API_KEY"].strip())]
+    return tenant_id(get_api_key()) in admins
+
+
+def configure_profiling(
+    tools: Optional[List[str]] = None,
+    sample_rate: Optional[float] = None,
+    mode: Optional[str] = None,
+    log=None,
+) -> str:
+    """
+    Profile selected tool invocations of this server to find out where their time goes
+    (waiting for Dixa, decoding responses or encoding results). Each profiled call
+    writes one file to the profile directory. Call without arguments to see the
+    current settings and the latest profiles.
+    The settings apply to the calls of every client of this server, so only
+    admin tenants (DIXA_ADMIN_TENANTS) may change them.
+
+    Args:
+        tools: Names of tools to profile on every call, e.g. ['search_conversations']
+            (an empty list stops profiling by name)
+        sample_rate: Fraction between 0 and 1 of calls of any other tool to profile (0 disables it)
+        mode: 'deterministic' (cProfile, .pstats files) or 'sampling' (collapsed stacks, .folded files)
+        log: Optional logger for debugging
+
+    Returns:
+        JSON string of the profiling settings and the most recent profile files
+    """
+    if not admin_tools_enabled():
+        raise PermissionError("Profiling is an admin tool; set DIXA_ADMIN_TOOLS_ENABLED=true to use it")
+    if not caller_is_admin():
+        raise PermissionError(
+            "Profiling is an admin tool; the tenant of your API key is not listed in DIXA_ADMIN_TENANTS"
+        )
+    config = profiling.configure(tools=tools, sample_rate=sample_rate, mode=mode)
+    result = {
+        "profiling": config,
+        "directory": profiling.profile_dir(),
+        "recent_profiles": profiling.recent_profiles(),
+    }
+    return json.dumps(result, indent=2)
@@ -1,6 +1,7 @@
 """Get API key information and organization details from Dixa"""
 import os
 import json
+from tools.endpoints import endpoint_url
 from tools.utils import get_api_key, make_request
 
 
@@ -54,7 +55,7 @@ def get_api_info(log=None, session=None) -> str:
         
         # Try /v1/organization endpoint first
         try:
-            url = "https://dev.dixa.io/v1/organization"
+            url = endpoint_url("organization")
             org_data = make_request("GET", url, log=log, session=session)
             organization_info = json.loads(org_data)
             # Handle case where response is wrapped in 'data' key
@@ -64,7 +65,7 @@ def get_api_info(log=None, session=None) -> str:
             error_message = str(e)
             # Try alternative endpoint /v1/organizations
             try:
-                url = "https://dev.dixa.io/v1/organizations"
+                url = endpoint_url("organizations")
                 org_data = make_request("GET", url, log=log, session=session)
                 organization_info = json.loads(org_data)
                 # Handle case where response is wrapped in 'data' key
@@ -0,0 +1,39 @@
+"""Get request metrics and circuit breaker states of this server"""
+import json
+from tools import metrics, page_sizing
+from tools.cache import response_cache, tenant_id
+from tools.resilience import breaker_states
+from tools.utils import get_api_key
+
+
+def get_server_metrics(log=None) -> str:
+    """
+    Get metrics about the Dixa API calls made by this server.
+    
+    This tool shows, per Dixa endpoint:
+    - Request, error, stale-response, circuit-breaker, hedging, de-duplication
+      and rate-limit counters
+    - p50/p95 latency of recent requests
+    - The state of the endpoint's circuit breaker (closed, open or half_open)
+    - The learned average item size and the page size currently chosen
+    
+    and, per tool, the number of calls, their duration and the size of their
+    output with an estimate of its cost in LLM tokens, and the size and
+    compression ratio of the response cache, and the tenant ID of the API key
+    in use (needed to subscribe the tenant to webhook events).
+    
+    Args:
+        log: Optional logger for debugging
+    
+    Returns:
+        JSON string of the server metrics
+    """
+    result = {
+        "endpoints": metrics.snapshot(),
+        "circuit_breakers": breaker_states(),
+        "page_sizing": page_sizing.snapshot(),
+        "tools": metrics.tool_snapshot(page_sizing.bytes_per_token()),
+        "cache": response_cache.stats(),
+        "tenant_id": tenant_id(get_api_key()),
+    }
+    return json.dumps(result, indent=2)
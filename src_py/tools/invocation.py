@@ -0,0 +1,51 @@
+"""
+Wrapper applied to every tool when it is registered with the MCP server.
+
+Tools are plain synchronous functions. The wrapper runs each invocation on a
+worker thread inside a CallScope (see tools/deadlines.py) with a deadline of
+DIXA_TOOL_DEADLINE_SECONDS. When the MCP client cancels the call, the
+awaiting task is cancelled and the wrapper cancels the scope, which aborts
+the invocation's outstanding Dixa requests. The duration and output size of
+each completed invocation are recorded in tools/metrics.py, and invocations
+selected for profiling run under a profiler (see tools/profiling.py).
+"""
+import asyncio
+import contextvars
+import functools
+import time
+from typing import Any, Callable
+
+from tools import metrics, profiling
+from tools.deadlines import call_scope
+from tools.settings import env_float
+
+
+def tool_invocation(tool: Callable[..., str]) -> Callable[..., Any]:
+    """
+    Wrap a tool so each invocation gets a deadline and can be cancelled.
+
+    Args:
+        tool: The tool function
+
+    Returns:
+        An async function with the same name, docstring and signature
+    """
+    @functools.wraps(tool)
+    async def invoke(*args: Any, **kwargs: Any) -> str:
+        deadline = env_float("DIXA_TOOL_DEADLINE_SECONDS", 60.0)
+        with call_scope(deadline if deadline > 0 else None) as scope:
+            context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        try:
+            call = functools.partial(tool, *args, **kwargs)
+            result = await loop.run_in_executor(
+                None, functools.partial(context.run, profiling.run_profiled, tool.__name__, call)
+            )
+        except asyncio.CancelledError:
+            scope.cancel()
+            raise
+        metrics.record_tool_call(tool.__name__, len(result.encode("utf-8")), time.monotonic() - started)
+        return result
+
+    return invoke
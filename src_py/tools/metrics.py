@@ -0,0 +1,119 @@
+"""
+In-process metrics for Dixa API calls.
+
+Counters and recent latency samples are kept per endpoint name (see
+tools/endpoints.py), and the number, duration and output size of calls per
+tool; both are exposed through the getServerMetrics tool.
+"""
+import threading
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Optional
+
+# Number of recent latency samples kept per endpoint for percentile estimates
+LATENCY_SAMPLES = 200
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+_latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+_tool_calls: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+
+def increment(name: str, endpoint: str = "global", amount: int = 1) -> None:
+    """Increment a named counter for an endpoint"""
+    with _lock:
+        _counters[endpoint][name] += amount
+
+
+def record_latency(endpoint: str, seconds: float) -> None:
+    """Record the duration of one upstream request"""
+    with _lock:
+        _latencies[endpoint].append(seconds)
+
+
+def record_tool_call(tool: str, output_bytes: int, seconds: float) -> None:
+    """Record one completed tool invocation and the size of its output"""
+    with _lock:
+        stats = _tool_calls[tool]
+        stats["calls"] += 1
+        stats["output_bytes"] += output_bytes
+        stats["max_output_bytes"] = max(stats["max_output_bytes"], output_bytes)
+        stats["seconds"] += seconds
+
+
+def tool_snapshot(bytes_per_token: float) -> Dict[str, Any]:
+    """
+    Get the call count, output size and estimated token cost per tool.
+
+    Args:
+        bytes_per_token: Approximate number of output bytes per LLM token
+
+    Returns:
+        Dict mapping tool names to their call statistics
+    """
+    with _lock:
+        tools = {tool: dict(stats) for tool, stats in _tool_calls.items()}
+    result: Dict[str, Any] = {}
+    for tool in sorted(tools):
+        stats = tools[tool]
+        calls = int(stats["calls"])
+        result[tool] = {
+            "calls": calls,
+            "avg_output_bytes": round(stats["output_bytes"] / calls),
+            "max_output_bytes": int(stats["max_output_bytes"]),
+            "avg_tokens_estimate": round(stats["output_bytes"] / calls / bytes_per_token),
+            "total_tokens_estimate": round(stats["output_bytes"] / bytes_per_token),
+            "avg_ms": round(stats["seconds"] / calls * 1000, 1),
+        }
+    return result
+
+
+def latency_percentile(endpoint: str, percentile: float, min_samples: int = 1) -> Optional[float]:
+    """
+    Get a latency percentile for an endpoint from its recent samples.
+
+    Args:
+        endpoint: Endpoint name
+        percentile: Percentile between 0 and 100 (e.g. 95)
+        min_samples: Minimum number of samples required for an estimate
+
+    Returns:
+        The latency in seconds, or None if there are not enough samples
+    """
+    with _lock:
+        samples = sorted(_latencies.get(endpoint, ()))
+    if not samples or len(samples) < min_samples:
+        return None
+    index = min(len(samples) - 1, int(round(percentile / 100.0 * (len(samples) - 1))))
+    return samples[index]
+
+
+def snapshot() -> Dict[str, Any]:
+    """
+    Get a copy of all counters and latency percentiles.
+
+    Returns:
+        Dict mapping endpoint names to their counters and p50/p95 latencies in milliseconds
+    """
+    with _lock:
+        endpoints = set(_counters) | set(_latencies)
+        counters = {endpoint: dict(_counters.get(endpoint, {})) for endpoint in endpoints}
+    result: Dict[str, Any] = {}
+    for endpoint in sorted(endpoints):
+        entry: Dict[str, Any] = {"counters": counters[endpoint]}
+        p50 = latency_percentile(endpoint, 50)
+        if p50 is not None:
+            entry["latency_ms"] = {
+                "p50": round(p50 * 1000, 1),
+                "p95": round(latency_percentile(endpoint, 95) * 1000, 1),
+                "samples": len(_latencies[endpoint]),
+            }
+        result[endpoint] = entry
+    return result
+
+
+def reset() -> None:
+    """Clear all counters, latency samples and tool call statistics"""
+    with _lock:
+        _counters.clear()
+        _latencies.clear()
+        _tool_calls.clear()
@@ -0,0 +1,130 @@
+"""
+Adaptive page sizes for paginated Dixa endpoints.
+
+The average size of one item is learned per endpoint from the pages tools
+have returned so far (an exponentially weighted moving average of bytes per
+item, measured on the UTF-8 encoded text the tool returns, i.e. the indented
+JSON and any labels added to it, not on Dixa's raw response body). When a
+tool is called without an explicit page limit, the limit is chosen so that
+one page is expected to fit the response budget: DIXA_PAGE_TOKEN_BUDGET
+tokens if set, else DIXA_PAGE_BYTE_BUDGET bytes.
+Heavy items such as conversations then get small pages and tiny items such
+as filter values get large ones.
+"""
+import threading
+from typing import Any, Dict, Optional
+
+from tools.settings import env_float, env_int
+
+# Weight of the newest observation in the moving average
+_SMOOTHING = 0.2
+
+_lock = threading.Lock()
+# endpoint -> (average bytes per item, number of observations)
+_item_sizes: Dict[str, Any] = {}
+
+
+def bytes_per_token() -> float:
+    """Approximate number of bytes of JSON per LLM token (DIXA_BYTES_PER_TOKEN, default 4)"""
+    return max(0.1, env_float("DIXA_BYTES_PER_TOKEN", 4.0))
+
+
+def estimate_tokens(size_bytes: int) -> int:
+    """Estimate the number of LLM tokens in a response of the given size"""
+    return int(round(size_bytes / bytes_per_token()))
+
+
+def byte_budget() -> float:
+    """Target size in bytes of one page"""
+    tokens = env_float("DIXA_PAGE_TOKEN_BUDGET", 0.0)
+    if tokens > 0:
+        return tokens * bytes_per_token()
+    return env_float("DIXA_PAGE_BYTE_BUDGET", 40000.0)
+
+
+def _key(endpoint: str, method: str) -> str:
+    # The same path can list one kind of item on GET and query another on POST
+    return endpoint if method.upper() == "GET" else f"{method.upper()} {endpoint}"
+
+
+def observe_page(endpoint: str, method: str, size_bytes: int, items: int) -> None:
+    """
+    Record the size of a page returned by an endpoint.
+
+    Args:
+        endpoint: Endpoint name
+        method: HTTP method of the request
+        size_bytes: Size in bytes of the page as returned by the tool
+        items: Number of items in the page
+    """
+    if items <= 0:
+        return
+    per_item = size_bytes / items
+    key = _key(endpoint, method)
+    with _lock:
+        average, count = _item_sizes.get(key, (per_item, 0))
+        if count:
+            average = (1 - _SMOOTHING) * average + _SMOOTHING * per_item
+        _item_sizes[key] = (average, count + 1)
+
+
+def observe_output(endpoint: str, method: str, response: Any, output: str) -> None:
+    """
+    Record the size of a page of items as a tool returns it.
+
+    Args:
+        endpoint: Endpoint name
+        method: HTTP method of the request
+        response: Parsed paginated response
+        output: Text returned by the tool for it
+    """
+    items = response.get("data") if isinstance(response, dict) else None
+    if isinstance(items, list):
+        observe_page(endpoint, method, len(output.encode("utf-8")), len(items))
+
+
+def average_item_size(endpoint: str, method: str = "GET") -> Optional[float]:
+    """Get the learned average item size in bytes of an endpoint"""
+    with _lock:
+        entry = _item_sizes.get(_key(endpoint, method))
+    return entry[0] if entry else None
+
+
+def choose_page_limit(endpoint: str, requested: Optional[int] = None, method: str = "GET") -> int:
+    """
+    Choose the page limit of a request.
+
+    Args:
+        endpoint: Endpoint name
+        requested: Page limit given by the caller, used as is when set
+        method: HTTP method of the request
+
+    Returns:
+        The requested limit, or one sized to the page budget, clamped to
+        DIXA_PAGE_LIMIT_MIN..DIXA_PAGE_LIMIT_MAX. Until the endpoint has been
+        observed, DIXA_PAGE_LIMIT_DEFAULT (50) is used.
+    """
+    if requested is not None:
+        return requested
+    average = average_item_size(endpoint, method)
+    if average is None:
+        return env_int("DIXA_PAGE_LIMIT_DEFAULT", 50)
+    limit = int(byte_budget() / max(average, 1.0))
+    return max(env_int("DIXA_PAGE_LIMIT_MIN", 5), min(env_int("DIXA_PAGE_LIMIT_MAX", 500), limit))
+
+
+def snapshot() -> Dict[str, Any]:
+    """Get the learned item sizes and the page limit currently chosen per endpoint"""
+    with _lock:
+        sizes = dict(_item_sizes)
+    budget = byte_budget()
+    minimum = env_int("DIXA_PAGE_LIMIT_MIN", 5)
+    maximum = env_int("DIXA_PAGE_LIMIT_MAX", 500)
+    return {
+        key: {
+            "avg_item_bytes": round(average),
+            "observations": count,
+            "page_limit": max(minimum, min(maximum, int(budget / max(average, 1.0)))),
+        }
+        for key, (average, count) in sorted(sizes.items())
+    }
@@ -0,0 +1,85 @@
+"""
+Helpers for draining paginated Dixa API endpoints.
+
+Paginated responses carry their items in "data" and a link to the next page
+in "meta.next" (a URL whose "pageKey" query parameter selects the page).
+"""
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from tools.utils import request_data
+
+
+def next_page_key(response: Any) -> Optional[str]:
+    """
+    Extract the key of the next page from a paginated response.
+
+    Args:
+        response: Parsed JSON response
+
+    Returns:
+        The next page key, or None on the last page
+    """
+    if not isinstance(response, dict):
+        return None
+    meta = response.get("meta")
+    if not isinstance(meta, dict):
+        return None
+    if meta.get("pageKey"):
+        return str(meta["pageKey"])
+    next_url = meta.get("next")
+    if not next_url:
+        return None
+    values = parse_qs(urlparse(str(next_url)).query).get("pageKey")
+    return values[0] if values else None
+
+
+def page_items(response: Any) -> List[Any]:
+    """Get the list of items of a paginated response"""
+    if isinstance(response, dict):
+        data = response.get("data")
+        if isinstance(data, list):
+            return data
+    if isinstance(response, list):
+        return response
+    return []
+
+
+def iter_pages(
+    method: str,
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    json_data: Optional[Dict[str, Any]] = None,
+    page_limit: Optional[int] = None,
+    max_pages: Optional[int] = None,
+    log=None,
+    session: Optional[Dict[str, Any]] = None,
+) -> Iterator[Any]:
+    """
+    Request consecutive pages of an endpoint until the last page.
+
+    Args:
+        method: HTTP method
+        url: Full URL to request
+        params: Query parameters sent with every page
+        json_data: JSON body sent with every page
+        page_limit: Number of results per page
+        max_pages: Stop after this many pages
+        log: Optional logger for debugging
+        session: Optional session context that may contain auth information
+
+    Returns:
+        Iterator over the parsed response of each page
+    """
+    page_params = dict(params or {})
+    if page_limit is not None:
+        page_params["pageLimit"] = str(page_limit)
+    pages = 0
+    while True:
+        response = request_data(method, url, params=page_params, json_data=json_data, log=log, session=session)
+        yield response
+        pages += 1
+        page_key = next_page_key(response)
+        if not page_key or (max_pages is not None and pages >= max_pages):
+            return
+        page_params["pageKey"] = page_key
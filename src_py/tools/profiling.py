@@ -0,0 +1,282 @@
+"""
+On-demand profiling of individual tool invocations.
+
+Selected invocations run under a profiler and leave one file per call in
+DIXA_PROFILE_DIR:
+- "deterministic": cProfile of the tool's thread, written as a .pstats file
+  (open with `python -m pstats` or snakeviz). Time spent waiting for Dixa
+  shows up under wait_cancellable, next to the JSON decoding and re-encoding
+  done by the tool itself.
+- "sampling": the tool's thread is sampled every DIXA_PROFILE_SAMPLE_INTERVAL_MS
+  and the stacks are written in collapsed-stack format as a .folded file
+  (input for flamegraph.pl or speedscope). Cheaper, so it suits busy tools.
+
+Work the invocation hands to other threads (run_concurrently fan-out and
+hedged requests) runs through profile_worker(), so those threads are
+profiled too and end up in the same file. The transport's event loop thread,
+shared by all invocations, is not; its time shows up as waiting.
+
+Which invocations are profiled is decided per call: tools named in the
+configuration always are, any other call with probability sample_rate. The
+configuration starts from DIXA_PROFILE_TOOLS, DIXA_PROFILE_SAMPLE_RATE and
+DIXA_PROFILE_MODE and can be changed at runtime with the configureProfiling
+admin tool, without restarting the server.
+"""
+import cProfile
+import os
+import pstats
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Set, TypeVar
+
+from tools import metrics
+from tools.settings import env_float, env_int, env_list
+
+T = TypeVar("T")
+
+MODES = ("deterministic", "sampling")
+
+# Metrics are recorded under this pseudo-endpoint
+_METRICS_ENDPOINT = "profiling"
+
+_lock = threading.Lock()
+_config: Optional[Dict[str, Any]] = None
+
+
+class _Session:
+    """Profiling state of one invocation, shared with the threads it hands work to"""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.lock = threading.Lock()
+        # Sampling: idents of the threads currently working for the invocation
+        self.threads: Set[int] = set()
+        # Deterministic: profiles of finished worker calls
+        self.profilers: List[cProfile.Profile] = []
+
+
+_session: ContextVar[Optional[_Session]] = ContextVar("_profiling_session", default=None)
+
+
+def _initial_config() -> Dict[str, Any]:
+    mode = os.getenv("DIXA_PROFILE_MODE", "deterministic").strip().lower()
+    if mode not in MODES:
+        raise ValueError(f"Unsupported DIXA_PROFILE_MODE '{mode}'. Use one of: {', '.join(MODES)}")
+    return {
+        "tools": sorted(set(env_list("DIXA_PROFILE_TOOLS", []))),
+        "sample_rate": min(1.0, max(0.0, env_float("DIXA_PROFILE_SAMPLE_RATE", 0.0))),
+        "mode": mode,
+    }
+
+
+def get_config() -> Dict[str, Any]:
+    """Get the current profiling configuration"""
+    global _config
+    with _lock:
+        if _config is None:
+            _config = _initial_config()
+        return dict(_config)
+
+
+def configure(
+    tools: Optional[List[str]] = None,
+    sample_rate: Optional[float] = None,
+    mode: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Change which tool invocations are profiled; arguments left as None are kept.
+
+    Args:
+        tools: Names of tools to profile on every call (an empty list stops profiling by name)
+        sample_rate: Fraction (0 to 1) of other tool calls to profile
+        mode: 'deterministic' or 'sampling'
+
+    Returns:
+        The new configuration
+    """
+    global _config
+    if mode is not None and mode not in MODES:
+        raise ValueError(f"Unsupported mode '{mode}'. Use one of: {', '.join(MODES)}")
+    if sample_rate is not None and not 0.0 <= sample_rate <= 1.0:
+        raise ValueError("sample_rate must be between 0 and 1")
+    current = get_config()
+    with _lock:
+        if tools is not None:
+            current["tools"] = sorted(set(tools))
+        if sample_rate is not None:
+            current["sample_rate"] = sample_rate
+        if mode is not None:
+            current["mode"] = mode
+        _config = current
+    return dict(current)
+
+
+def profile_dir() -> str:
+    """Directory profiles are written to (DIXA_PROFILE_DIR, default: <tmp>/dixa-profiles)"""
+    path = os.getenv("DIXA_PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "dixa-profiles")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def recent_profiles(limit: int = 20) -> List[Dict[str, Any]]:
+    """List the most recently written profile files, newest first"""
+    directory = profile_dir()
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith((".pstats", ".folded")):
+            path = os.path.join(directory, name)
+            entries.append({"path": path, "size_bytes": os.path.getsize(path), "mtime": os.path.getmtime(path)})
+    entries.sort(key=lambda entry: entry["mtime"], reverse=True)
+    return entries[:limit]
+
+
+def _prune() -> None:
+    # Keep at most DIXA_PROFILE_MAX_FILES profiles, dropping the oldest
+    keep = env_int("DIXA_PROFILE_MAX_FILES", 200)
+    for entry in recent_profiles(limit=sys.maxsize)[keep:]:
+        try:
+            os.remove(entry["path"])
+        except OSError:
+            pass
+
+
+def _profile_path(tool: str, suffix: str) -> str:
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{tool}-{uuid.uuid4().hex[:8]}{suffix}"
+    return os.path.join(profile_dir(), name)
+
+
+def should_profile(tool: str) -> Optional[str]:
+    """
+    Decide whether one invocation of a tool is profiled.
+
+    Returns:
+        The profiling mode to use, or None if the call is not profiled
+    """
+    config = get_config()
+    if tool in config["tools"] or (config["sample_rate"] and random.random() < config["sample_rate"]):
+        return config["mode"]
+    return None
+
+
+def _collapse(frame: Any) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def profile_worker(call: Callable[[], T]) -> T:
+    """
+    Run work handed off by a tool invocation, profiling it along with the invocation.
+
+    Fan-out helpers run this on their worker threads with a copy of the
+    invocation's context; outside a profiled invocation it just runs the call.
+    """
+    session = _session.get()
+    if session is None:
+        return call()
+    if session.mode == "sampling":
+        ident = threading.get_ident()
+        with session.lock:
+            session.threads.add(ident)
+        try:
+            return call()
+        finally:
+            with session.lock:
+                session.threads.discard(ident)
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ allows one profiler, which already covers every thread
+        return call()
+    try:
+        return call()
+    finally:
+        profiler.disable()
+        with session.lock:
+            session.profilers.append(profiler)
+
+
+def _run_sampled(tool: str, call: Callable[[], T]) -> T:
+    session = _Session("sampling")
+    session.threads.add(threading.get_ident())
+    interval = max(0.001, env_float("DIXA_PROFILE_SAMPLE_INTERVAL_MS", 5.0) / 1000.0)
+    stacks: Counter = Counter()
+    done = threading.Event()
+
+    def sample() -> None:
+        while not done.wait(interval):
+            with session.lock:
+                targets = list(session.threads)
+            frames = sys._current_frames()
+            for target in targets:
+                frame = frames.get(target)
+                if frame is not None:
+                    stacks[_collapse(frame)] += 1
+
+    sampler = threading.Thread(target=sample, name=f"dixa-profile-{tool}", daemon=True)
+    sampler.start()
+    token = _session.set(session)
+    try:
+        return call()
+    finally:
+        _session.reset(token)
+        done.set()
+        sampler.join()
+        path = _profile_path(tool, ".folded")
+        with open(path, "w", encoding="utf-8") as folded:
+            for stack, count in stacks.most_common():
+                folded.write(f"{stack} {count}\n")
+        _prune()
+
+
+def _run_deterministic(tool: str, call: Callable[[], T]) -> T:
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is active in this process (Python 3.12+ allows only one)
+        metrics.increment("skipped", _METRICS_ENDPOINT)
+        return call()
+    session = _Session("deterministic")
+    token = _session.set(session)
+    try:
+        return call()
+    finally:
+        _session.reset(token)
+        profiler.disable()
+        stats = pstats.Stats(profiler)
+        with session.lock:
+            for worker in session.profilers:
+                stats.add(worker)
+        stats.dump_stats(_profile_path(tool, ".pstats"))
+        _prune()
+
+
+def run_profiled(tool: str, call: Callable[[], T]) -> T:
+    """
+    Run one tool invocation, under a profiler if the configuration selects it.
+
+    Args:
+        tool: Name of the tool
+        call: The invocation, run on the current thread
+
+    Returns:
+        The result of the call
+    """
+    mode = should_profile(tool)
+    if mode is None:
+        return call()
+    metrics.increment("profiled_calls", _METRICS_ENDPOINT)
+    if mode == "sampling":
+        return _run_sampled(tool, call)
+    return _run_deterministic(tool, call)
@@ -0,0 +1,48 @@
+"""
+Client-side rate limiting of Dixa API calls.
+
+Each tenant has a token bucket refilled at DIXA_RATE_LIMIT_PER_SECOND tokens
+per second, holding at most DIXA_RATE_LIMIT_BURST tokens. Buckets live in the
+shared state backend (see tools/state.py), so all workers together stay
+within one tenant's limit instead of each spending its own share.
+Rate limiting is off unless DIXA_RATE_LIMIT_PER_SECOND is set.
+"""
+from tools import metrics
+from tools.deadlines import sleep
+from tools.settings import env_float
+from tools.state import get_state_backend
+
+
+class RateLimitExceeded(Exception):
+    """Raised when no rate-limit token becomes available within the maximum wait"""
+
+
+def acquire_token(tenant: str, endpoint: str = "other") -> None:
+    """
+    Wait until the tenant's token bucket allows another request.
+
+    Args:
+        tenant: Tenant identifier (see tools.cache.tenant_id)
+        endpoint: Endpoint name, used for metrics
+    """
+    rate = env_float("DIXA_RATE_LIMIT_PER_SECOND", 0.0)
+    if rate <= 0:
+        return
+    capacity = max(1.0, env_float("DIXA_RATE_LIMIT_BURST", rate))
+    max_wait = env_float("DIXA_RATE_LIMIT_MAX_WAIT_SECONDS", 10.0)
+    backend = get_state_backend()
+    waited = 0.0
+    while True:
+        wait = backend.take_token(f"ratelimit:{tenant}", rate, capacity)
+        if wait <= 0:
+            if waited:
+                metrics.increment("rate_limited", endpoint)
+            return
+        if waited + wait > max_wait:
+            metrics.increment("rate_limit_rejected", endpoint)
+            raise RateLimitExceeded(
+                f"Client-side rate limit of {rate:g} requests/second reached for this API key. "
+                f"Please retry in a few seconds."
+            )
+        sleep(wait)
+        waited += wait
@@ -0,0 +1,218 @@
+"""
+Tail-latency controls for Dixa API calls: per-endpoint circuit breakers and
+hedged requests.
+
+A circuit breaker opens after a run of upstream failures (5xx, 429, timeouts,
+connection errors) and rejects requests to that endpoint immediately until a
+cool-down has passed; one probe request is then let through to decide whether
+to close it again.
+
+A hedged request sends a second identical request when the first has not
+answered within a delay derived from the endpoint's recent p95 latency, and
+returns whichever response arrives first; the other request is then aborted.
+Only idempotent GETs are hedged.
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Callable, Dict, Optional, TypeVar
+
+from tools import metrics
+from tools.deadlines import child_context
+from tools.profiling import profile_worker
+from tools.settings import env_bool, env_float, env_int, env_list
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a request is rejected because its endpoint's circuit is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for a single endpoint"""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state, reporting HALF_OPEN once the cool-down has passed"""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Check whether a request may be sent, reserving the probe slot when half-open"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            if self._probe_in_flight:
+                return False
+            self._state = HALF_OPEN
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        """Record a successful request, closing the circuit"""
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Give up the half-open probe slot without recording an outcome"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Record an upstream failure, opening the circuit once the threshold is reached"""
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    metrics.increment("circuit_opened", self.name)
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker_enabled() -> bool:
+    """Whether circuit breakers are enabled (DIXA_CIRCUIT_BREAKER_ENABLED, default true)"""
+    return env_bool("DIXA_CIRCUIT_BREAKER_ENABLED", True)
+
+
+def get_breaker(endpoint: str) -> CircuitBreaker:
+    """Get the circuit breaker for an endpoint, creating it on first use"""
+    with _breakers_lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                endpoint,
+                failure_threshold=env_int("DIXA_CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5),
+                reset_timeout=env_float("DIXA_CIRCUIT_BREAKER_RESET_SECONDS", 30.0),
+            )
+            _breakers[endpoint] = breaker
+        return breaker
+
+
+def breaker_states() -> Dict[str, str]:
+    """Get the state of every circuit breaker created so far"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.state for breaker in breakers}
+
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _hedge_executor_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(
+                    max_workers=env_int("DIXA_HEDGE_MAX_WORKERS", 16),
+                    thread_name_prefix="dixa-hedge",
+                )
+    return _hedge_executor
+
+
+def should_hedge(method: str, endpoint: Optional[str]) -> bool:
+    """
+    Check whether requests to an endpoint are hedged.
+
+    Hedging is off unless DIXA_HEDGE_ENABLED is set, and only applies to GET
+    requests on the endpoints listed in DIXA_HEDGE_ENDPOINTS
+    (default: conversation, end_user).
+    """
+    if method.upper() != "GET" or endpoint is None:
+        return False
+    if not env_bool("DIXA_HEDGE_ENABLED", False):
+        return False
+    return endpoint in env_list("DIXA_HEDGE_ENDPOINTS", ["conversation", "end_user"])
+
+
+def hedge_delay(endpoint: str) -> float:
+    """
+    Get the delay in seconds before a hedge request is sent.
+
+    Uses the endpoint's recent DIXA_HEDGE_PERCENTILE (default 95) latency once
+    at least DIXA_HEDGE_MIN_SAMPLES samples exist, and DIXA_HEDGE_DELAY_MS
+    before that. Never less than DIXA_HEDGE_MIN_DELAY_MS.
+    """
+    observed = metrics.latency_percentile(
+        endpoint,
+        env_float("DIXA_HEDGE_PERCENTILE", 95.0),
+        min_samples=env_int("DIXA_HEDGE_MIN_SAMPLES", 20),
+    )
+    delay = observed if observed is not None else env_float("DIXA_HEDGE_DELAY_MS", 300.0) / 1000.0
+    return max(delay, env_float("DIXA_HEDGE_MIN_DELAY_MS", 50.0) / 1000.0)
+
+
+def hedged_call(endpoint: str, call: Callable[[], T]) -> T:
+    """
+    Run a call, sending a second identical call if the first is slow.
+
+    Args:
+        endpoint: Endpoint name, used for the delay and for metrics
+        call: Zero-argument function performing one request
+
+    Returns:
+        The result of whichever call succeeds first. If both fail, the
+        primary call's exception is raised.
+    """
+    executor = _get_hedge_executor()
+    # Each call keeps the caller's context, e.g. its deadline, in a scope of its own
+    # so the slower one can be aborted once the other has answered
+    primary_context, primary_scope = child_context()
+    primary = executor.submit(primary_context.run, profile_worker, call)
+    try:
+        return primary.result(timeout=hedge_delay(endpoint))
+    except FuturesTimeoutError:
+        pass
+    finally:
+        if primary.done():
+            primary_scope.close()
+
+    metrics.increment("hedges_sent", endpoint)
+    hedge_context, hedge_scope = child_context()
+    hedge = executor.submit(hedge_context.run, profile_worker, call)
+    scopes = {primary: primary_scope, hedge: hedge_scope}
+    try:
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        metrics.increment("hedge_wins", endpoint)
+                    for loser in pending:
+                        scopes[loser].cancel()
+                        metrics.increment("hedges_cancelled", endpoint)
+                    return future.result()
+        return primary.result()
+    finally:
+        for scope in scopes.values():
+            scope.close()
@@ -0,0 +1,46 @@
+"""
+Helpers for reading optional server configuration from environment variables.
+
+Values are read on every call so settings can be changed on a running server
+(e.g. through the FastMCP Cloud dashboard) without touching the code.
+"""
+import os
+from typing import List
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """Read a boolean environment variable ("1", "true", "yes", "on" are truthy)"""
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: int) -> int:
+    """Read an integer environment variable"""
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got '{value}'")
+
+
+def env_float(name: str, default: float) -> float:
+    """Read a float environment variable"""
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, got '{value}'")
+
+
+def env_list(name: str, default: List[str]) -> List[str]:
+    """Read a comma-separated list environment variable"""
+    value = os.getenv(name)
+    if value is None:
+        return list(default)
+    return [item.strip() for item in value.split(",") if item.strip()]
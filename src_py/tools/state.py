@@ -0,0 +1,568 @@
+"""
+Shared state backends for cache entries, in-flight request leases and
+rate-limit token buckets.
+
+When several server processes run behind a load balancer, state that lives
+in one process is duplicated in every worker: each keeps its own cache and
+spends its own share of the Dixa rate limit. A shared backend lets all
+workers use one cache, one set of in-flight leases and one token bucket per
+tenant.
+
+The backend is selected with DIXA_STATE_BACKEND:
+- "memory" (default): state lives in this process only. It is also the
+  local stand-in for a networked store during development.
+- "sqlite" or "sqlite:///path/to/state.db": a local SQLite file shared by
+  all processes on one node. Without a path the file is created in a
+  directory private to the current user under /dev/shm (shared memory)
+  when available. The file is only readable by its owner, as it holds
+  cached conversations and end-user data.
+- "redis://host:port/db" or "rediss://...": a Redis server shared by
+  processes on several nodes (requires the optional 'redis' package).
+
+Other stores can be plugged in with register_backend().
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tools.settings import env_int
+
+# (value, stored_at) of a cache entry
+StoredValue = Tuple[bytes, float]
+
+
+class StateBackend:
+    """Interface of a state backend"""
+
+    # Whether state is visible to other processes
+    shared = False
+
+    def cache_get(self, key: str) -> Optional[StoredValue]:
+        """Get a cache entry's value and the time it was stored"""
+        raise NotImplementedError
+
+    def cache_set(self, key: str, value: bytes, stored_at: float) -> None:
+        """Store a cache entry"""
+        raise NotImplementedError
+
+    def cache_delete_prefix(self, prefix: str) -> int:
+        """Delete all cache entries whose key starts with prefix, returning how many were deleted"""
+        raise NotImplementedError
+
+    def cache_keys(self, prefix: str) -> List[str]:
+        """Get the keys of all cache entries starting with prefix"""
+        raise NotImplementedError
+
+    def cache_size(self) -> int:
+        """Get the number of cache entries"""
+        raise NotImplementedError
+
+    def cache_bytes(self) -> Optional[int]:
+        """Get the total size of the stored cache values, or None if the backend cannot tell"""
+        return None
+
+    def blob_get(self, name: str) -> Optional[bytes]:
+        """Get a named value kept outside the cache (e.g. a compression dictionary), unless it expired"""
+        raise NotImplementedError
+
+    def blob_set(self, name: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Store a named value that is not subject to cache eviction, expiring after ttl seconds if given"""
+        raise NotImplementedError
+
+    def acquire_lease(self, key: str, ttl: float) -> bool:
+        """Take an exclusive lease on key for ttl seconds; False if someone else holds it"""
+        raise NotImplementedError
+
+    def release_lease(self, key: str) -> None:
+        """Release a lease taken with acquire_lease()"""
+        raise NotImplementedError
+
+    def has_lease(self, key: str) -> bool:
+        """Check whether an unexpired lease exists for key"""
+        raise NotImplementedError
+
+    def take_token(self, bucket: str, rate: float, capacity: float) -> float:
+        """
+        Take one token from a token bucket refilled at rate tokens per second.
+
+        Returns:
+            0 if a token was taken, otherwise the seconds until one is available
+        """
+        raise NotImplementedError
+
+
+def _refill(tokens: float, updated_at: float, now: float, rate: float, capacity: float) -> float:
+    return min(capacity, tokens + (now - updated_at) * rate)
+
+
+class MemoryBackend(StateBackend):
+    """
+    State kept in this process, with a cache bounded by its compressed size in bytes
+    (and optionally by entries) in LRU order
+    """
+
+    def __init__(self, max_entries: int = 0, max_bytes: int = 0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._bytes = 0
+        self._cache: "OrderedDict[str, StoredValue]" = OrderedDict()
+        # name -> (value, expiry time or None)
+        self._blobs: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._leases: Dict[str, float] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def cache_get(self, key: str) -> Optional[StoredValue]:
+        with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self._cache.move_to_end(key)
+            return value
+
+    def cache_set(self, key: str, value: bytes, stored_at: float) -> None:
+        with self._lock:
+            previous = self._cache.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[0])
+            self._cache[key] = (value, stored_at)
+            self._bytes += len(value)
+            while (self.max_entries and len(self._cache) > self.max_entries) or (
+                self.max_bytes and self._bytes > self.max_bytes and len(self._cache) > 1
+            ):
+                _, (evicted, _) = self._cache.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def cache_delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            keys = [key for key in self._cache if key.startswith(prefix)]
+            for key in keys:
+                self._bytes -= len(self._cache.pop(key)[0])
+            return len(keys)
+
+    def cache_keys(self, prefix: str) -> List[str]:
+        with self._lock:
+            return [key for key in self._cache if key.startswith(prefix)]
+
+    def cache_size(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
+    def cache_bytes(self) -> Optional[int]:
+        with self._lock:
+            return self._bytes
+
+    def blob_get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            blob = self._blobs.get(name)
+            if blob is None:
+                return None
+            if blob[1] is not None and blob[1] <= time.time():
+                del self._blobs[name]
+                return None
+            return blob[0]
+
+    def blob_set(self, name: str, value: bytes, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        with self._lock:
+            # Drop expired blobs so they do not pile up in memory
+            for expired in [key for key, (_, expires_at) in self._blobs.items() if expires_at is not None and expires_at <= now]:
+                del self._blobs[expired]
+            self._blobs[name] = (value, now + ttl if ttl else None)
+
+    def acquire_lease(self, key: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            if self._leases.get(key, 0) > now:
+                return False
+            self._leases[key] = now + ttl
+            return True
+
+    def release_lease(self, key: str) -> None:
+        with self._lock:
+            self._leases.pop(key, None)
+
+    def has_lease(self, key: str) -> bool:
+        with self._lock:
+            return self._leases.get(key, 0) > time.time()
+
+    def take_token(self, bucket: str, rate: float, capacity: float) -> float:
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(bucket, (capacity, now))
+            tokens = _refill(tokens, updated_at, now, rate, capacity)
+            if tokens >= 1:
+                self._buckets[bucket] = (tokens - 1, now)
+                return 0.0
+            self._buckets[bucket] = (tokens, now)
+            return (1 - tokens) / rate
+
+
+def private_directory(base: str, alternative: str) -> str:
+    """
+    Get this user's private directory under a shared base directory, creating it.
+
+    /dev/shm and the temp directory are world-writable, so the directory is
+    only accessible to its owner, and one planted by someone else is refused.
+
+    Args:
+        base: Shared directory to create it in, e.g. the temp directory
+        alternative: Setting to suggest if the directory cannot be used
+
+    Raises:
+        PermissionError: If the directory exists but is not private to this user
+    """
+    directory = os.path.join(base, f"dixa-mcp-{os.getuid()}")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(directory)
+    if not os.path.isdir(directory) or os.path.islink(directory) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(
+            f"{directory} is not a private directory of the current user; "
+            f"remove it or set {alternative}"
+        )
+    return directory
+
+
+def _default_sqlite_path() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    directory = private_directory(base, "DIXA_STATE_BACKEND=sqlite:///path/to/state.db")
+    return os.path.join(directory, "dixa-mcp-state.db")
+
+
+def create_private_file(path: str) -> None:
+    """Create a file readable and writable by its owner only, if it does not exist yet"""
+    os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+
+
+class SQLiteBackend(StateBackend):
+    """State in a SQLite file shared by all processes on one node"""
+
+    shared = True
+
+    # Prune the cache every this many writes, or once this share of max_bytes was written
+    _PRUNE_INTERVAL = 100
+    _PRUNE_BYTES_SHARE = 0.05
+
+    def __init__(self, path: str, max_entries: int = 0, max_bytes: int = 0):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self._written_bytes = 0
+        # SQLite gives its journal files the same permissions as the database
+        create_private_file(path)
+        with self._connection() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, stored_at REAL, size INTEGER);
+                CREATE INDEX IF NOT EXISTS cache_stored_at ON cache (stored_at);
+                CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, expires_at REAL);
+                CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated_at REAL);
+                CREATE TABLE IF NOT EXISTS blobs (name TEXT PRIMARY KEY, value BLOB, expires_at REAL);
+                """
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(cache)")]
+            if "size" not in columns:
+                conn.execute("ALTER TABLE cache ADD COLUMN size INTEGER")
+                conn.execute("UPDATE cache SET size = LENGTH(value)")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(blobs)")]
+            if "expires_at" not in columns:
+                # Blobs written before they could expire were cache dictionaries
+                # trained on response bodies; drop them rather than keep them forever
+                conn.execute("DELETE FROM blobs")
+                conn.execute("ALTER TABLE blobs ADD COLUMN expires_at REAL")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def cache_get(self, key: str) -> Optional[StoredValue]:
+        row = self._connection().execute(
+            "SELECT value, stored_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        return (bytes(row[0]), row[1]) if row else None
+
+    def cache_set(self, key: str, value: bytes, stored_at: float) -> None:
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, stored_at, size) VALUES (?, ?, ?, ?)",
+            (key, sqlite3.Binary(value), stored_at, len(value)),
+        )
+        self._writes += 1
+        self._written_bytes += len(value)
+        if self._writes % self._PRUNE_INTERVAL == 0 or (
+            self.max_bytes and self._written_bytes >= self.max_bytes * self._PRUNE_BYTES_SHARE
+        ):
+            self._prune(conn)
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """Delete the oldest entries beyond the entry and byte limits"""
+        self._written_bytes = 0
+        if self.max_entries:
+            conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        if self.max_bytes:
+            # Keep the newest entries whose sizes add up to at most max_bytes
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM ("
+                "SELECT key, SUM(size) OVER (ORDER BY stored_at DESC, key) AS total FROM cache"
+                ") WHERE total > ?)",
+                (self.max_bytes,),
+            )
+
+    def cache_delete_prefix(self, prefix: str) -> int:
+        cursor = self._connection().execute(
+            "DELETE FROM cache WHERE key >= ? AND key < ?", (prefix, prefix + "\U0010ffff")
+        )
+        return cursor.rowcount
+
+    def cache_keys(self, prefix: str) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT key FROM cache WHERE key >= ? AND key < ?", (prefix, prefix + "\U0010ffff")
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def cache_size(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def cache_bytes(self) -> Optional[int]:
+        return self._connection().execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    def blob_get(self, name: str) -> Optional[bytes]:
+        row = self._connection().execute(
+            "SELECT value FROM blobs WHERE name = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (name, time.time()),
+        ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def blob_set(self, name: str, value: bytes, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        conn = self._connection()
+        conn.execute("DELETE FROM blobs WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "INSERT OR REPLACE INTO blobs (name, value, expires_at) VALUES (?, ?, ?)",
+            (name, sqlite3.Binary(value), now + ttl if ttl else None),
+        )
+
+    def acquire_lease(self, key: str, ttl: float) -> bool:
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM leases WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO leases (key, expires_at) VALUES (?, ?)", (key, now + ttl)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def release_lease(self, key: str) -> None:
+        self._connection().execute("DELETE FROM leases WHERE key = ?", (key,))
+
+    def has_lease(self, key: str) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM leases WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def take_token(self, bucket: str, rate: float, capacity: float) -> float:
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM buckets WHERE name = ?", (bucket,)
+            ).fetchone()
+            tokens = _refill(row[0], row[1], now, rate, capacity) if row else capacity
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if tokens >= 1:
+                tokens -= 1
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (bucket, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+# Atomically refill and take one token; returns the wait in milliseconds (0 if taken)
+_REDIS_TAKE_TOKEN = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = math.ceil((1 - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return wait
+"""
+
+
+def _escape_glob(value: str) -> str:
+    return "".join("\\" + char if char in "*?[]\\" else char for char in value)
+
+
+class RedisBackend(StateBackend):
+    """State in a Redis server shared by processes on several nodes"""
+
+    shared = True
+
+    def __init__(self, url: str, namespace: str = "dixa-mcp"):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError(
+                "DIXA_STATE_BACKEND points to Redis but the 'redis' package is not installed. "
+                "Install it with: pip install redis"
+            )
+        self._redis = redis.Redis.from_url(url)
+        self._namespace = namespace
+        self._take_token = self._redis.register_script(_REDIS_TAKE_TOKEN)
+        self._ttl = env_int("DIXA_STATE_REDIS_CACHE_TTL_SECONDS", 86400)
+
+    def _key(self, kind: str, key: str) -> str:
+        return f"{self._namespace}:{kind}:{key}"
+
+    def cache_get(self, key: str) -> Optional[StoredValue]:
+        value, stored_at = self._redis.hmget(self._key("cache", key), "value", "stored_at")
+        if value is None or stored_at is None:
+            return None
+        return bytes(value), float(stored_at)
+
+    def cache_set(self, key: str, value: bytes, stored_at: float) -> None:
+        redis_key = self._key("cache", key)
+        pipeline = self._redis.pipeline()
+        pipeline.hset(redis_key, mapping={"value": value, "stored_at": repr(stored_at)})
+        pipeline.expire(redis_key, self._ttl)
+        pipeline.execute()
+
+    def cache_delete_prefix(self, prefix: str) -> int:
+        deleted = 0
+        pattern = _escape_glob(self._key("cache", prefix)) + "*"
+        for redis_key in self._redis.scan_iter(match=pattern, count=500):
+            deleted += self._redis.delete(redis_key)
+        return deleted
+
+    def cache_keys(self, prefix: str) -> List[str]:
+        pattern = _escape_glob(self._key("cache", prefix)) + "*"
+        skip = len(self._key("cache", ""))
+        return [
+            (redis_key.decode("utf-8") if isinstance(redis_key, bytes) else redis_key)[skip:]
+            for redis_key in self._redis.scan_iter(match=pattern, count=500)
+        ]
+
+    def cache_size(self) -> int:
+        pattern = _escape_glob(self._key("cache", "")) + "*"
+        return sum(1 for _ in self._redis.scan_iter(match=pattern, count=500))
+
+    def blob_get(self, name: str) -> Optional[bytes]:
+        value = self._redis.get(self._key("blob", name))
+        return bytes(value) if value is not None else None
+
+    def blob_set(self, name: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._redis.set(self._key("blob", name), value, px=max(1, int(ttl * 1000)) if ttl else None)
+
+    def acquire_lease(self, key: str, ttl: float) -> bool:
+        return bool(self._redis.set(self._key("lease", key), b"1", nx=True, px=max(1, int(ttl * 1000))))
+
+    def release_lease(self, key: str) -> None:
+        self._redis.delete(self._key("lease", key))
+
+    def has_lease(self, key: str) -> bool:
+        return bool(self._redis.exists(self._key("lease", key)))
+
+    def take_token(self, bucket: str, rate: float, capacity: float) -> float:
+        wait_ms = self._take_token(keys=[self._key("bucket", bucket)], args=[rate, capacity, time.time()])
+        return int(wait_ms) / 1000.0
+
+
+def _cache_limits() -> Dict[str, int]:
+    # The compressed size is what the cache costs, so it is the limit that normally
+    # binds; an entry limit is only applied when DIXA_CACHE_MAX_ENTRIES is set
+    return {
+        "max_entries": env_int("DIXA_CACHE_MAX_ENTRIES", 0),
+        "max_bytes": env_int("DIXA_CACHE_MAX_BYTES", 256 * 1024 * 1024),
+    }
+
+
+def _memory_factory(url: str) -> StateBackend:
+    return MemoryBackend(**_cache_limits())
+
+
+def _sqlite_factory(url: str) -> StateBackend:
+    path = url[len("sqlite://"):] if url.startswith("sqlite://") else ""
+    # sqlite:///abs/path keeps the leading slash of the absolute path
+    return SQLiteBackend(path or _default_sqlite_path(), **_cache_limits())
+
+
+def _redis_factory(url: str) -> StateBackend:
+    return RedisBackend(url)
+
+
+_factories: Dict[str, Callable[[str], StateBackend]] = {
+    "memory": _memory_factory,
+    "sqlite": _sqlite_factory,
+    "redis": _redis_factory,
+    "rediss": _redis_factory,
+}
+
+_backend: Optional[StateBackend] = None
+_backend_lock = threading.Lock()
+
+
+def register_backend(scheme: str, factory: Callable[[str], StateBackend]) -> None:
+    """
+    Register a state backend for a DIXA_STATE_BACKEND URL scheme.
+
+    Args:
+        scheme: URL scheme, e.g. "memcached" for "memcached://host:11211"
+        factory: Function creating the backend from the full DIXA_STATE_BACKEND value
+    """
+    _factories[scheme] = factory
+
+
+def get_state_backend() -> StateBackend:
+    """Get the process-wide state backend selected by DIXA_STATE_BACKEND"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                url = os.getenv("DIXA_STATE_BACKEND", "memory").strip() or "memory"
+                scheme = url.split("://", 1)[0].lower()
+                factory = _factories.get(scheme)
+                if factory is None:
+                    raise ValueError(
+                        f"Unsupported DIXA_STATE_BACKEND '{url}'. "
+                        f"Use one of: {', '.join(sorted(_factories))}"
+                    )
+                _backend = factory(url)
+    return _backend
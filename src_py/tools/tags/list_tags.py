@@ -1,4 +1,5 @@
 """List all available tags in Dixa"""
+from tools.endpoints import endpoint_url
 from tools.utils import make_request
 
 
@@ -17,7 +18,7 @@ def list_tags(include_deactivated: bool = False, log=None) -> str:
         "includeDeactivated": str(include_deactivated),
     }
     
-    url = "https://dev.dixa.io/v1/tags"
+    url = endpoint_url("tags")
     data = make_request("GET", url, params=params, log=log)
     return data
 
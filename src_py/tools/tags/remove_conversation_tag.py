@@ -1,5 +1,7 @@
 """Remove a tag from a specific conversation in Dixa"""
+from tools.endpoints import endpoint_url
 from tools.utils import make_request
+from tools.webhooks import invalidate
 
 
 def remove_conversation_tag(conversation_id: str, tag_id: str, log=None) -> str:
@@ -14,7 +16,9 @@ def remove_conversation_tag(conversation_id: str, tag_id: str, log=None) -> str:
     Returns:
         JSON string indicating success or error
     """
-    url = f"https://dev.dixa.io/v1/conversations/{conversation_id}/tags/{tag_id}"
+    url = endpoint_url("conversation_tag", conversation_id=conversation_id, tag_id=tag_id)
     data = make_request("DELETE", url, log=log)
+    # The conversation's cached tag list is now out of date
+    invalidate("conversation_tags", conversation_id=conversation_id)
     return data
 
@@ -0,0 +1,115 @@
+"""
+HTTP transport shared by all Dixa API calls.
+
+A single async httpx client is kept per process, running on one background
+event loop. Requests are submitted to the loop as tasks, so a caller can stop
+waiting at any time and cancelling the task aborts the request wherever it
+is (connecting, waiting for the response headers or reading the body)
+without tying up a thread. With HTTP/2 enabled, concurrent requests to the
+Dixa API are multiplexed as streams over one connection instead of opening a
+TCP connection per request.
+
+The protocol is selected with the DIXA_HTTP_PROTOCOL environment variable:
+- "http2" (default): negotiate HTTP/2 via ALPN, falling back to HTTP/1.1 if
+  the server does not support it or the 'h2' package is not installed
+- "http1.1": always use HTTP/1.1
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional, TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+HTTP2 = "http2"
+HTTP1 = "http1.1"
+
+_client: Optional[httpx.AsyncClient] = None
+_client_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _h2_available() -> bool:
+    """Check whether the optional 'h2' package needed for HTTP/2 is installed"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_protocol() -> str:
+    """
+    Get the HTTP protocol the transport will use.
+
+    Returns:
+        HTTP2 or HTTP1, after applying the HTTP/1.1 fallback
+    """
+    requested = os.getenv("DIXA_HTTP_PROTOCOL", HTTP2).strip().lower()
+    if requested in ("http1", "http1.1", "http/1.1", "1.1"):
+        return HTTP1
+    if requested not in ("http2", "http/2", "2", "h2"):
+        raise ValueError(
+            f"Unsupported DIXA_HTTP_PROTOCOL '{requested}'. Use 'http2' or 'http1.1'."
+        )
+    return HTTP2 if _h2_available() else HTTP1
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="dixa-io", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def submit(coroutine: Coroutine[Any, Any, T]) -> "Future[T]":
+    """
+    Run a coroutine on the transport's event loop.
+
+    Returns:
+        A future of its result; cancelling the future cancels the coroutine
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, _get_loop())
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Get the process-wide HTTP client, creating it on first use.
+
+    Returns:
+        An httpx.AsyncClient configured for the selected protocol, to be used
+        from coroutines passed to submit()
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                http2 = get_protocol() == HTTP2
+                _client = httpx.AsyncClient(
+                    http1=True,
+                    http2=http2,
+                    # Follow redirects like the 'requests' library the server used before
+                    follow_redirects=True,
+                    limits=httpx.Limits(
+                        max_connections=int(os.getenv("DIXA_HTTP_MAX_CONNECTIONS", "20")),
+                        max_keepalive_connections=int(os.getenv("DIXA_HTTP_MAX_KEEPALIVE", "10")),
+                    ),
+                )
+    return _client
+
+
+def close_client() -> None:
+    """Close the shared HTTP client so the next request creates a fresh one"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            submit(_client.aclose()).result()
+            _client = None
@@ -1,4 +1,5 @@
 """Get information about a specific end user from Dixa"""
+from tools.endpoints import endpoint_url
 from tools.utils import make_request
 
 
@@ -13,7 +14,7 @@ def get_end_user(user_id: str, log=None) -> str:
     Returns:
         JSON string of the user data
     """
-    url = f"https://dev.dixa.io/v1/endusers/{user_id}"
+    url = endpoint_url("end_user", user_id=user_id)
     data = make_request("GET", url, log=log)
     return data
 
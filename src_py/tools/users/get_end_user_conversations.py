@@ -1,12 +1,17 @@
 """Get all conversations for a specific end user from Dixa"""
+import json
 from typing import Optional
-from tools.utils import make_request
+from tools.endpoints import endpoint_url
+from tools.enrichment import enrich_conversations
+from tools.page_sizing import choose_page_limit, observe_output
+from tools.utils import make_request, request_data
 
 
 def get_end_user_conversations(
     user_id: str,
     page_key: Optional[str] = None,
-    page_limit: int = 50,
+    page_limit: Optional[int] = None,
+    enrich: bool = False,
     log=None,
 ) -> str:
     """
@@ -15,7 +20,10 @@ def get_end_user_conversations(
     Args:
         user_id: The ID of the end user to fetch conversations for
         page_key: Pagination key for next page of results
-        page_limit: Number of results per page (default: 50)
+        page_limit: Number of results per page (default: chosen automatically from the typical size of results)
+        enrich: Whether to add the names of the requester, assignee and tags to each
+            conversation (as '_labels'), saving separate getEndUser, getAgent and
+            getConversationTags calls (default: False)
         log: Optional logger for debugging
     
     Returns:
@@ -25,10 +33,14 @@ def get_end_user_conversations(
     
     if page_key:
         params["pageKey"] = page_key
-    if page_limit is not None:
-        params["pageLimit"] = str(page_limit)
+    params["pageLimit"] = str(choose_page_limit("end_user_conversations", page_limit))
     
-    url = f"https://dev.dixa.io/v1/endusers/{user_id}/conversations"
+    url = endpoint_url("end_user_conversations", user_id=user_id)
+    if enrich:
+        response = enrich_conversations(request_data("GET", url, params=params, log=log), log=log)
+        output = json.dumps(response, indent=2)
+        observe_output("end_user_conversations", "GET", response, output)
+        return output
     data = make_request("GET", url, params=params, log=log)
     return data
 
@@ -3,15 +3,52 @@ Utility functions for Dixa API calls
 """
 import os
 import json
-import requests
+import time
+import httpx
 from typing import Dict, Any, Optional
 from contextvars import ContextVar
 
+from tools import metrics
+from tools.cache import cache_key, response_cache, tenant_id
+from tools.deadlines import (
+    DeadlineExceeded,
+    cap_timeout,
+    check_deadline,
+    wait_cancellable,
+)
+from tools.endpoints import match_endpoint
+from tools.inflight import deduplicate
+from tools.page_sizing import observe_output
+from tools.ratelimit import acquire_token
+from tools.resilience import (
+    CircuitOpenError,
+    circuit_breaker_enabled,
+    get_breaker,
+    hedged_call,
+    should_hedge,
+)
+from tools.settings import env_float
+from tools.transport import get_client, submit
+from tools.webhooks import PUSH_FRESH_ENDPOINTS, push_invalidation_enabled
+
 # Context variable to store the current session/auth
 # This allows tools to access the session even if not passed as parameter
 _current_session: ContextVar[Optional[Dict[str, Any]]] = ContextVar('_current_session', default=None)
 
 
+class DixaAPIError(Exception):
+    """Error response or transport failure from the Dixa API"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def is_upstream_failure(self) -> bool:
+        """Whether the error means Dixa itself is degraded (no response, 429 or 5xx)"""
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+
 def set_session(session: Optional[Dict[str, Any]]) -> None:
     """Set the current session context (called by FastMCP if session is available)"""
     _current_session.set(session)
@@ -84,16 +121,153 @@ def get_api_key(session: Optional[Dict[str, Any]] = None) -> str:
     return api_key
 
 
-def make_request(
+def _send(
+    method: str,
+    url: str,
+    params: Optional[Dict[str, Any]],
+    json_data: Optional[Dict[str, Any]],
+    headers: Dict[str, str],
+    endpoint: str,
+    tenant: str,
+) -> httpx.Response:
+    """Send a single request through the shared client, recording its latency"""
+    acquire_token(tenant, endpoint)
+    configured_timeout = env_float("DIXA_REQUEST_TIMEOUT_SECONDS", 30.0)
+    # Never wait for Dixa longer than the tool invocation has left
+    timeout = cap_timeout(configured_timeout)
+    client = get_client()
+    request = client.build_request(
+        method=method,
+        url=url,
+        params=params,
+        json=json_data,
+        headers=headers,
+        timeout=timeout,
+    )
+    
+    async def send_and_read() -> httpx.Response:
+        response = await client.send(request, stream=True)
+        try:
+            await response.aread()
+        finally:
+            await response.aclose()
+        return response
+    
+    started = time.monotonic()
+    try:
+        # Cancelling the invocation cancels the task, aborting the request at any stage
+        response = wait_cancellable(submit(send_and_read()))
+    except httpx.TimeoutException as e:
+        if timeout < configured_timeout:
+            # Timed out because the invocation's deadline was near, not because Dixa is slow
+            check_deadline()
+            raise DeadlineExceeded("The tool call ran out of time before Dixa answered")
+        metrics.increment("transport_errors", endpoint)
+        raise DixaAPIError(f"Request failed: {str(e)}")
+    except httpx.HTTPError as e:
+        check_deadline()
+        metrics.increment("transport_errors", endpoint)
+        raise DixaAPIError(f"Request failed: {str(e)}")
+    metrics.record_latency(endpoint, time.monotonic() - started)
+    return response
+
+
+def _serve_stale(key: Optional[str], endpoint: str, log=None) -> Optional[Any]:
+    """Get the last good response for a request if it is recent enough to serve"""
+    if key is None:
+        return None
+    entry = response_cache.get(key, max_age=env_float("DIXA_STALE_CACHE_MAX_AGE_SECONDS", 3600.0))
+    if entry is None:
+        return None
+    metrics.increment("stale_served", endpoint)
+    if log:
+        log.debug(f"Serving stale response for {endpoint} ({entry.age:.0f}s old)")
+    data = json.loads(entry.body)
+    if isinstance(data, dict):
+        data["_cache"] = {"stale": True, "age_seconds": round(entry.age)}
+    return data
+
+
+def _fetch(
+    method: str,
+    url: str,
+    params: Optional[Dict[str, Any]],
+    json_data: Optional[Dict[str, Any]],
+    headers: Dict[str, str],
+    endpoint: str,
+    tenant: str,
+    log=None,
+):
+    """Perform the request and parse it, returning (data, raw body or None for 204)"""
+    def call() -> httpx.Response:
+        return _send(method, url, params, json_data, headers, endpoint, tenant)
+    
+    if should_hedge(method, endpoint):
+        response = hedged_call(endpoint, call)
+    else:
+        response = call()
+    
+    response_text = response.text
+    
+    if log:
+        log.debug(f"Response {response.status_code} over {response.http_version}")
+    
+    if not response.is_success:
+        metrics.increment(f"status_{response.status_code // 100}xx", endpoint)
+        # Provide more helpful error messages for 401 errors
+        if response.status_code == 401:
+            error_msg = (
+                f"Authentication failed (401 Unauthorized). "
+                f"This usually means:\n"
+                f"1. The DIXA_API_KEY environment variable is not set correctly in FastMCP Cloud dashboard\n"
+                f"2. The API key is invalid or has expired\n"
+                f"3. The API key format is incorrect\n\n"
+                f"Please verify:\n"
+                f"- Go to your FastMCP Cloud dashboard\n"
+                f"- Check that DIXA_API_KEY is set under Environment Variables\n"
+                f"- Ensure there are no extra spaces or quotes around the key\n"
+                f"- Verify the API key is valid in your Dixa account\n\n"
+                f"Response: {response_text}"
+            )
+        else:
+            error_msg = (
+                f"Failed to fetch data: {response.status_code} {response.reason_phrase}\n"
+                f"Response: {response_text}"
+            )
+        raise DixaAPIError(error_msg, status_code=response.status_code)
+    
+    # Handle 204 No Content responses
+    if response.status_code == 204:
+        return {"success": True, "message": "Operation completed successfully"}, None
+    
+    # Parse JSON response
+    try:
+        return json.loads(response_text), response_text
+    except json.JSONDecodeError:
+        raise DixaAPIError(
+            f"Invalid JSON response from server: {response_text}",
+            status_code=response.status_code,
+        )
+
+
+def request_data(
     method: str,
     url: str,
     params: Optional[Dict[str, Any]] = None,
     json_data: Optional[Dict[str, Any]] = None,
     log=None,
     session: Optional[Dict[str, Any]] = None,
-) -> Dict[str, Any]:
+) -> Any:
     """
-    Make an HTTP request to the Dixa API.
+    Make an HTTP request to the Dixa API and return the parsed JSON response.
+    
+    Requests go through the endpoint's circuit breaker. When the breaker is open,
+    or Dixa fails with a 5xx/429 or no response, the last good response for the
+    same GET request is returned instead (marked with a "_cache" key) if one is
+    available. GETs on hedged endpoints are hedged (see tools/resilience.py), and
+    identical GETs already in flight are joined instead of sent again
+    (see tools/inflight.py). Requests respect the deadline and cancellation of
+    the current tool invocation (see tools/deadlines.py).
     
     Args:
         method: HTTP method (GET, POST, PUT, DELETE)
@@ -105,13 +279,14 @@ def make_request(
                  If not provided, will try to get from context variable
     
     Returns:
-        Formatted JSON string
+        The parsed JSON response
     """
     # If session not provided, try to get from context variable
     if session is None:
         session = get_current_session()
     
     api_key = get_api_key(session)
+    endpoint = match_endpoint(url) or "other"
     
     # Log that API key is present (without exposing the value)
     if log:
@@ -129,53 +304,148 @@ def make_request(
         "Content-Type": "application/json",
     }
     
-    try:
-        response = requests.request(
-            method=method,
-            url=url,
-            params=params,
-            json=json_data,
-            headers=headers,
-            timeout=30,
-        )
-        
-        response_text = response.text
-        
-        if not response.ok:
-            # Provide more helpful error messages for 401 errors
-            if response.status_code == 401:
-                error_msg = (
-                    f"Authentication failed (401 Unauthorized). "
-                    f"This usually means:\n"
-                    f"1. The DIXA_API_KEY environment variable is not set correctly in FastMCP Cloud dashboard\n"
-                    f"2. The API key is invalid or has expired\n"
-                    f"3. The API key format is incorrect\n\n"
-                    f"Please verify:\n"
-                    f"- Go to your FastMCP Cloud dashboard\n"
-                    f"- Check that DIXA_API_KEY is set under Environment Variables\n"
-                    f"- Ensure there are no extra spaces or quotes around the key\n"
-                    f"- Verify the API key is valid in your Dixa account\n\n"
-                    f"Response: {response_text}"
-                )
-            else:
-                error_msg = (
-                    f"Failed to fetch data: {response.status_code} {response.reason}\n"
-                    f"Response: {response_text}"
-                )
-            raise Exception(error_msg)
-        
-        # Handle 204 No Content responses
-        if response.status_code == 204:
-            return json.dumps({"success": True, "message": "Operation completed successfully"}, indent=2)
-        
-        # Parse JSON response
+    tenant = tenant_id(api_key)
+    key = None
+    if method.upper() == "GET":
+        key = cache_key(tenant, method, url, params)
+    
+    # Webhook events keep these entries current, so they can be read without asking Dixa
+    if key is not None and endpoint in PUSH_FRESH_ENDPOINTS and push_invalidation_enabled(tenant):
+        entry = response_cache.get(key, max_age=env_float("DIXA_WEBHOOK_CACHE_MAX_AGE_SECONDS", 300.0))
+        if entry is not None:
+            metrics.increment("cache_hits", endpoint)
+            return json.loads(entry.body)
+    
+    breaker = get_breaker(endpoint) if circuit_breaker_enabled() else None
+    
+    def fetch_once():
+        # The breaker is only consulted for calls that actually go upstream, so the
+        # half-open probe slot is always settled by the outcome of the request
+        if breaker is not None and not breaker.allow_request():
+            metrics.increment("circuit_rejected", endpoint)
+            raise CircuitOpenError(
+                f"The Dixa API endpoint '{endpoint}' is currently failing and requests to it "
+                f"are paused by the circuit breaker. Please retry in a few seconds."
+            )
+        metrics.increment("requests", endpoint)
         try:
-            data = response.json()
-            # Return as formatted JSON string for MCP
-            return json.dumps(data, indent=2)
-        except json.JSONDecodeError:
-            raise Exception(f"Invalid JSON response from server: {response_text}")
-            
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Request failed: {str(e)}")
+            data, response_text = _fetch(method, url, params, json_data, headers, endpoint, tenant, log)
+        except DixaAPIError as e:
+            if breaker is not None:
+                if e.is_upstream_failure:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            raise
+        except Exception:
+            # e.g. the deadline passed; says nothing about the health of the endpoint
+            if breaker is not None:
+                breaker.release_probe()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        if key is not None and response_text is not None:
+            response_cache.set(key, response_text)
+        return data, response_text
+    
+    try:
+        if key is not None:
+            # Identical GETs in flight in this or another worker share one upstream call
+            data, _ = deduplicate(key, fetch_once, endpoint)
+        else:
+            data, _ = fetch_once()
+    except CircuitOpenError:
+        stale = _serve_stale(key, endpoint, log)
+        if stale is not None:
+            return stale
+        raise
+    except DixaAPIError as e:
+        if e.is_upstream_failure:
+            stale = _serve_stale(key, endpoint, log)
+            if stale is not None:
+                return stale
+        raise
+    except DeadlineExceeded:
+        # A slightly old answer is better than none when time has run out
+        stale = _serve_stale(key, endpoint, log)
+        if stale is not None:
+            return stale
+        raise
+    return data
+
+
+def cached_request_data(
+    method: str,
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    json_data: Optional[Dict[str, Any]] = None,
+    max_age: Optional[float] = None,
+    log=None,
+    session: Optional[Dict[str, Any]] = None,
+    final_after: Optional[float] = None,
+) -> Any:
+    """
+    Like request_data, but serve the response from the response cache when possible.
+    
+    Unlike the stale fallback of request_data, this also caches non-GET requests
+    (e.g. analytics queries sent as POST), so it must only be used for requests
+    that do not change anything in Dixa.
+    
+    Args:
+        method: HTTP method
+        url: Full URL to request
+        params: Query parameters
+        json_data: JSON body
+        max_age: Maximum age in seconds of a cached response (None: no limit)
+        log: Optional logger for debugging
+        session: Optional session context that may contain auth information
+        final_after: Unix timestamp after which the response can no longer change
+                     (e.g. the end of the period it covers); responses cached at
+                     or after it are served whatever their age
+    
+    Returns:
+        The parsed JSON response
+    """
+    if session is None:
+        session = get_current_session()
+    key = cache_key(tenant_id(get_api_key(session)), method, url, params, json_data)
+    entry = response_cache.get(key, max_age=max_age, final_after=final_after)
+    if entry is not None:
+        metrics.increment("cache_hits", match_endpoint(url) or "other")
+        return json.loads(entry.body)
+    data = request_data(method, url, params=params, json_data=json_data, log=log, session=session)
+    # request_data already stored the raw body of a GET under the same key
+    if method.upper() != "GET" and not (isinstance(data, dict) and "_cache" in data):
+        response_cache.set(key, json.dumps(data, separators=(",", ":")))
+    return data
+
 
+def make_request(
+    method: str,
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    json_data: Optional[Dict[str, Any]] = None,
+    log=None,
+    session: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Make an HTTP request to the Dixa API.
+    
+    Args:
+        method: HTTP method (GET, POST, PUT, DELETE)
+        url: Full URL to request
+        params: Query parameters (for GET requests)
+        json_data: JSON body (for POST/PUT requests)
+        log: Optional logger for debugging
+        session: Optional session context that may contain auth information
+                 If not provided, will try to get from context variable
+    
+    Returns:
+        Formatted JSON string
+    """
+    data = request_data(method, url, params=params, json_data=json_data, log=log, session=session)
+    # Return as formatted JSON string for MCP
+    output = json.dumps(data, indent=2)
+    # Learn the typical item size of the output so later pages can be sized to the budget
+    observe_output(match_endpoint(url) or "other", method, data, output)
+    return output
@@ -0,0 +1,304 @@
+"""
+Dixa webhook ingestion for push-based cache invalidation.
+
+When DIXA_WEBHOOK_PORT is set, the server listens for Dixa webhook events on
+http://DIXA_WEBHOOK_HOST:DIXA_WEBHOOK_PORT/DIXA_WEBHOOK_PATH and applies them
+to the response cache. Every request must carry a secret, and each secret
+belongs to one tenant (Dixa organization): DIXA_WEBHOOK_SECRET to the tenant
+of DIXA_API_KEY, and DIXA_WEBHOOK_TENANTS lists "<secret>=<tenant id>" pairs
+for tenants using their own API keys. An event only touches the cached
+responses of the tenant its secret belongs to, since conversation IDs of
+different organizations can overlap:
+- CONVERSATION_CLOSED patches the state of the cached conversation
+- CONVERSATION_TAG_ADDED / CONVERSATION_TAG_REMOVED patch the cached tag list
+  (or invalidate it when the event does not identify the tag)
+- CONVERSATION_MESSAGE_ADDED invalidates the cached messages
+- any other conversation event (e.g. CONVERSATION_CREATED) invalidates the
+  cached conversation and the requester's conversation list
+
+Because changes are pushed, reads of conversations, their messages and tags
+by subscribed tenants are then served from the cache (for up to
+DIXA_WEBHOOK_CACHE_MAX_AGE_SECONDS) instead of asking Dixa every time. This
+only happens while the receiver runs in this process; with a shared state
+backend, workers that do not run it can enable it with
+DIXA_WEBHOOK_CACHE_ENABLED.
+"""
+import hmac
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from tools import metrics
+from tools.cache import response_cache, tenant_id, url_prefix
+from tools.endpoints import endpoint_url
+from tools.settings import env_bool, env_int, env_list
+
+# Endpoints whose cached GET responses are kept fresh by webhook events
+PUSH_FRESH_ENDPOINTS = {"conversation", "conversation_messages", "conversation_tags"}
+
+# Metrics are recorded under this pseudo-endpoint
+_METRICS_ENDPOINT = "webhooks"
+
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def subscribed_tenants() -> Dict[str, str]:
+    """
+    Get the tenant each webhook secret belongs to.
+
+    Returns:
+        Mapping of secret to tenant ID, from DIXA_WEBHOOK_SECRET (the tenant of
+        DIXA_API_KEY) and DIXA_WEBHOOK_TENANTS ("<secret>=<tenant id>" pairs)
+    """
+    tenants: Dict[str, str] = {}
+    secret = os.getenv("DIXA_WEBHOOK_SECRET", "").strip()
+    api_key = os.getenv("DIXA_API_KEY", "").strip()
+    if secret and api_key:
+        tenants[secret] = tenant_id(api_key)
+    for entry in env_list("DIXA_WEBHOOK_TENANTS", []):
+        pair_secret, _, tenant = entry.partition("=")
+        if not pair_secret.strip() or not tenant.strip():
+            raise ValueError(f"Invalid DIXA_WEBHOOK_TENANTS entry '{entry}'. Use '<secret>=<tenant id>'.")
+        tenants[pair_secret.strip()] = tenant.strip()
+    return tenants
+
+
+def push_invalidation_enabled(tenant: str) -> bool:
+    """
+    Whether webhook events keep a tenant's cached conversations fresh.
+
+    True for subscribed tenants while the receiver runs in this process, or
+    when DIXA_WEBHOOK_CACHE_ENABLED says so explicitly (workers sharing a
+    state backend with the receiver).
+    """
+    if not env_bool("DIXA_WEBHOOK_CACHE_ENABLED", _server is not None):
+        return False
+    return tenant in subscribed_tenants().values()
+
+
+def _prefix(endpoint: str, tenant: Optional[str], path_params: Dict[str, str]) -> str:
+    prefix = url_prefix(endpoint_url(endpoint, **path_params))
+    return f"{prefix}{tenant}|" if tenant is not None else prefix
+
+
+def invalidate(endpoint: str, tenant: Optional[str] = None, **path_params: str) -> int:
+    """
+    Drop every cached response of a resource, for all query parameters.
+
+    Args:
+        endpoint: Endpoint name in tools/endpoints.py
+        tenant: Tenant whose entries are dropped (None: all tenants)
+        **path_params: Path parameters identifying the resource
+
+    Returns:
+        Number of cache entries removed
+    """
+    removed = response_cache.delete_prefix(_prefix(endpoint, tenant, path_params))
+    if removed:
+        metrics.increment("invalidations", _METRICS_ENDPOINT, removed)
+    return removed
+
+
+def patch(endpoint: str, change: Callable[[Any], bool], tenant: str, **path_params: str) -> int:
+    """
+    Modify a tenant's cached responses of a resource in place.
+
+    Args:
+        endpoint: Endpoint name in tools/endpoints.py
+        change: Function modifying a parsed cached response; returns False if the
+            response could not be patched, in which case the entry is dropped
+        tenant: Tenant whose entries are patched
+        **path_params: Path parameters identifying the resource
+
+    Returns:
+        Number of cache entries patched
+    """
+    patched = 0
+    for key in response_cache.keys(_prefix(endpoint, tenant, path_params)):
+        entry = response_cache.get(key)
+        if entry is None:
+            continue
+        data = json.loads(entry.body)
+        if change(data):
+            response_cache.set(key, json.dumps(data, separators=(",", ":")))
+            patched += 1
+        else:
+            response_cache.delete_prefix(key)
+    if patched:
+        metrics.increment("patches", _METRICS_ENDPOINT, patched)
+    return patched
+
+
+def _set_closed(response: Any) -> bool:
+    conversation = response.get("data") if isinstance(response, dict) else None
+    if not isinstance(conversation, dict) or "state" not in conversation:
+        return False
+    conversation["state"] = "Closed"
+    return True
+
+
+def _tag_patch(tag: Dict[str, Any], added: bool) -> Callable[[Any], bool]:
+    def change(response: Any) -> bool:
+        tags = response.get("data") if isinstance(response, dict) else None
+        if not isinstance(tags, list):
+            return False
+        kept = [
+            existing for existing in tags
+            if not (isinstance(existing, dict) and (
+                (tag.get("id") and existing.get("id") == tag.get("id"))
+                or (not tag.get("id") and existing.get("name") == tag.get("name"))
+            ))
+        ]
+        if added:
+            kept.append(tag)
+        response["data"] = kept
+        return True
+    return change
+
+
+def _event_tag(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # Only plain string fields are taken from the event, never arbitrary objects
+    tag = data.get("tag")
+    if isinstance(tag, str):
+        tag = {"name": tag}
+    if not isinstance(tag, dict):
+        return None
+    fields = {key: tag[key] for key in ("id", "name", "state") if isinstance(tag.get(key), str) and tag[key]}
+    return fields if fields.get("id") or fields.get("name") else None
+
+
+def apply_event(event: Dict[str, Any], tenant: str) -> Dict[str, Any]:
+    """
+    Apply one Dixa webhook event to a tenant's cached responses.
+
+    Args:
+        event: Parsed webhook payload (with 'event_fqn' and 'data')
+        tenant: Tenant the event was sent for
+
+    Returns:
+        Summary of what was done
+    """
+    event_type = str(event.get("event_fqn") or event.get("event_type") or "").upper()
+    data = event.get("data") if isinstance(event.get("data"), dict) else {}
+    conversation = data.get("conversation") if isinstance(data.get("conversation"), dict) else {}
+    conversation_id = conversation.get("csid", conversation.get("id", data.get("conversation_id")))
+    metrics.increment("events", _METRICS_ENDPOINT)
+
+    summary: Dict[str, Any] = {"event": event_type, "invalidated": 0, "patched": 0}
+    if conversation_id is None:
+        summary["ignored"] = "no conversation id"
+        return summary
+    conversation_id = str(conversation_id)
+    patch_in_place = env_bool("DIXA_WEBHOOK_PATCH_IN_PLACE", True)
+
+    if event_type == "CONVERSATION_CLOSED" and patch_in_place:
+        summary["patched"] += patch("conversation", _set_closed, tenant, conversation_id=conversation_id)
+    elif event_type in ("CONVERSATION_TAG_ADDED", "CONVERSATION_TAG_REMOVED"):
+        tag = _event_tag(data)
+        added = event_type == "CONVERSATION_TAG_ADDED"
+        # A tag known only by name cannot be added to a list of tag objects
+        if patch_in_place and tag is not None and (tag.get("id") or not added):
+            summary["patched"] += patch("conversation_tags", _tag_patch(tag, added), tenant, conversation_id=conversation_id)
+        else:
+            summary["invalidated"] += invalidate("conversation_tags", tenant=tenant, conversation_id=conversation_id)
+    elif event_type == "CONVERSATION_MESSAGE_ADDED":
+        summary["invalidated"] += invalidate("conversation_messages", tenant=tenant, conversation_id=conversation_id)
+    else:
+        summary["invalidated"] += invalidate("conversation", tenant=tenant, conversation_id=conversation_id)
+
+    requester = conversation.get("requester") if isinstance(conversation.get("requester"), dict) else {}
+    requester_id = requester.get("id", conversation.get("requester_id"))
+    if requester_id and event_type in ("CONVERSATION_CREATED", "CONVERSATION_CLOSED"):
+        summary["invalidated"] += invalidate("end_user_conversations", tenant=tenant, user_id=str(requester_id))
+    return summary
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    """HTTP handler accepting Dixa webhook POSTs"""
+
+    def _reply(self, status: int, body: Dict[str, Any]) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _tenant(self) -> Optional[str]:
+        """Get the tenant whose secret the request carries, or None if it carries none"""
+        provided = self.headers.get("Authorization", "")
+        if provided.lower().startswith("bearer "):
+            provided = provided[len("bearer "):]
+        provided_bytes = provided.strip().encode("utf-8")
+        tenant = None
+        for secret, candidate in subscribed_tenants().items():
+            # Compare against every secret so the timing does not reveal which one matched
+            if hmac.compare_digest(provided_bytes, secret.encode("utf-8")):
+                tenant = candidate
+        return tenant
+
+    def do_POST(self) -> None:
+        if self.path.split("?", 1)[0] != os.getenv("DIXA_WEBHOOK_PATH", "/webhooks/dixa"):
+            self._reply(404, {"error": "not found"})
+            return
+        tenant = self._tenant()
+        if tenant is None:
+            metrics.increment("rejected", _METRICS_ENDPOINT)
+            self._reply(401, {"error": "unauthorized"})
+            return
+        # Validate the length before reading: a negative one would make read() wait for EOF
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._reply(400, {"error": "invalid Content-Length"})
+            return
+        if length > env_int("DIXA_WEBHOOK_MAX_BODY_BYTES", 1_000_000):
+            self._reply(413, {"error": "payload too large"})
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b"null")
+        except json.JSONDecodeError:
+            self._reply(400, {"error": "invalid JSON"})
+            return
+        events: List[Any] = payload if isinstance(payload, list) else [payload]
+        results = [apply_event(event, tenant) for event in events if isinstance(event, dict)]
+        self._reply(200, {"received": len(results), "results": results, "at": time.time()})
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # Keep webhook traffic out of the MCP server's stdio/stderr
+        return
+
+
+def start_webhook_server() -> Optional[ThreadingHTTPServer]:
+    """
+    Start the webhook receiver in a background thread if DIXA_WEBHOOK_PORT is set.
+
+    Returns:
+        The running server, or None if webhooks are not enabled or the port is
+        already taken (e.g. by the receiver of another worker)
+    """
+    global _server
+    port = env_int("DIXA_WEBHOOK_PORT", 0)
+    if not port:
+        return None
+    if not subscribed_tenants():
+        raise ValueError(
+            "DIXA_WEBHOOK_PORT is set but no webhook secret is configured. Set DIXA_WEBHOOK_SECRET "
+            "(with DIXA_API_KEY) or DIXA_WEBHOOK_TENANTS so events can be authenticated."
+        )
+    if _server is None:
+        host = os.getenv("DIXA_WEBHOOK_HOST", "127.0.0.1")
+        try:
+            server = ThreadingHTTPServer((host, port), _WebhookHandler)
+        except OSError:
+            metrics.increment("receiver_unavailable", _METRICS_ENDPOINT)
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="dixa-webhooks", daemon=True).start()
+        _server = server
+    return _server